@@ -8,20 +8,41 @@ Run:
 import streamlit as st
 from pathlib import Path
 import tempfile
-import shutil
+import os
 import json
 import io
+import uuid
 from typing import List
 import pandas as pd
+import altair as alt
 try:
     from PIL import Image
 except ImportError:
     Image = None
 
 from qualcoder_core import (
-    load_codebook, make_output_folder, process_single_transcript,
-    DEFAULT_CODEBOOK, suggest_keywords_from_texts, extract_text_from_file
+    load_codebook, make_output_folder, process_batch, RunManifest, batch_config_key,
+    DEFAULT_CODEBOOK, RunMetrics, ProgressTracker, format_progress, FALLBACK_CODE,
+    DOMAIN_NOTE_PREFIX, IncrementalStages, create_excel_file, configure_logging
 )
+from qualcoder_store import ProjectStore, DEFAULT_STORE_PATH
+from qualcoder_cache import StageCache
+from qualcoder_ui_cache import (
+    keyword_suggestions, stage1_preview, output_index, file_download, archive_download, upload_digest,
+    output_usage, refresh_output_usage, concordance_index, coding_config_key
+)
+from qualcoder_explorer import SegmentTable
+from qualcoder_crosscase import CrossCaseMatrix, NORMALIZATIONS, ORDERS
+from qualcoder_cooccurrence import CodeIncidence, MultiLabelCoder, UNITS, METRICS, to_dot
+from qualcoder_concordance import CONCORDANCE_SORTS
+from qualcoder_agreement import coding_table, compare_codings, read_coding_sheet
+from qualcoder_results import SessionResults
+from qualcoder_scheduler import FairScheduler, DEFAULT_MAX_ANALYSES
+from qualcoder_retention import OutputRetention, touch_run
+from qualcoder_jobs import JobQueue, start_workers, DEFAULT_JOBS_PATH
+from qualcoder_profiling import StageProfiler, MemoryAccountant, PROFILE_ENV, PROFILE_MODES, MB
+
+configure_logging()
 
 # ===============================
 # Page Configuration
@@ -95,6 +116,104 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# ===============================
+# Shared Resources
+# ===============================
+@st.cache_resource
+def get_project_store() -> ProjectStore:
+    """One SQLite project store per server process."""
+    return ProjectStore(DEFAULT_STORE_PATH)
+
+
+@st.cache_resource
+def get_stage_cache() -> StageCache:
+    """Fingerprint-keyed stage results shared by all runs of this server."""
+    return StageCache()
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """Background job queue shared by all sessions."""
+    return JobQueue(DEFAULT_JOBS_PATH)
+
+
+@st.cache_resource
+def get_job_workers():
+    """Worker processes for the job queue, started once per server (QUALCODER_WORKERS, default 1)."""
+    return start_workers(int(os.environ.get('QUALCODER_WORKERS', '1')), DEFAULT_JOBS_PATH, DEFAULT_STORE_PATH)
+
+
+@st.cache_resource
+def get_scheduler() -> FairScheduler:
+    """Slots shared by all sessions' foreground analyses (QUALCODER_MAX_ANALYSES files at a time)."""
+    return FairScheduler(DEFAULT_MAX_ANALYSES)
+
+
+def session_key() -> str:
+    """Stable id of this browser session, used for fair scheduling."""
+    return st.session_state.setdefault('session_key', uuid.uuid4().hex)
+
+
+def parse_manual_keywords(raw: str) -> list:
+    """Comma- or newline-separated keywords from the manual keywords box."""
+    return [kw.strip() for kw in raw.replace('\n', ',').split(',') if kw.strip()] if raw else []
+
+
+def load_job_results(job: dict):
+    """Load a finished job's results from the project store into the session."""
+    out_folder = Path(job['output_folder'])
+    report_path = out_folder / 'run_report.json'
+    st.session_state['results'] = SessionResults(get_project_store().load_run(job['run_id']))
+    st.session_state['run_report'] = json.loads(report_path.read_text(encoding='utf-8')) if report_path.exists() else None
+    st.session_state['out_folder'] = out_folder
+    touch_run(out_folder)
+    st.session_state['run_id'] = job['run_id']
+    st.session_state['analysis_complete'] = True
+    st.session_state['loaded_job_id'] = job['job_id']
+
+
+@st.fragment(run_every=2)
+def job_status_panel():
+    """Progress of the session's background job; loads its results once it is done."""
+    job = get_job_queue().get(st.session_state['job_id'])
+    if job is None:
+        st.warning("⚠️ Background job not found")
+        return
+    label = f"Job #{job['job_id']} · {job['project_name']}"
+    if job['status'] in ('queued', 'running', 'cancelling'):
+        get_job_workers()  # make sure someone is working on the queue
+        event = job['progress']
+        st.progress(event['fraction'] if event else job['files_done'] / max(job['files_total'], 1))
+        current = f" · processing {job['current_file']}" if job['current_file'] else ""
+        if event:
+            st.caption(f"{label}: {job['status']} · {format_progress(event)}{current}")
+        else:
+            st.caption(f"{label}: {job['status']} · {job['files_done']}/{job['files_total']} files{current}")
+        if job['status'] == 'queued' and st.button("✖️ Cancel Job"):
+            get_job_queue().cancel(job['job_id'])
+            st.rerun()
+        elif job['status'] == 'running' and st.button("⏹️ Stop After Current File"):
+            get_job_queue().cancel(job['job_id'])
+            st.rerun()
+    elif job['status'] == 'done':
+        if st.session_state.get('loaded_job_id') != job['job_id']:
+            load_job_results(job)
+            st.rerun(scope="app")
+        st.success(f"✅ {label} completed: {job['files_total'] - len(job['errors'])}/{job['files_total']} files. "
+                   "See the Results tab.")
+        for fname, err in job['errors'].items():
+            st.error(f"❌ Failed processing {fname}: {err}")
+    else:
+        detail = job['error'] or '; '.join(job['errors'].values())
+        if job['status'] == 'cancelled':
+            st.warning(f"⏹️ {label} stopped after {job['files_done']}/{job['files_total']} files")
+        else:
+            st.error(f"❌ {label} {job['status']}: {detail}")
+        # Completed files are checkpointed in the run manifest and skipped on resume
+        if st.button("▶️ Resume Job") and get_job_queue().resume(job['job_id']):
+            st.rerun()
+
+
 # ===============================
 # Initialize Session State
 # ===============================
@@ -118,6 +237,9 @@ if 'picked_keywords' not in st.session_state:
     st.session_state['picked_keywords'] = []
 if 'research_questions_text' not in st.session_state:
     st.session_state['research_questions_text'] = ""
+if 'job_id' not in st.session_state:
+    # A page reload keeps following the job named in the URL
+    st.session_state['job_id'] = int(st.query_params['job']) if st.query_params.get('job', '').isdigit() else None
 
 # ===============================
 # Header Section
@@ -270,19 +392,8 @@ with tab2:
                     st.warning("⚠️ Please upload transcripts first")
                 else:
                     with st.spinner("Analyzing documents..."):
-                        texts = []
-                        for uf in uploaded_files:
-                            with tempfile.NamedTemporaryFile(delete=False, suffix=Path(uf.name).suffix) as tf:
-                                tf.write(uf.getbuffer())
-                                tmp_path = Path(tf.name)
-                            txt = extract_text_from_file(tmp_path)
-                            texts.append(txt)
-                            try:
-                                tmp_path.unlink()
-                            except Exception:
-                                pass
-                        
-                        suggestions = suggest_keywords_from_texts(texts, top_n=top_n)
+                        # Texts and suggestions are cached by upload content, so repeats are instant
+                        suggestions = keyword_suggestions(uploaded_files, top_n=top_n)
                         st.session_state['suggested_keywords'] = suggestions
                         
                         if suggestions:
@@ -301,7 +412,40 @@ with tab2:
             st.session_state['picked_keywords'] = picked
         else:
             picked = st.session_state.get('picked_keywords', [])
-        
+
+        # Keyword in context: how a candidate keyword is used across the uploads
+        with st.expander("🔎 Keyword in context", expanded=False):
+            kwic_files = st.session_state.get('uploaded_files')
+            if not kwic_files:
+                st.info("Upload transcripts to see keywords in context")
+            else:
+                candidates = list(dict.fromkeys(st.session_state.get('suggested_keywords', []) +
+                                                parse_manual_keywords(st.session_state.get('manual_keywords_raw', ''))))
+                kwic_pick = st.selectbox("Keyword", options=[''] + candidates, key='kwic_pick',
+                                         format_func=lambda k: k or "— type a word or phrase below —")
+                kwic_text = st.text_input("Word or phrase", value='', key='kwic_text',
+                                          placeholder="e.g., online learning")
+                kwic_phrase = kwic_text.strip() or kwic_pick
+                kc1, kc2 = st.columns(2)
+                with kc1:
+                    kwic_window = st.slider("Context words", min_value=3, max_value=20, value=8, key='kwic_window')
+                with kc2:
+                    kwic_sort = st.selectbox("Sort by", options=list(CONCORDANCE_SORTS), key='kwic_sort',
+                                             format_func={'document': 'Document order', 'left': 'Word before',
+                                                          'right': 'Word after'}.get)
+                kwic_skip = st.checkbox("Ignore stop words between words (as TF-IDF suggestions do)", value=True,
+                                        key='kwic_skip')
+                if kwic_phrase:
+                    with st.spinner("Indexing transcripts..."):
+                        kwic_index = concordance_index(kwic_files)
+                    lines, hits = kwic_index.concordance(kwic_phrase, window=kwic_window, sort=kwic_sort,
+                                                         skip_stop_words=kwic_skip, limit=200)
+                    per_file = kwic_index.file_counts(kwic_phrase, skip_stop_words=kwic_skip)
+                    st.caption(f"{hits} occurrence(s) of '{kwic_phrase}' in {len(per_file)} of "
+                               f"{len(kwic_files)} transcript(s)" + (" — showing the first 200" if hits > 200 else ""))
+                    if hits:
+                        st.dataframe(lines.drop(columns=['Offset']), use_container_width=True, hide_index=True)
+
         # Manual keyword input
         st.markdown("#### ✏️ Manual Keywords")
         manual_keywords_raw = st.text_area(
@@ -313,6 +457,32 @@ with tab2:
         # Store manual keywords in session state
         st.session_state['manual_keywords_raw'] = manual_keywords_raw
 
+    # Coding preview: recomputed per file only when its content, the codebook or the keywords change
+    st.markdown("---")
+    if st.checkbox("👁️ Preview coding with the current codebook and keywords", value=False,
+                   help="Stage 1 coding summary per uploaded file; results are cached, so tweaking "
+                        "keywords only recodes the segments"):
+        preview_files = st.session_state.get('uploaded_files')
+        if not preview_files:
+            st.info("Upload transcripts to preview their coding")
+        else:
+            preview_keywords = list(dict.fromkeys(picked + parse_manual_keywords(manual_keywords_raw)))
+            preview_rows = []
+            for uf in preview_files:
+                s1 = stage1_preview(uf, st.session_state['codebook'], preview_keywords)
+                n = len(s1)
+                domain_hits = int((s1['Notes'] != '').sum()) if n else 0
+                uncoded = int((s1['Initial_Code'] == FALLBACK_CODE).sum()) if n else 0
+                preview_rows.append({
+                    'File': uf.name,
+                    'Segments': n,
+                    'Domain keyword hits': domain_hits,
+                    'Codebook hits': n - domain_hits - uncoded,
+                    'Uncoded (%)': round(100 * uncoded / n, 1) if n else 0.0,
+                    'Most frequent code': s1['Initial_Code'].mode().iat[0] if n else '',
+                })
+            st.dataframe(pd.DataFrame(preview_rows), use_container_width=True, hide_index=True)
+
 # ===============================
 # Tab 3: Analysis
 # ===============================
@@ -326,9 +496,7 @@ with tab3:
     manual_keywords_raw = st.session_state.get('manual_keywords_raw', '')
     
     # Parse manual keywords
-    manual_list = []
-    if manual_keywords_raw:
-        manual_list = [kw.strip() for kw in manual_keywords_raw.replace('\n', ',').split(',') if kw.strip()]
+    manual_list = parse_manual_keywords(manual_keywords_raw)
     
     # Get picked keywords from session state
     picked = st.session_state.get('picked_keywords', [])
@@ -368,6 +536,57 @@ with tab3:
     # Analysis settings
     st.markdown("### ⚙️ Analysis Options")
     preview_toggle = st.checkbox("Show segment preview in results", value=True)
+    reuse_cache = st.checkbox(
+        "Reuse cached stage results",
+        value=True,
+        help="Only re-run the stages whose inputs changed since a previous analysis "
+             "(e.g. editing research questions re-runs Stage 3 only)"
+    )
+    streaming_mode = st.checkbox(
+        "Streaming mode for very large transcripts",
+        value=False,
+        help="Process each file in constant memory: Stage 1 is written straight to disk "
+             "(no in-app preview; download it from the ZIP). Stage caching is not used in this mode."
+    )
+    save_to_store = st.checkbox(
+        "Save results to project store",
+        value=True,
+        help=f"Index segments, codes and themes in {DEFAULT_STORE_PATH} so the project can be reopened later"
+    )
+    profile_col1, profile_col2 = st.columns([1, 1])
+    with profile_col1:
+        profile_run = st.checkbox(
+            "Profile this run",
+            value=bool(os.environ.get(PROFILE_ENV)),
+            help="Write a .prof file and a collapsed-stack flame graph file per transcript "
+                 "to the profiles/ folder of the outputs"
+        )
+    with profile_col2:
+        profile_mode = st.selectbox("Profiler", PROFILE_MODES, disabled=not profile_run)
+    run_in_background = st.checkbox(
+        "Run in background",
+        value=True,
+        help="Queue the analysis for a worker process: it keeps running if this page is reloaded "
+             "or closed, and results are saved to the project store for the Results tab"
+    )
+    server_load = get_scheduler().status()
+    if server_load['running'] or server_load['waiting']:
+        st.caption(f"Server load: {server_load['running']}/{server_load['max_concurrent']} analysis slots in use, "
+                   f"{server_load['waiting']} file(s) queued")
+    memory_col1, memory_col2 = st.columns([1, 1])
+    with memory_col1:
+        track_memory = st.checkbox(
+            "Track memory per stage",
+            value=False,
+            help="Record peak and net allocations and the top allocation sites for each stage "
+                 "(tracemalloc; slows the run down)"
+        )
+    with memory_col2:
+        memory_budget_mb = st.number_input(
+            "Per-file memory budget (MB, 0 = none)", min_value=0, value=0, step=100,
+            disabled=not track_memory,
+            help="Stop processing a file as soon as one of its stages goes over this budget"
+        )
     
     # Run analysis button
     st.markdown("---")
@@ -378,69 +597,195 @@ with tab3:
                 st.error("❌ Please upload at least one transcript file")
             elif not research_questions:
                 st.error("❌ Please enter at least one research question")
+            elif run_in_background:
+                queue = get_job_queue()
+                get_job_workers()
+                inputs_dir = queue.new_inputs_dir()
+                job_files = []
+                for uf in uploaded_files:
+                    target = inputs_dir / Path(uf.name).name
+                    with open(target, 'wb') as f:
+                        f.write(uf.getbuffer())
+                    job_files.append(target)
+                job_id = queue.submit(project_name, job_files, config={
+                    'research_questions': research_questions,
+                    'domain_keywords': domain_keywords,
+                    'codebook': codebook,
+                    'streaming': streaming_mode,
+                    'reuse_cache': reuse_cache,
+                    'profile': profile_mode if profile_run else None,
+                    'track_memory': track_memory,
+                    'memory_budget_mb': memory_budget_mb or None,
+                })
+                st.session_state['job_id'] = job_id
+                st.session_state['analysis_complete'] = False
+                st.query_params['job'] = str(job_id)
             else:
                 st.session_state['analysis_complete'] = False
                 out_folder = make_output_folder(project_name)
+                store = get_project_store() if save_to_store else None
+                run_id = store.start_run(project_name, out_folder, config={
+                    'research_questions': research_questions,
+                    'domain_keywords': domain_keywords,
+                    'codebook': codebook,
+                }) if store else None
                 
+                metrics = RunMetrics(project_name)
+                profiler = StageProfiler(out_folder, mode=profile_mode) if profile_run else None
+                memory = MemoryAccountant(
+                    metrics, budget_bytes=int(memory_budget_mb * MB) or None
+                ) if track_memory else None
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                results = []
+                def show_progress(event):
+                    progress_bar.progress(event['fraction'])
+                    current = f" · {event['file']}" if event['file'] and event['event'] != 'file_done' else ""
+                    status_text.text(f"Processing: {format_progress(event)}{current}")
+
+                def show_error(done, name, error):
+                    if error:
+                        st.error(f"❌ Failed processing {name}: {error}")
+
+                def show_queued(position):
+                    status_text.text(f"Waiting for a free analysis slot ({position} file(s) ahead in the server queue)…")
+
+                config_key = batch_config_key(codebook, research_questions, domain_keywords, streaming_mode)
                 with tempfile.TemporaryDirectory() as td:
                     td_path = Path(td)
-                    total_files = len(uploaded_files)
-                    
-                    for idx, uf in enumerate(uploaded_files):
-                        progress = (idx / total_files)
-                        progress_bar.progress(progress)
-                        status_text.text(f"Processing: {uf.name} ({idx+1}/{total_files})")
-                        
+                    targets = []
+                    content_keys = {}
+                    for uf in uploaded_files:
                         target = td_path / uf.name
                         with open(target, 'wb') as f:
                             f.write(uf.getbuffer())
-                        
-                        try:
-                            s1, s2, s3 = process_single_transcript(
-                                target, out_folder, codebook, 
-                                research_questions, domain_keywords=domain_keywords
-                            )
-                            results.append((uf.name, s1, s2, s3))
-                        except Exception as e:
-                            st.error(f"❌ Failed processing {uf.name}: {e}")
+                        targets.append(target)
+                        content_keys[target] = f"{upload_digest(uf)}:{config_key}"
+                    # Identical uploads from other sessions wait for each other and then hit the
+                    # shared stage cache (streaming mode does not use the cache, so nothing to share)
+                    share_work = reuse_cache and not streaming_mode
+                    scheduler = get_scheduler()
+
+                    def file_slot(file_path):
+                        return scheduler.slot(session_key(), content_keys[file_path] if share_work else None,
+                                              on_wait=show_queued)
+
+                    # The run manifest also lists each file's outputs for the Results tab
+                    manifest = RunManifest.load(out_folder, config_key)
+                    results, _ = process_batch(
+                        targets, out_folder, codebook, research_questions, domain_keywords,
+                        store=store, run_id=run_id, cache=get_stage_cache() if reuse_cache else None,
+                        metrics=metrics, profiler=profiler, memory=memory, streaming=streaming_mode,
+                        on_file=show_error, manifest=manifest, progress=ProgressTracker(show_progress, targets),
+                        slot=file_slot
+                    )
                     
                     progress_bar.progress(1.0)
                     status_text.text("Analysis complete!")
                 
-                st.session_state['results'] = results
+                if memory is not None:
+                    memory.close()
+                metrics.write_report(out_folder)
+                if OutputRetention(out_folder.parent).enforce(protect=[out_folder]):
+                    refresh_output_usage()
+                st.session_state['run_report'] = metrics.to_dict()
+                st.session_state['results'] = SessionResults(results)
+                st.session_state['results_research_questions'] = research_questions
                 st.session_state['analysis_complete'] = True
                 st.session_state['out_folder'] = out_folder
+                st.session_state['run_id'] = run_id
                 
                 st.success("✅ Analysis completed successfully!")
                 st.balloons()
 
+    # Background job status (refreshes on its own while the job runs)
+    if st.session_state.get('job_id') is not None:
+        st.markdown("---")
+        job_status_panel()
+
+    recent_jobs = get_job_queue().list_jobs(limit=10)
+    if not recent_jobs.empty:
+        with st.expander("🧾 Recent background jobs", expanded=False):
+            st.dataframe(recent_jobs, use_container_width=True, hide_index=True)
+            job_choice = st.selectbox("Follow job", recent_jobs['job_id'].tolist())
+            if st.button("👀 Show Job", use_container_width=True):
+                st.session_state['job_id'] = int(job_choice)
+                st.query_params['job'] = str(job_choice)
+                st.rerun()
+
 # ===============================
 # Tab 4: Results
 # ===============================
 with tab4:
+    # Reopen a past project from the project store
+    past_runs = get_project_store().list_runs()
+    if not past_runs.empty:
+        with st.expander("🗂️ Open a saved project", expanded=False):
+            run_labels = {
+                int(r.run_id): f"#{r.run_id} · {r.project_name} · {r.created_at} · {r.files} file(s)"
+                for r in past_runs.itertuples()
+            }
+            picked_run = st.selectbox("Saved runs", options=list(run_labels), format_func=run_labels.get)
+            if st.button("📂 Open Project", use_container_width=True):
+                run_info = get_project_store().get_run(picked_run)
+                st.session_state['results'] = SessionResults(get_project_store().load_run(picked_run))
+                st.session_state['out_folder'] = Path(run_info['output_folder'])
+                touch_run(st.session_state['out_folder'])
+                st.session_state['run_id'] = picked_run
+                st.session_state['run_report'] = None
+                st.session_state['analysis_complete'] = True
+
+    # Disk use of run outputs against the retention quotas (see qualcoder_retention.py)
+    with st.expander("💾 Output storage", expanded=False):
+        usage = output_usage()
+        storage_col1, storage_col2, storage_col3 = st.columns(3)
+        with storage_col1:
+            st.metric("Runs", usage['runs'])
+        with storage_col2:
+            st.metric("Disk Used", f"{usage['bytes'] / MB:.1f} MB")
+        with storage_col3:
+            max_bytes = usage['policy']['max_bytes']
+            st.metric("Quota", f"{max_bytes / MB:.0f} MB" if max_bytes else "None")
+        quotas = [f"{label} {usage['policy'][key]}" for key, label in
+                  (('max_age_days', 'max age (days)'), ('max_runs', 'max runs')) if usage['policy'][key] is not None]
+        st.caption("Least recently opened or downloaded runs (and inputs of finished jobs) are removed first"
+                   + (f" · {', '.join(quotas)}" if quotas else "")
+                   + (f" · {usage['unmanaged_bytes'] / MB:.1f} MB in databases and caches is not managed"
+                      if usage['unmanaged_bytes'] else ""))
+        if usage['items']:
+            usage_table = pd.DataFrame(usage['items'])
+            usage_table['MB'] = (usage_table.pop('bytes') / MB).round(2)
+            st.dataframe(usage_table, use_container_width=True, hide_index=True)
+        if usage['pending_eviction']:
+            st.warning(f"{len(usage['pending_eviction'])} run(s) are over the quotas: "
+                       f"{', '.join(usage['pending_eviction'])}")
+            if st.button("🧹 Remove them now"):
+                current = st.session_state.get('out_folder')
+                OutputRetention().enforce(protect=[current] if current else [])
+                refresh_output_usage()
+                st.rerun()
+    
     if st.session_state.get('analysis_complete') and st.session_state.get('results'):
         st.markdown("### 📊 Analysis Results")
         
         results = st.session_state['results']
         out_folder = st.session_state['out_folder']
         
-        # Download all results
+        # Download all results (the archive is built when the button is clicked)
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            shutil.make_archive(str(out_folder), 'zip', root_dir=out_folder)
-            zip_path = out_folder.with_suffix('.zip')
-            with open(zip_path, 'rb') as f:
-                zip_bytes = f.read()
-            st.download_button(
-                "📥 **Download All Results (ZIP)**",
-                data=zip_bytes,
-                file_name=f"{out_folder.name}.zip",
-                use_container_width=True
-            )
+            if out_folder.is_dir():
+                st.download_button(
+                    "📥 **Download All Results (ZIP)**",
+                    data=archive_download(out_folder),
+                    file_name=f"{out_folder.name}.zip",
+                    mime="application/zip",
+                    use_container_width=True
+                )
+            else:
+                st.info("The output files of this run were removed by the retention policy; "
+                        "its segments, codes and themes are still in the project store.")
+        result_files = output_index(out_folder, results.file_names())
         
         st.markdown("---")
         
@@ -463,38 +808,243 @@ with tab4:
                         st.markdown("**Statistics:**")
                         st.metric("Total Segments", len(s1))
                         st.metric("Unique Codes", s1['Initial_Code'].nunique())
-                    
-                    # Download buttons for individual files
+                elif s1 is None:
+                    st.info("Stage 1 was streamed to disk for this file; download its workbook below.")
+                
+                # Download buttons for individual files; each is read only when clicked
+                if result_files.get(fname):
                     st.markdown("**Download Options:**")
                     file_cols = st.columns(3)
-                    col_idx = 0
-                    for fx in out_folder.rglob(f"{Path(fname).stem}*"):
-                        if fx.suffix.lower() in ['.xlsx', '.txt']:
-                            with open(fx, 'rb') as f:
-                                with file_cols[col_idx % 3]:
-                                    st.download_button(
-                                        f"📥 {fx.name}",
-                                        data=f.read(),
-                                        file_name=fx.name,
-                                        use_container_width=True
-                                    )
-                                col_idx += 1
+                    for col_idx, fx in enumerate(result_files[fname]):
+                        with file_cols[col_idx % 3]:
+                            st.download_button(
+                                f"📥 {fx.name}",
+                                data=file_download(fx),
+                                file_name=fx.name,
+                                use_container_width=True
+                            )
+        
+        # Run performance report (also saved as run_report.json in the output folder)
+        run_report = st.session_state.get('run_report')
+        if run_report:
+            with st.expander("⏱️ Run Performance", expanded=False):
+                perf_col1, perf_col2, perf_col3 = st.columns(3)
+                with perf_col1:
+                    st.metric("Wall Time", f"{run_report['wall_seconds']:.1f} s")
+                with perf_col2:
+                    st.metric("Segments/s", f"{run_report['throughput']['segments_per_second']:.0f}")
+                with perf_col3:
+                    st.metric("Data Read", f"{run_report['counters'].get('bytes_read', 0) / 1024:.1f} KB")
+                stage_times = pd.DataFrame(
+                    sorted(run_report['stage_seconds'].items(), key=lambda kv: -kv[1]),
+                    columns=['Stage', 'Seconds']
+                )
+                st.dataframe(stage_times, use_container_width=True, hide_index=True)
+                memory_rows = [
+                    {'File': fname, 'Stage': stage, 'Peak MB': rec['peak_bytes'] / MB,
+                     'Net MB': rec['net_bytes'] / MB,
+                     'Top site': rec['top_sites'][0]['site'] if rec.get('top_sites') else ''}
+                    for fname, entry in run_report['files'].items()
+                    for stage, rec in entry.get('memory', {}).items()
+                ]
+                if memory_rows:
+                    st.markdown("**Memory per stage**")
+                    st.dataframe(pd.DataFrame(memory_rows).round(2), use_container_width=True, hide_index=True)
         
+        # Results explorer: filtering, sorting and paging happen in the store (or, for runs
+        # that were not stored, in a cached SegmentTable); only the visible page is rendered
+        st.markdown("---")
+        st.markdown("### 🔍 Results Explorer")
+        run_id = st.session_state.get('run_id')
+        store = get_project_store() if run_id is not None else None
+        if store is not None:
+            explorer_codes = store.code_counts(run_id)['Code'].tolist()
+            explorer_files = store.list_files(run_id)
+            explorer_keywords = store.domain_keywords(run_id)
+        else:
+            cached_table = st.session_state.get('segment_table')
+            if cached_table is None or cached_table[0] is not results or cached_table[1] != results.version:
+                cached_table = (results, results.version, SegmentTable.from_results(results))
+                st.session_state['segment_table'] = cached_table
+            segment_table = cached_table[2]
+            explorer_codes = segment_table.codes()
+            explorer_files = segment_table.files()
+            explorer_keywords = segment_table.keywords()
+
+        search_text = st.text_input(
+            "Search quotes",
+            placeholder="e.g., moodle, challeng*",
+            help="All words must appear; end a word with * for prefix matching"
+        )
+        filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+        with filter_col1:
+            search_code = st.selectbox("Code", ["All"] + explorer_codes)
+        with filter_col2:
+            search_file = st.selectbox("File", ["All"] + explorer_files)
+        with filter_col3:
+            search_keyword = st.selectbox("Domain keyword", ["All"] + explorer_keywords)
+        with filter_col4:
+            search_rq = st.selectbox("Research question", ["All"] + store.research_questions(run_id)) \
+                if store is not None else "All"
+        sort_col1, sort_col2, sort_col3 = st.columns([3, 1, 1])
+        with sort_col1:
+            sort_labels = {'Best match': None, 'Transcript order': 'document', 'File': 'file',
+                           'Code': 'code', 'Quote length': 'length'}
+            if store is None:
+                sort_labels.pop('Best match')
+            search_sort = sort_labels[st.selectbox(
+                "Sort by", list(sort_labels),
+                help="'Transcript order' is fastest on very large projects"
+            )]
+        with sort_col2:
+            search_descending = st.checkbox("Descending", value=False)
+        with sort_col3:
+            search_page = st.number_input("Page", min_value=1, value=1, step=1)
+
+        page_size = 25
+        search_filters = dict(
+            code=None if search_code == "All" else search_code,
+            file_name=None if search_file == "All" else search_file,
+            keyword=None if search_keyword == "All" else search_keyword
+        )
+        if store is not None:
+            search_filters.update(run_id=run_id, research_question=None if search_rq == "All" else search_rq)
+            hits = store.search_segments(
+                search_text, limit=page_size, offset=(search_page - 1) * page_size,
+                sort=search_sort, descending=search_descending, **search_filters
+            )
+            total_hits = store.count_search_hits(search_text, **search_filters)
+            hits = hits.rename(columns={'file_name': 'File'})
+            notes = hits['Notes'].fillna('')
+            hits['Domain_Keyword'] = notes.str.slice(len(DOMAIN_NOTE_PREFIX)).where(
+                notes.str.startswith(DOMAIN_NOTE_PREFIX), '')
+            hits = hits[['File', 'Segment_ID', 'Initial_Code', 'Domain_Keyword',
+                         'Snippet' if search_text.strip() else 'Interview_Text']]
+        else:
+            hits, total_hits = segment_table.query(
+                search_text, sort=search_sort, descending=search_descending,
+                limit=page_size, offset=(search_page - 1) * page_size, **search_filters
+            )
+        st.caption(f"{total_hits} matching segment(s) · page {search_page} of {max(1, -(-total_hits // page_size))}")
+        st.dataframe(hits, use_container_width=True, hide_index=True)
+
+        # Manual recoding: edits go through an IncrementalStages engine per file, which patches
+        # only the Stage 2 groups and Stage 3 themes a changed code belongs to
+        recodable = [fname for fname, s1, _, _ in results if s1 is not None and not s1.empty]
+        if recodable:
+            st.markdown("---")
+            st.markdown("### ✏️ Review & Recode")
+            recoders = st.session_state.get('recoders')
+            if recoders is None or recoders['results'] is not results:
+                recoders = {'results': results, 'engines': {}}
+                st.session_state['recoders'] = recoders
+            recode_col1, recode_col2, recode_col3 = st.columns([3, 3, 1])
+            with recode_col1:
+                recode_file = st.selectbox("Transcript", recodable, key="recode_file")
+            engine = recoders['engines'].get(recode_file)
+            if engine is None:
+                if run_id is not None:
+                    run_questions = get_project_store().get_run(run_id)['config'].get('research_questions', [])
+                else:
+                    run_questions = st.session_state.get('results_research_questions', [])
+                engine = IncrementalStages(results[results.file_names().index(recode_file)][1], run_questions)
+                recoders['engines'][recode_file] = engine
+            code_options = sorted(set(st.session_state.get('codebook', DEFAULT_CODEBOOK)) | set(engine.code_segments)
+                                  | {FALLBACK_CODE})
+            with recode_col2:
+                recode_filter = st.selectbox("Show segments coded as", ["All"] + sorted(engine.code_segments),
+                                             key="recode_filter")
+            recode_rows = engine.stage1 if recode_filter == "All" else \
+                engine.stage1.iloc[engine.code_segments[recode_filter]]
+            recode_page_size = 50
+            with recode_col3:
+                recode_page = st.number_input("Page", min_value=1, value=1, step=1, key="recode_page",
+                                              max_value=max(1, -(-len(recode_rows) // recode_page_size)))
+            recode_view = recode_rows.iloc[(recode_page - 1) * recode_page_size:recode_page * recode_page_size]
+            editor_key = f"recode_editor_{recode_file}_{recode_filter}_{recode_page}"
+            edited = st.data_editor(
+                recode_view[['Segment_ID', 'Interview_Text', 'Initial_Code']],
+                column_config={
+                    'Initial_Code': st.column_config.SelectboxColumn("Initial_Code", options=code_options, required=True)
+                },
+                disabled=['Segment_ID', 'Interview_Text'],
+                use_container_width=True,
+                hide_index=True,
+                key=editor_key
+            )
+            recode_changes = {
+                sid: new for sid, old, new in zip(recode_view['Segment_ID'], recode_view['Initial_Code'],
+                                                  edited['Initial_Code'])
+                if new != old
+            }
+            apply_col1, apply_col2 = st.columns([1, 1])
+            with apply_col1:
+                if st.button(f"✅ Apply {len(recode_changes)} change(s)", disabled=not recode_changes,
+                             use_container_width=True):
+                    touched_groups, touched_themes = engine.recode(recode_changes)
+                    results.replace(recode_file, engine.stage1, engine.stage2, engine.stage3)
+                    if run_id is not None:
+                        get_project_store().recode_transcript(run_id, recode_file, recode_changes,
+                                                              engine.stage2, engine.stage3)
+                    st.session_state['recode_notice'] = (
+                        f"Recoded {len(recode_changes)} segment(s) of {recode_file}; updated "
+                        f"{len(touched_groups)} group(s) and {len(touched_themes)} theme(s)."
+                    )
+                    del st.session_state[editor_key]
+                    st.rerun()
+            with apply_col2:
+                workbooks = [p for p in output_index(out_folder, [recode_file]).get(recode_file, [])
+                             if p.suffix == '.xlsx']
+                if st.button("💾 Update output workbooks", disabled=not workbooks, use_container_width=True):
+                    for path in workbooks:
+                        for suffix, table, sheet in (('_Stage1_Initial_Coding', engine.stage1, "Initial Coding"),
+                                                     ('_Stage2_Code_Grouping', engine.stage2, "Code Grouping"),
+                                                     ('_Stage3_Thematic_Framework', engine.stage3, "Thematic Framework")):
+                            if path.stem.endswith(suffix):
+                                create_excel_file(table, path, sheet_name=sheet)
+                    st.session_state['recode_notice'] = f"Rewrote {len(workbooks)} workbook(s) of {recode_file}."
+                    st.rerun()
+            if st.session_state.get('recode_notice'):
+                st.success(st.session_state.pop('recode_notice'))
+            with st.expander("Stage 2 and Stage 3 of this transcript", expanded=False):
+                st.dataframe(engine.stage2, use_container_width=True, hide_index=True)
+                st.dataframe(engine.stage3, use_container_width=True, hide_index=True)
+
+        # Indexed queries against the project store
+        if store is not None:
+            st.markdown("---")
+            st.markdown("### 🗂️ Project Store Queries")
+
+            query_col1, query_col2 = st.columns(2)
+            with query_col1:
+                code_counts = store.code_counts(run_id)
+                if not code_counts.empty:
+                    picked_code = st.selectbox("Segments coded as", options=code_counts['Code'].tolist())
+                    st.dataframe(
+                        store.segments_with_code(picked_code, run_id=run_id),
+                        use_container_width=True,
+                        hide_index=True
+                    )
+            with query_col2:
+                st.markdown("**Code counts per file:**")
+                st.dataframe(
+                    store.code_counts_per_file(run_id),
+                    use_container_width=True,
+                    hide_index=True
+                )
+
         # Aggregate analytics
         st.markdown("---")
         st.markdown("### 📈 Aggregate Analytics")
         
-        all_stage1 = pd.concat(
-            [r[1] for r in results if r[1] is not None and not r[1].empty],
-            ignore_index=True
-        ) if results else pd.DataFrame()
+        code_frequencies = results.code_frequencies()
         
-        if not all_stage1.empty:
+        if not code_frequencies.empty:
             analytics_col1, analytics_col2 = st.columns(2)
             
             with analytics_col1:
                 st.markdown("#### Top 10 Initial Codes")
-                top_codes = all_stage1['Initial_Code'].value_counts().head(10).reset_index()
+                top_codes = code_frequencies.head(10).reset_index()
                 top_codes.columns = ['Code', 'Frequency']
                 st.dataframe(
                     top_codes,
@@ -504,13 +1054,188 @@ with tab4:
             
             with analytics_col2:
                 st.markdown("#### Summary Statistics")
-                total_segments = len(all_stage1)
-                unique_codes = all_stage1['Initial_Code'].nunique()
+                total_segments = int(code_frequencies.sum())
+                unique_codes = len(code_frequencies)
                 avg_segments_per_file = total_segments / len(results) if results else 0
                 
                 st.metric("Total Segments Analyzed", total_segments)
                 st.metric("Unique Codes Identified", unique_codes)
                 st.metric("Avg Segments/File", f"{avg_segments_per_file:.1f}")
+
+            # Cross-case matrix: kept with the results and updated only for files added or recoded since
+            st.markdown("#### 🧮 Cross-Case Matrix")
+            cached_matrix = st.session_state.get('crosscase')
+            if cached_matrix is None or cached_matrix[0] is not results:
+                cached_matrix = (results, CrossCaseMatrix())
+                st.session_state['crosscase'] = cached_matrix
+            code_matrix = cached_matrix[1]
+            code_matrix.update(results)
+
+            cc1, cc2, cc3, cc4 = st.columns(4)
+            with cc1:
+                matrix_kind = st.selectbox("Columns", options=['Codes', 'Themes'], key='cc_kind')
+            with cc2:
+                matrix_norm = st.selectbox("Values", options=list(NORMALIZATIONS), key='cc_norm',
+                                           format_func={'count': 'Counts', 'row': 'Share of file',
+                                                        'column': 'Share of code/theme',
+                                                        'binary': 'Present (1/0)'}.get)
+            with cc3:
+                matrix_order = st.selectbox("Order rows and columns", options=list(ORDERS), index=2,
+                                            key='cc_order', format_func=str.capitalize)
+            with cc4:
+                matrix_clusters = st.number_input("Clusters", min_value=2, max_value=12, value=4, step=1,
+                                                  key='cc_clusters', disabled=matrix_order != 'cluster')
+            shown = code_matrix.themes() if matrix_kind == 'Themes' else code_matrix
+            heat = shown.to_frame(matrix_norm, matrix_order, matrix_order, int(matrix_clusters),
+                                  max_rows=40, max_columns=30)
+            st.caption(f"{shown.shape[0]} file(s) × {shown.shape[1]} {matrix_kind.lower()}; "
+                       f"{shown.matrix.nnz} non-zero cells" +
+                       (" — heatmap shows the first 40 × 30" if shown.shape[0] > 40 or shown.shape[1] > 30 else ""))
+            if heat.size:
+                cells = heat.reset_index().melt(id_vars=shown.row_label, var_name=shown.column_label,
+                                                value_name='Value')
+                heatmap = alt.Chart(cells).mark_rect().encode(
+                    x=alt.X(f'{shown.column_label}:N', sort=list(heat.columns), axis=alt.Axis(labelAngle=-45)),
+                    y=alt.Y(f'{shown.row_label}:N', sort=list(heat.index)),
+                    color=alt.Color('Value:Q', scale=alt.Scale(scheme='blues')),
+                    tooltip=[shown.row_label, shown.column_label, 'Value']
+                )
+                st.altair_chart(heatmap, use_container_width=True)
+            ex1, ex2 = st.columns(2)
+            with ex1:
+                st.download_button(
+                    "📥 Matrix (CSV, wide)",
+                    data=lambda: shown.to_frame(matrix_norm, matrix_order, matrix_order,
+                                                int(matrix_clusters)).to_csv().encode('utf-8'),
+                    file_name=f"crosscase_{matrix_kind.lower()}_{matrix_norm}.csv",
+                    mime="text/csv", use_container_width=True
+                )
+            with ex2:
+                st.download_button(
+                    "📥 Non-zero cells (CSV, long)",
+                    data=lambda: shown.to_long(matrix_norm).to_csv(index=False).encode('utf-8'),
+                    file_name=f"crosscase_{matrix_kind.lower()}_{matrix_norm}_long.csv",
+                    mime="text/csv", use_container_width=True
+                )
+
+            # Code co-occurrence: segment incidence kept per transcript, network recomputed as one sparse product
+            st.markdown("#### 🕸️ Code Co-occurrence")
+            co1, co2, co3 = st.columns(3)
+            with co1:
+                co_unit = st.selectbox("Codes co-occur within", options=list(UNITS), key='co_unit',
+                                       format_func={'segment': 'The same segment', 'window': 'A window of N segments',
+                                                    'transcript': 'The same transcript'}.get)
+                co_window = st.slider("Window (segments)", min_value=2, max_value=10, value=3, key='co_window',
+                                      disabled=co_unit != 'window')
+            with co2:
+                co_multi = st.checkbox("Count every codebook keyword hit (multi-label)", value=True, key='co_multi',
+                                       help="Otherwise each segment only has its Stage 1 code")
+                co_metric = st.selectbox("Edge weight", options=list(METRICS), key='co_metric')
+            with co3:
+                co_min = st.number_input("Minimum co-occurrences", min_value=1, value=2, step=1, key='co_min')
+                co_top = st.slider("Edges shown", min_value=5, max_value=100, value=30, step=5, key='co_top')
+
+            co_config = (coding_config_key(st.session_state['codebook'], st.session_state.get('domain_keywords', []))
+                         if co_multi else None)
+            cached_incidence = st.session_state.get('code_incidence')
+            if cached_incidence is None or cached_incidence[0] is not results or cached_incidence[1] != co_config:
+                coder = (MultiLabelCoder(st.session_state['codebook'], st.session_state.get('domain_keywords', []))
+                         if co_multi else None)
+                cached_incidence = (results, co_config, CodeIncidence(coder))
+                st.session_state['code_incidence'] = cached_incidence
+            incidence = cached_incidence[2]
+            with st.spinner("Indexing code hits..."):
+                incidence.update(results)
+            network = incidence.cooccurrence(co_unit, co_window)
+            edges = network.edges(min_count=int(co_min), sort_by=co_metric)
+            st.caption(f"{network.units:,} unit(s), {len(network.labels)} codes, {len(edges)} co-occurring pair(s)"
+                       + (" — multi-label hits use the current codebook and keywords" if co_multi else ""))
+            if edges.empty:
+                st.info("No pair of codes co-occurs often enough; widen the unit or lower the minimum")
+            else:
+                net_col, edge_col = st.columns([3, 2])
+                with net_col:
+                    st.graphviz_chart(to_dot(edges.head(co_top), dict(zip(network.labels, network.frequency.tolist())),
+                                             weight=co_metric), use_container_width=True)
+                with edge_col:
+                    st.dataframe(edges.head(co_top), use_container_width=True, hide_index=True)
+                    st.download_button(
+                        "📥 Edge list (CSV)",
+                        data=lambda: edges.to_csv(index=False).encode('utf-8'),
+                        file_name=f"cooccurrence_{co_unit}_edges.csv",
+                        mime="text/csv", use_container_width=True
+                    )
+
+            # Inter-coder agreement: these Stage 1 codes (A) against a coder's sheet or a saved run (B)
+            st.markdown("#### 🤝 Inter-coder Agreement")
+            ag1, ag2 = st.columns(2)
+            with ag1:
+                ag_source = st.radio("Compare with", options=['sheet', 'run'], horizontal=True, key='ag_source',
+                                     format_func={'sheet': 'Coding sheet(s)', 'run': 'A saved run'}.get)
+            with ag2:
+                ag_on = st.selectbox("Align segments by", options=['segment', 'text'], key='ag_on',
+                                     format_func={'segment': 'Segment ID', 'text': 'Segment text'}.get,
+                                     help="Segment text also pairs sheets that were re-sorted or renumbered")
+            reference_key, load_reference = None, None
+            if ag_source == 'sheet':
+                sheets = st.file_uploader(
+                    "Stage 1 sheets coded by hand (.xlsx/.csv with Segment_ID or text, and a code column)",
+                    type=['xlsx', 'csv'], accept_multiple_files=True, key='ag_sheets')
+                if sheets:
+                    reference_key = tuple((f.name, f.size) for f in sheets)
+                    load_reference = lambda: pd.concat([read_coding_sheet(f) for f in sheets], ignore_index=True)
+            elif past_runs.empty:
+                st.info("No saved runs in the project store yet")
+            else:
+                ag_run = st.selectbox("Saved run", options=[int(r) for r in past_runs['run_id']], key='ag_run',
+                                      format_func=lambda r: f"#{r}")
+                reference_key = ('run', ag_run)
+                load_reference = lambda: get_project_store().coding_table(ag_run)
+
+            if load_reference is not None:
+                cached_ref = st.session_state.get('agreement_reference')
+                try:
+                    if cached_ref is None or cached_ref[0] != reference_key:
+                        cached_ref = (reference_key, load_reference())
+                        st.session_state['agreement_reference'] = cached_ref
+                    own_key = tuple(results.stamps().items())
+                    cached_own = st.session_state.get('agreement_coding')
+                    if cached_own is None or cached_own[0] is not results or cached_own[1] != own_key:
+                        cached_own = (results, own_key, coding_table(results))
+                        st.session_state['agreement_coding'] = cached_own
+                    agreement = compare_codings(cached_own[2], cached_ref[1], on=ag_on)
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                    agreement = None
+                if agreement is not None and not agreement.n:
+                    st.warning("No segments could be paired; check the file names or try aligning by segment text")
+                elif agreement is not None:
+                    ag_summary = agreement.summary()
+                    m1, m2, m3, m4 = st.columns(4)
+                    with m1:
+                        st.metric("Segments Paired", f"{agreement.n:,}")
+                    with m2:
+                        st.metric("Observed Agreement", f"{ag_summary['observed_agreement']:.1%}")
+                    with m3:
+                        st.metric("Cohen's κ", f"{ag_summary['cohens_kappa']:.3f}")
+                    with m4:
+                        st.metric("Krippendorff's α", f"{ag_summary['krippendorffs_alpha']:.3f}")
+                    if ag_summary['only_a'] or ag_summary['only_b']:
+                        st.caption(f"{ag_summary['only_a']:,} segment(s) only in this analysis, "
+                                   f"{ag_summary['only_b']:,} only in the comparison (left out of the statistics)")
+                    pc_col, cf_col = st.columns([3, 2])
+                    with pc_col:
+                        st.markdown("**Per code** (the comparison as reference)")
+                        st.dataframe(agreement.per_code().round(3), use_container_width=True, hide_index=True)
+                    with cf_col:
+                        st.markdown("**Most frequent disagreements**")
+                        st.dataframe(agreement.confusions(20).round(3), use_container_width=True, hide_index=True)
+                    st.download_button(
+                        "📥 Disagreement report (CSV)",
+                        data=lambda: agreement.disagreements().to_csv(index=False).encode('utf-8'),
+                        file_name=f"agreement_{ag_on}_disagreements.csv",
+                        mime="text/csv", use_container_width=True
+                    )
     else:
         st.info("📊 No results available yet. Please run the analysis first in the Analysis tab.")
 
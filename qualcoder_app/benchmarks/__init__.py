@@ -0,0 +1,3 @@
+"""
+Performance benchmarks for qualcoder_core (see benchmarks/run_benchmarks.py).
+"""
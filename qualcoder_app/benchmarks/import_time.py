@@ -0,0 +1,86 @@
+"""
+Import-time benchmark for the entry modules.
+
+Every CLI call, Streamlit cold start and spawned job worker starts by importing
+qualcoder_core (worker processes import it through qualcoder_jobs), so its import
+cost is paid per process. Each module is imported in a fresh interpreter; the best
+of several runs is compared to a budget, and the heavy optional libraries (PDF, DOCX,
+Excel, TF-IDF) must not be loaded by the import itself.
+
+    python -m benchmarks.import_time                  # exit code 1 if over budget
+    python -m benchmarks.import_time --budget 0.8 --repeat 5
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+APP_DIR = Path(__file__).resolve().parent.parent
+ENTRY_MODULES = ['qualcoder_core', 'qualcoder_jobs', 'qualcoder_cli']
+HEAVY_MODULES = ('PyPDF2', 'docx', 'openpyxl', 'sklearn', 'scipy')
+IMPORT_BUDGET_SECONDS = float(os.environ.get('QUALCODER_IMPORT_BUDGET', '1.0'))
+
+_PROBE = """
+import sys, time, json
+t = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - t
+print(json.dumps({{'seconds': seconds, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module: str, repeat: int = 3) -> Dict:
+    """
+    Best-of-repeat seconds to import module in a new interpreter, and the heavy
+    libraries that import loaded.
+    """
+    best, heavy = float('inf'), []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=str(APP_DIR), capture_output=True, text=True, check=True
+        )
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        best = min(best, probe['seconds'])
+        heavy = probe['heavy']
+    return {'module': module, 'seconds': round(best, 4), 'heavy_modules': heavy}
+
+
+def check_imports(results: List[Dict], budget: float = IMPORT_BUDGET_SECONDS) -> List[str]:
+    """
+    Problems in measure_import results: imports over budget or loading heavy libraries.
+    """
+    problems = []
+    for result in results:
+        if result['seconds'] > budget:
+            problems.append(f"{result['module']}: import took {result['seconds']:.3f} s (budget {budget:.3f} s)")
+        if result['heavy_modules']:
+            problems.append(f"{result['module']}: import loads {', '.join(result['heavy_modules'])}")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='QualCoder Pro import-time benchmark')
+    parser.add_argument('--modules', nargs='+', default=ENTRY_MODULES, help='Modules to import')
+    parser.add_argument('--budget', type=float, default=IMPORT_BUDGET_SECONDS,
+                        help='Seconds allowed per import (default: QUALCODER_IMPORT_BUDGET or 1.0)')
+    parser.add_argument('--repeat', type=int, default=3, help='Fresh interpreters per module (best is kept)')
+    args = parser.parse_args(argv)
+
+    results = [measure_import(module, args.repeat) for module in args.modules]
+    for r in results:
+        print(f"{r['module']:<20} {r['seconds'] * 1000:8.1f} ms   heavy modules loaded: {', '.join(r['heavy_modules']) or '-'}")
+    problems = check_imports(results, args.budget)
+    for p in problems:
+        print(f"REGRESSION {p}")
+    if not problems:
+        print(f"All imports within {args.budget:.2f} s")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
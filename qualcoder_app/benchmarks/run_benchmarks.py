@@ -0,0 +1,278 @@
+"""
+Scaling benchmarks for the public qualcoder_core functions.
+
+Each benchmark runs at several input sizes on deterministic synthetic transcripts
+(benchmarks/synthetic.py) and reports seconds, throughput and the scaling exponent
+k in time ~ n^k (least squares on log-log). Timings are also normalized by a fixed
+pure-Python calibration loop so results from different machines can be compared.
+
+    python -m benchmarks.run_benchmarks                      # run and compare to baseline.json
+    python -m benchmarks.run_benchmarks --quick --output bench.json
+    python -m benchmarks.run_benchmarks --save-baseline      # refresh the stored baseline
+"""
+
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import platform
+import tempfile
+
+from benchmarks.synthetic import generate_transcript
+from qualcoder_core import (
+    extract_participant_responses, split_into_sentences, generate_initial_code,
+    stage1_initial_coding, stage2_code_grouping, stage3_thematic_framework,
+    suggest_keywords_from_texts, create_excel_file, __version__
+)
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baseline.json'
+DEFAULT_SCALES = [250, 500, 1000, 2000]
+QUICK_SCALES = [100, 200, 400]
+EXPONENT_TOLERANCE = 0.25   # allowed growth of the scaling exponent
+THROUGHPUT_TOLERANCE = 0.35  # allowed drop of calibrated throughput
+SCRATCH_DIR = Path(tempfile.gettempdir()) / 'qualcoder_bench'  # overwritten on every run
+
+# name -> (unit, setup(n) -> zero-arg callable that does the work and returns the unit count)
+Benchmark = Tuple[str, Callable[[int], Callable[[], int]]]
+
+
+def calibrate(rounds: int = 5) -> float:
+    """
+    Best-of-rounds time of a fixed pure-Python workload (dict, string and arithmetic
+    operations similar to the coding loop). Timings divided by this are machine-neutral.
+    """
+    best = float('inf')
+    for _ in range(rounds):
+        t = time.perf_counter()
+        counts: Dict[str, int] = {}
+        acc = 0
+        for i in range(200000):
+            key = 'k' + str(i % 97)
+            counts[key] = counts.get(key, 0) + 1
+            acc += len(key) * (i & 7)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def _corpus(n: int, **kwargs):
+    return generate_transcript(turns=n, seed=n, **kwargs)
+
+
+def _bench_extract(n):
+    text = _corpus(n).text
+    return lambda: len(extract_participant_responses(text))
+
+
+def _bench_split(n):
+    text = ' '.join(extract_participant_responses(_corpus(n).text))
+    return lambda: len(split_into_sentences(text))
+
+
+def _bench_generate_code(n):
+    corpus = _corpus(n)
+    sentences = split_into_sentences(' '.join(extract_participant_responses(corpus.text)))
+
+    def run():
+        for s in sentences:
+            generate_initial_code(s, corpus.codebook, corpus.domain_keywords)
+        return len(sentences)
+    return run
+
+
+def _bench_generate_code_codebook(n):
+    # Fixed 100-turn transcript; the codebook grows with n (n / 5 codes)
+    corpus = generate_transcript(turns=100, codebook_size=max(n // 5, 1), seed=0)
+    sentences = split_into_sentences(' '.join(extract_participant_responses(corpus.text)))
+
+    def run():
+        for s in sentences:
+            generate_initial_code(s, corpus.codebook, corpus.domain_keywords)
+        return len(sentences)
+    return run
+
+
+def _bench_stage1(n):
+    corpus = _corpus(n)
+    return lambda: len(stage1_initial_coding(corpus.text, 'bench', corpus.codebook, corpus.domain_keywords))
+
+
+def _stage1_df(n):
+    corpus = _corpus(n)
+    return corpus, stage1_initial_coding(corpus.text, 'bench', corpus.codebook, corpus.domain_keywords)
+
+
+def _bench_stage2(n):
+    _, s1 = _stage1_df(n)
+    return lambda: len(s1) if stage2_code_grouping(s1) is not None else 0
+
+
+def _bench_stage3(n):
+    corpus, s1 = _stage1_df(n)
+    return lambda: len(s1) if stage3_thematic_framework(s1, corpus.research_questions) is not None else 0
+
+
+def _bench_suggest_keywords(n):
+    texts = extract_participant_responses(_corpus(n).text)
+    return lambda: len(texts) if suggest_keywords_from_texts(texts) is not None else 0
+
+
+def _bench_create_excel(n):
+    _, s1 = _stage1_df(n)
+    target = SCRATCH_DIR / f'stage1_{n}.xlsx'
+
+    def run():
+        create_excel_file(s1, target, 'Stage1')
+        return len(s1)
+    return run
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    'extract_participant_responses': ('turns', _bench_extract),
+    'split_into_sentences': ('sentences', _bench_split),
+    'generate_initial_code': ('segments', _bench_generate_code),
+    'generate_initial_code_by_codebook': ('segments', _bench_generate_code_codebook),
+    'stage1_initial_coding': ('segments', _bench_stage1),
+    'stage2_code_grouping': ('segments', _bench_stage2),
+    'stage3_thematic_framework': ('segments', _bench_stage3),
+    'suggest_keywords_from_texts': ('texts', _bench_suggest_keywords),
+    'create_excel_file': ('rows', _bench_create_excel),
+}
+
+
+def time_call(fn: Callable[[], int], repeat: int) -> Tuple[float, int]:
+    best, units = float('inf'), 0
+    for _ in range(repeat):
+        t = time.perf_counter()
+        units = fn()
+        best = min(best, time.perf_counter() - t)
+    return best, units
+
+
+def scaling_exponent(ns: List[int], seconds: List[float]) -> Optional[float]:
+    """
+    Slope of log(seconds) against log(n); 1.0 is linear, 2.0 quadratic.
+    """
+    pts = [(math.log(n), math.log(s)) for n, s in zip(ns, seconds) if n > 0 and s > 0]
+    if len(pts) < 2:
+        return None
+    mx = sum(x for x, _ in pts) / len(pts)
+    my = sum(y for _, y in pts) / len(pts)
+    var = sum((x - mx) ** 2 for x, _ in pts)
+    return sum((x - mx) * (y - my) for x, y in pts) / var if var else None
+
+
+def run_benchmarks(scales: List[int], names: Optional[List[str]] = None, repeat: int = 3) -> Dict:
+    calibration = calibrate()
+    report = {
+        'version': __version__,
+        'host': {'hostname': platform.node(), 'python': platform.python_version()},
+        'calibration_seconds': round(calibration, 6),
+        'scales': scales,
+        'benchmarks': {},
+    }
+    for name in names or list(BENCHMARKS):
+        unit, setup = BENCHMARKS[name]
+        rows = []
+        for n in scales:
+            seconds, units = time_call(setup(n), repeat)
+            rows.append({
+                'n': n,
+                'units': units,
+                'seconds': round(seconds, 6),
+                'throughput': round(units / seconds, 3) if seconds else None,
+                # units per calibration loop: comparable across machines
+                'calibrated_throughput': round(units * calibration / seconds, 3) if seconds else None,
+            })
+        exponent = scaling_exponent([r['n'] for r in rows], [r['seconds'] for r in rows])
+        report['benchmarks'][name] = {
+            'unit': unit,
+            'results': rows,
+            'exponent': round(exponent, 3) if exponent is not None else None,
+        }
+    return report
+
+
+def compare_to_baseline(
+    report: Dict,
+    baseline: Dict,
+    exponent_tolerance: float = EXPONENT_TOLERANCE,
+    throughput_tolerance: float = THROUGHPUT_TOLERANCE
+) -> List[str]:
+    """
+    Regressions of report against baseline: scaling exponents (measured at the same
+    scales) that grew by more than exponent_tolerance, or calibrated throughput at the largest shared scale that dropped
+    by more than throughput_tolerance. An empty list means no regression.
+    """
+    problems = []
+    for name, bench in report['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if not base:
+            continue
+        same_scales = [r['n'] for r in bench['results']] == [r['n'] for r in base['results']]
+        if same_scales and bench['exponent'] is not None and base.get('exponent') is not None \
+                and bench['exponent'] > base['exponent'] + exponent_tolerance:
+            problems.append(f"{name}: scaling exponent {bench['exponent']:.2f} vs baseline {base['exponent']:.2f}")
+        base_rows = {r['n']: r for r in base['results']}
+        shared = [r for r in bench['results'] if r['n'] in base_rows]
+        if shared:
+            row = shared[-1]
+            old = base_rows[row['n']]['calibrated_throughput']
+            new = row['calibrated_throughput']
+            if old and new is not None and new < old * (1 - throughput_tolerance):
+                problems.append(
+                    f"{name}: calibrated throughput at n={row['n']} is {new:.1f} vs baseline {old:.1f} "
+                    f"({(1 - new / old) * 100:.0f}% slower)"
+                )
+    return problems
+
+
+def format_report(report: Dict) -> str:
+    lines = [f"calibration loop: {report['calibration_seconds'] * 1000:.1f} ms"]
+    for name, bench in report['benchmarks'].items():
+        exp = bench['exponent']
+        lines.append(f"{name} (exponent {exp if exp is not None else '-'})")
+        for r in bench['results']:
+            lines.append(f"  n={r['n']:>6}  {r['seconds'] * 1000:10.2f} ms  {r['throughput']:>12,.0f} {bench['unit']}/s")
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='QualCoder Pro core benchmarks')
+    parser.add_argument('--quick', action='store_true', help=f'Small scales {QUICK_SCALES}')
+    parser.add_argument('--scales', type=int, nargs='+', help='Transcript sizes in participant turns')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='Run a subset of benchmarks')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repeats (best is kept)')
+    parser.add_argument('--output', help='Write the JSON report here')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='Baseline report to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline')
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+
+    scales = args.scales or (QUICK_SCALES if args.quick else DEFAULT_SCALES)
+    report = run_benchmarks(scales, args.only, args.repeat)
+    print(format_report(report))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding='utf-8')
+    if args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --save-baseline to create one")
+        return 0
+    problems = compare_to_baseline(report, json.loads(baseline_path.read_text(encoding='utf-8')))
+    for p in problems:
+        print(f"REGRESSION {p}")
+    if not problems:
+        print("No regressions against baseline")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
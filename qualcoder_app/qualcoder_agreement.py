@@ -0,0 +1,309 @@
+"""
+qualcoder_agreement.py
+Inter-coder agreement between two codings of the same transcripts: the automatic
+Stage 1 codes against a human coder's sheet, or one codebook version against
+another. Segments are aligned with a hash join on (transcript, Segment_ID), on the
+stored text offsets or on a hash of the normalized segment text; Cohen's kappa,
+Krippendorff's alpha and the per-code precision/recall all come from one confusion
+matrix built with a single bincount, so comparing 100k segments takes well under a
+second and can be redone after every codebook change.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ALIGNMENTS = ('segment', 'offset', 'text')
+CODING_COLUMNS = ['File', 'Segment_ID', 'Interview_Text', 'Initial_Code', 'Start']
+PER_CODE_COLUMNS = ['Code', 'Coded_A', 'Coded_B', 'Agreed', 'Precision', 'Recall', 'F1', 'Kappa']
+CONFUSION_COLUMNS = ['Code_A', 'Code_B', 'Segments', 'Share']
+DISAGREEMENT_COLUMNS = ['File', 'Segment_ID_A', 'Segment_ID_B', 'Interview_Text', 'Code_A', 'Code_B', 'Status']
+UNCODED = '(uncoded)'
+STAGE1_SUFFIX = '_Stage1_Initial_Coding'
+
+# accepted spellings of the coding columns in a hand-edited sheet (compared lowercased)
+_ALIASES = {
+    'File': ('file', 'file_name', 'transcript'),
+    'Segment_ID': ('segment_id', 'segment', 'id'),
+    'Interview_Text': ('interview_text', 'text', 'segment_text'),
+    'Initial_Code': ('initial_code', 'code', 'final_code'),
+    'Start': ('start', 'start_offset'),
+}
+_SPACE = r'\s+'
+
+
+def coding_table(results, file_name: Optional[str] = None) -> pd.DataFrame:
+    """
+    A coding as one table with CODING_COLUMNS: from [(file_name, stage1, stage2, stage3)]
+    (or a SessionResults), or from a single Stage 1 frame or hand-edited sheet, whose
+    columns may use the names in _ALIASES. file_name fills in a missing File column.
+    """
+    if isinstance(results, pd.DataFrame):
+        return _normalize_columns(results, file_name)
+    frames = [_normalize_columns(s1, fname) for fname, s1, _, _ in results if s1 is not None and not s1.empty]
+    if not frames:
+        return pd.DataFrame(columns=CODING_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _normalize_columns(df: pd.DataFrame, file_name: Optional[str]) -> pd.DataFrame:
+    lookup = {str(c).strip().lower(): c for c in df.columns}
+    found = {col: next((lookup[a] for a in aliases if a in lookup), None) for col, aliases in _ALIASES.items()}
+    if found['Initial_Code'] is None:
+        raise ValueError(f"No code column (expected one of {', '.join(_ALIASES['Initial_Code'])})")
+    if found['Segment_ID'] is None and found['Interview_Text'] is None:
+        raise ValueError("A coding needs a Segment_ID or an Interview_Text column to be aligned")
+    n = len(df)
+    out = pd.DataFrame(index=pd.RangeIndex(n))
+    for col in CODING_COLUMNS:
+        source = found[col]
+        if source is not None:
+            out[col] = df[source].to_numpy()
+        elif col == 'File':
+            out[col] = file_name
+        else:
+            out[col] = None
+    codes = out['Initial_Code'].astype(object)
+    blank = codes.isna() | (codes.astype(str).str.strip() == '')
+    out['Initial_Code'] = codes.where(~blank, UNCODED).astype(str).str.strip()
+    return out
+
+
+def read_coding_sheet(source, file_name: Optional[str] = None) -> pd.DataFrame:
+    """
+    A coding sheet (.csv or .xlsx; a path or an uploaded file) as a coding_table. A
+    sheet without a File column is taken to code file_name, or the transcript named
+    in a '<transcript>_Stage1_Initial_Coding.xlsx' output file name.
+    """
+    name = str(getattr(source, 'name', source))
+    if Path(name).suffix.lower() == '.csv':
+        df = pd.read_csv(source, dtype=object)
+    else:
+        df = pd.read_excel(source, dtype=object)
+    if file_name is None:
+        stem = Path(name).stem
+        file_name = stem[:-len(STAGE1_SUFFIX)] if stem.endswith(STAGE1_SUFFIX) else stem
+    return coding_table(df, file_name)
+
+
+def read_stage1_folder(folder: Path) -> pd.DataFrame:
+    """
+    The Stage 1 workbooks of a run's output folder as one coding_table.
+    """
+    sheets = sorted(Path(folder).rglob(f"*{STAGE1_SUFFIX}.xlsx"))
+    if not sheets:
+        raise ValueError(f"No *{STAGE1_SUFFIX}.xlsx files in {folder}")
+    return pd.concat([read_coding_sheet(p) for p in sheets], ignore_index=True)
+
+
+def _file_keys(files: pd.Series) -> np.ndarray:
+    """
+    Transcript names reduced to their stem, so 'a.txt', 'a.docx' and a sheet named
+    after 'a' align; computed once per distinct name.
+    """
+    codes, uniques = pd.factorize(files.fillna('').astype(str))
+    stems = np.array([Path(u).stem.lower() for u in uniques] + [''], dtype=object)
+    return stems[codes]
+
+
+def _segment_keys(table: pd.DataFrame, on: str, use_file: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    A 64-bit hash per row of the alignment key and whether the row can be aligned at
+    all (it has the key). Repeated keys are told apart by their occurrence number.
+    """
+    if on == 'segment':
+        key = table['Segment_ID'].astype(object)
+        valid = key.notna().to_numpy()
+        key = key.astype(str).str.strip()
+    elif on == 'offset':
+        key = pd.to_numeric(table['Start'], errors='coerce')
+        valid = key.notna().to_numpy()
+        key = key.fillna(-1).astype('int64')
+    elif on == 'text':
+        key = table['Interview_Text'].astype(object)
+        valid = key.notna().to_numpy()
+        key = key.astype(str).str.lower().str.replace(_SPACE, ' ', regex=True).str.strip()
+    else:
+        raise ValueError(f"Unknown alignment: {on}")
+    parts = {'key': key.to_numpy()}
+    if use_file:
+        parts['file'] = _file_keys(table['File'])
+    hashes = pd.util.hash_pandas_object(pd.DataFrame(parts), index=False).to_numpy()
+    return hashes, valid
+
+
+class AgreementReport:
+    """
+    Two codings aligned segment by segment (coding A against reference B) and their
+    confusion matrix: rows are A's codes, columns B's, over the sorted union of both.
+    Segments only one side has are kept for the disagreement report but, as in
+    Krippendorff's treatment of missing values, do not enter the statistics.
+    """
+
+    def __init__(self, a: pd.DataFrame, b: pd.DataFrame, ia: np.ndarray, ib: np.ndarray,
+                 only_a: np.ndarray, only_b: np.ndarray, on: str):
+        self.a, self.b, self.on = a, b, on
+        self.ia, self.ib = ia, ib
+        self.only_a, self.only_b = only_a, only_b
+        both = np.concatenate([a['Initial_Code'].to_numpy(dtype=object)[ia],
+                               b['Initial_Code'].to_numpy(dtype=object)[ib]])
+        codes, labels = pd.factorize(both, sort=True)
+        self.labels: List[str] = list(labels)
+        k = len(self.labels)
+        self.code_a, self.code_b = codes[:len(ia)], codes[len(ia):]
+        self.confusion = np.bincount(self.code_a * k + self.code_b, minlength=k * k).reshape(k, k)
+
+    @property
+    def n(self) -> int:
+        """Number of aligned segments."""
+        return len(self.ia)
+
+    def observed(self) -> float:
+        return float(np.trace(self.confusion) / self.n) if self.n else float('nan')
+
+    def kappa(self) -> float:
+        """
+        Cohen's kappa: observed agreement corrected for the agreement expected from
+        each coder's own code distribution.
+        """
+        if not self.n:
+            return float('nan')
+        expected = float(self.confusion.sum(axis=1) @ self.confusion.sum(axis=0)) / self.n ** 2
+        return (self.observed() - expected) / (1 - expected) if expected < 1 else float('nan')
+
+    def alpha(self) -> float:
+        """
+        Krippendorff's alpha for nominal codes, two coders: from the coincidence
+        matrix (the confusion matrix plus its transpose).
+        """
+        total = 2 * self.n
+        coincidence = self.confusion + self.confusion.T
+        values = coincidence.sum(axis=0).astype(np.float64)
+        expected = total * total - float(values @ values)
+        if not self.n or expected <= 0:
+            return float('nan')
+        return 1 - (total - 1) * float(total - np.trace(coincidence)) / expected
+
+    def per_code(self) -> pd.DataFrame:
+        """
+        Per code, with B as the reference: how often each side used it, how often they
+        agreed, precision/recall/F1 of A, and the kappa of the code-vs-rest split.
+        """
+        c = self.confusion.astype(np.float64)
+        tp = np.diag(c)
+        coded_a, coded_b = c.sum(axis=1), c.sum(axis=0)
+        fp, fn = coded_a - tp, coded_b - tp
+        tn = self.n - tp - fp - fn
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.where(coded_a > 0, tp / coded_a, np.nan)
+            recall = np.where(coded_b > 0, tp / coded_b, np.nan)
+            f1 = np.where(coded_a + coded_b > 0, 2 * tp / (coded_a + coded_b), np.nan)
+            chance = (tp + fp) * (fp + tn) + (tp + fn) * (fn + tn)
+            kappa = np.where(chance > 0, 2 * (tp * tn - fn * fp) / chance, np.nan)
+        frame = pd.DataFrame({
+            'Code': self.labels, 'Coded_A': coded_a.astype('int64'), 'Coded_B': coded_b.astype('int64'),
+            'Agreed': tp.astype('int64'), 'Precision': precision, 'Recall': recall, 'F1': f1, 'Kappa': kappa,
+        }, columns=PER_CODE_COLUMNS)
+        return frame.sort_values(['Coded_B', 'Code'], ascending=[False, True], kind='stable', ignore_index=True)
+
+    def confusions(self, top: Optional[int] = None) -> pd.DataFrame:
+        """
+        The off-diagonal cells (A said one code, B another), most frequent first.
+        """
+        off = self.confusion.copy()
+        np.fill_diagonal(off, 0)
+        rows, cols = np.nonzero(off)
+        counts = off[rows, cols]
+        order = np.lexsort((cols, rows, -counts))[:top]
+        labels = np.array(self.labels, dtype=object)
+        disagreed = max(self.n - int(np.trace(self.confusion)), 1)
+        return pd.DataFrame({
+            'Code_A': labels[rows[order]] if len(order) else [],
+            'Code_B': labels[cols[order]] if len(order) else [],
+            'Segments': counts[order].astype('int64'),
+            'Share': counts[order] / disagreed,
+        }, columns=CONFUSION_COLUMNS)
+
+    def disagreements(self) -> pd.DataFrame:
+        """
+        Every aligned segment the codings disagree on, then the segments only A or
+        only B has.
+        """
+        differ = self.code_a != self.code_b
+        ia, ib = self.ia[differ], self.ib[differ]
+
+        def _col(table: pd.DataFrame, col: str, rows: np.ndarray) -> np.ndarray:
+            return table[col].take(rows).to_numpy(dtype=object)
+
+        def _none(n: int) -> np.ndarray:
+            return np.full(n, None, dtype=object)
+
+        parts = [
+            pd.DataFrame({
+                'File': _col(self.a, 'File', ia), 'Segment_ID_A': _col(self.a, 'Segment_ID', ia),
+                'Segment_ID_B': _col(self.b, 'Segment_ID', ib), 'Interview_Text': _col(self.a, 'Interview_Text', ia),
+                'Code_A': _col(self.a, 'Initial_Code', ia), 'Code_B': _col(self.b, 'Initial_Code', ib),
+                'Status': 'disagree',
+            }, columns=DISAGREEMENT_COLUMNS),
+            pd.DataFrame({
+                'File': _col(self.a, 'File', self.only_a), 'Segment_ID_A': _col(self.a, 'Segment_ID', self.only_a),
+                'Segment_ID_B': _none(len(self.only_a)), 'Interview_Text': _col(self.a, 'Interview_Text', self.only_a),
+                'Code_A': _col(self.a, 'Initial_Code', self.only_a), 'Code_B': _none(len(self.only_a)),
+                'Status': 'only A',
+            }, columns=DISAGREEMENT_COLUMNS),
+            pd.DataFrame({
+                'File': _col(self.b, 'File', self.only_b), 'Segment_ID_A': _none(len(self.only_b)),
+                'Segment_ID_B': _col(self.b, 'Segment_ID', self.only_b),
+                'Interview_Text': _col(self.b, 'Interview_Text', self.only_b),
+                'Code_A': _none(len(self.only_b)), 'Code_B': _col(self.b, 'Initial_Code', self.only_b),
+                'Status': 'only B',
+            }, columns=DISAGREEMENT_COLUMNS),
+        ]
+        return pd.concat([p for p in parts if len(p)] or parts[:1], ignore_index=True)
+
+    def summary(self) -> Dict:
+        return {
+            'alignment': self.on,
+            'aligned_segments': self.n,
+            'only_a': len(self.only_a),
+            'only_b': len(self.only_b),
+            'codes': len(self.labels),
+            'observed_agreement': self.observed(),
+            'cohens_kappa': self.kappa(),
+            'krippendorffs_alpha': self.alpha(),
+        }
+
+
+def compare_codings(a: pd.DataFrame, b: pd.DataFrame, on: str = 'segment') -> AgreementReport:
+    """
+    Align coding A with reference coding B (both coding_table frames) and build their
+    AgreementReport. on='segment' joins on Segment_ID, 'offset' on the stored start
+    offsets, 'text' on the normalized segment text (for sheets that were re-sorted or
+    renumbered). Transcripts are matched by name stem unless either side has no File
+    column, in which case the key alone is used.
+    """
+    if on not in ALIGNMENTS:
+        raise ValueError(f"Unknown alignment: {on}")
+    use_file = bool(a['File'].notna().any() and b['File'].notna().any())
+    ha, valid_a = _segment_keys(a, on, use_file)
+    hb, valid_b = _segment_keys(b, on, use_file)
+    left = pd.DataFrame({'key': ha[valid_a], 'ia': np.flatnonzero(valid_a)})
+    right = pd.DataFrame({'key': hb[valid_b], 'ib': np.flatnonzero(valid_b)})
+    left['occurrence'] = left.groupby('key', sort=False).cumcount()
+    right['occurrence'] = right.groupby('key', sort=False).cumcount()
+    joined = left.merge(right, on=['key', 'occurrence'], how='outer', sort=False)
+    paired = joined['ia'].notna() & joined['ib'].notna()
+    ia = joined.loc[paired, 'ia'].to_numpy(dtype=np.int64)
+    order = np.argsort(ia, kind='stable')  # keep A's order
+    ia, ib = ia[order], joined.loc[paired, 'ib'].to_numpy(dtype=np.int64)[order]
+    only_a = np.sort(np.concatenate([np.flatnonzero(~valid_a),
+                                     joined.loc[joined['ib'].isna(), 'ia'].to_numpy(dtype=np.int64)]))
+    only_b = np.sort(np.concatenate([np.flatnonzero(~valid_b),
+                                     joined.loc[joined['ia'].isna(), 'ib'].to_numpy(dtype=np.int64)]))
+    if len(only_a) or len(only_b):
+        logger.info(f"Agreement ({on}): {len(ia)} aligned, {len(only_a)} only in A, {len(only_b)} only in B")
+    return AgreementReport(a, b, ia, ib, only_a, only_b, on)
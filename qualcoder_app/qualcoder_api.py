@@ -0,0 +1,489 @@
+"""
+qualcoder_api.py
+Optional local HTTP API around the pipeline (standard library only), for
+pushing transcripts and pulling coded results from other systems.
+
+    POST   /api/uploads                 multipart/form-data (one or more "file" parts, .zip allowed)
+                                        or a raw body with an X-Filename header
+    POST   /api/jobs                    {"upload_id", "research_questions", "project_name"?,
+                                         "domain_keywords"?, "codebook"?, "streaming"?}
+    GET    /api/jobs                    recent jobs
+    GET    /api/jobs/<id>               job status
+    GET    /api/jobs/<id>/events        progress as server-sent events until the job finishes
+    GET    /api/jobs/<id>/results       Stage 1/2/3 rows per file as JSON
+    GET    /api/jobs/<id>/outputs       list of output files
+    GET    /api/jobs/<id>/outputs.zip   all outputs as one zip
+    GET    /api/jobs/<id>/outputs/<f>   one output file
+    POST   /api/jobs/<id>/resume        re-queue a cancelled or failed job; completed files are skipped
+    DELETE /api/jobs/<id>               cancel a queued job, or stop a running one after its current file
+
+Uploads are streamed to disk; runs go through the job queue (qualcoder_jobs) so
+several requests and several analyses proceed concurrently. Set QUALCODER_API_TOKEN
+to require "Authorization: Bearer <token>".
+"""
+
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, unquote
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import zipfile
+
+from qualcoder_core import DEFAULT_CODEBOOK, __version__
+from qualcoder_jobs import JobQueue, start_workers, DEFAULT_JOBS_PATH, FINISHED_STATUSES
+from qualcoder_store import ProjectStore, DEFAULT_STORE_PATH
+from qualcoder_retention import touch_run
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+TOKEN_ENV = 'QUALCODER_API_TOKEN'
+TRANSCRIPT_SUFFIXES = ('.txt', '.docx', '.pdf')
+MAX_UPLOAD_BYTES = 1024 * 1024 * 1024  # 1 GB per request, also caps unzipped size
+CHUNK_SIZE = 64 * 1024
+
+
+class APIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _safe_filename(name: str) -> str:
+    name = Path(name.replace('\\', '/')).name
+    name = re.sub(r'[^\w.\- ]+', '_', name).strip()
+    if not name or name.startswith('.'):
+        raise APIError(400, f"Invalid file name {name!r}")
+    return name
+
+
+class MultipartReader:
+    """
+    Incremental multipart/form-data parser. Feed it the body in chunks; part bodies
+    are handed to on_part(headers) -> write(bytes) callables as they arrive, so
+    uploads never have to fit in memory.
+    """
+
+    def __init__(self, boundary: bytes, on_part: Callable[[Dict[str, str]], Callable[[Optional[bytes]], None]]):
+        self.delimiter = b'\r\n--' + boundary
+        self.on_part = on_part
+        self.buf = b'\r\n'  # lets the first boundary match the same delimiter
+        self.writer = None
+        self.state = 'preamble'  # preamble -> headers -> body -> ... -> done
+
+    @staticmethod
+    def _parse_headers(raw: bytes) -> Dict[str, str]:
+        headers = {}
+        for line in raw.decode('utf-8', 'replace').split('\r\n'):
+            key, _, value = line.partition(':')
+            if key:
+                headers[key.strip().lower()] = value.strip()
+        disposition = headers.get('content-disposition', '')
+        for key, value in re.findall(r'(\w+)="([^"]*)"', disposition):
+            headers[key.lower()] = value
+        return headers
+
+    def feed(self, data: bytes):
+        self.buf += data
+        while self.state != 'done':
+            if self.state == 'headers':
+                end = self.buf.find(b'\r\n\r\n')
+                if end < 0:
+                    return
+                self.writer = self.on_part(self._parse_headers(self.buf[:end]))
+                self.buf = self.buf[end + 4:]
+                self.state = 'body'
+            idx = self.buf.find(self.delimiter)
+            if idx < 0:
+                keep = len(self.delimiter) + 2  # a delimiter may straddle the next chunk
+                if len(self.buf) > keep:
+                    if self.state == 'body':
+                        self.writer(self.buf[:-keep])
+                    self.buf = self.buf[-keep:]
+                return
+            after = idx + len(self.delimiter)
+            if len(self.buf) < after + 2:
+                return  # need the two bytes telling the next part from the end marker
+            if self.state == 'body':
+                self.writer(self.buf[:idx])
+                self.writer(None)
+                self.writer = None
+            if self.buf[after:after + 2] == b'--':
+                self.state = 'done'
+                self.buf = b''
+                return
+            self.buf = self.buf[after + 2:]
+            self.state = 'headers'
+
+    def close(self):
+        if self.state != 'done':
+            raise APIError(400, "Truncated multipart body")
+
+
+class UploadSet:
+    """
+    Collects the transcripts of one upload request into a job inputs folder,
+    expanding zip archives as they arrive.
+    """
+
+    def __init__(self, folder: Path, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.fields: Dict[str, str] = {}
+        self.files: List[str] = []
+        self._written = 0
+
+    def _count(self, n: int):
+        self._written += n
+        if self._written > self.max_bytes:
+            raise APIError(413, f"Upload larger than {self.max_bytes} bytes")
+
+    def open_file(self, filename: str) -> Callable[[Optional[bytes]], None]:
+        name = _safe_filename(filename)
+        if not name.lower().endswith(TRANSCRIPT_SUFFIXES + ('.zip',)):
+            raise APIError(415, f"Unsupported file type: {name}")
+        path = self.folder / name
+        f = open(path, 'wb')
+
+        def write(chunk: Optional[bytes]):
+            if chunk is None:
+                f.close()
+                self._add(path)
+                return
+            self._count(len(chunk))
+            f.write(chunk)
+        return write
+
+    def _add(self, path: Path):
+        if path.suffix.lower() != '.zip':
+            if path.name not in self.files:
+                self.files.append(path.name)
+            return
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                base = Path(info.filename).name
+                if info.is_dir() or base.startswith('.') or not base.lower().endswith(TRANSCRIPT_SUFFIXES):
+                    continue  # folders, macOS resource forks, non-transcripts
+                name = _safe_filename(info.filename)
+                self._count(info.file_size)
+                with zf.open(info) as src, open(self.folder / name, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                if name not in self.files:
+                    self.files.append(name)
+        path.unlink()
+
+    def on_part(self, headers: Dict[str, str]) -> Callable[[Optional[bytes]], None]:
+        if headers.get('filename'):
+            return self.open_file(headers['filename'])
+        name, value = headers.get('name', ''), []
+
+        def write(chunk: Optional[bytes]):
+            if chunk is None:
+                self.fields[name] = b''.join(value).decode('utf-8', 'replace')
+            else:
+                self._count(len(chunk))
+                value.append(chunk)
+        return write
+
+
+class QualCoderAPI:
+    """
+    Request handling independent of the HTTP plumbing: holds the job queue and store.
+    """
+
+    def __init__(self, queue: JobQueue, store: ProjectStore, token: Optional[str] = None,
+                 max_upload_bytes: int = MAX_UPLOAD_BYTES, poll_interval: float = 0.5):
+        self.queue = queue
+        self.store = store
+        self.token = token
+        self.max_upload_bytes = max_upload_bytes
+        self.poll_interval = poll_interval
+
+    def upload_dir(self, upload_id: str) -> Path:
+        if not re.fullmatch(r'[\w\-]+', upload_id or ''):
+            raise APIError(400, "Invalid upload_id")
+        folder = self.queue.jobs_dir / upload_id
+        if not folder.is_dir():
+            raise APIError(404, f"Unknown upload_id {upload_id}")
+        return folder
+
+    def create_job(self, body: Dict) -> Dict:
+        folder = self.upload_dir(body.get('upload_id'))
+        rqs = body.get('research_questions')
+        if not rqs or not isinstance(rqs, list):
+            raise APIError(400, "research_questions must be a non-empty list")
+        files = sorted(p for p in folder.iterdir() if p.suffix.lower() in TRANSCRIPT_SUFFIXES)
+        if not files:
+            raise APIError(400, "The upload contains no transcripts")
+        job_id = self.queue.submit(body.get('project_name') or 'API_Project', files, config={
+            'research_questions': rqs,
+            'domain_keywords': body.get('domain_keywords') or [],
+            'codebook': body.get('codebook') or DEFAULT_CODEBOOK,
+            'streaming': bool(body.get('streaming', False)),
+            'reuse_cache': bool(body.get('reuse_cache', True)),
+        })
+        return self.job_status(job_id)
+
+    def job(self, job_id: int) -> Dict:
+        job = self.queue.get(job_id)
+        if job is None:
+            raise APIError(404, f"Unknown job {job_id}")
+        return job
+
+    def job_status(self, job_id: int) -> Dict:
+        job = self.job(job_id)
+        keys = ('job_id', 'status', 'project_name', 'created_at', 'started_at', 'finished_at',
+                'files_total', 'files_done', 'current_file', 'run_id', 'errors', 'error', 'progress')
+        return {k: job[k] for k in keys}
+
+    def results(self, job_id: int) -> Dict:
+        job = self.job(job_id)
+        if job['status'] != 'done':
+            raise APIError(409, f"Job {job_id} is {job['status']}")
+        return {
+            'job_id': job_id,
+            'files': [
+                {'file_name': fname,
+                 'stage1': s1.to_dict(orient='records'),
+                 'stage2': s2.to_dict(orient='records'),
+                 'stage3': s3.to_dict(orient='records')}
+                for fname, s1, s2, s3 in self.store.load_run(job['run_id'])
+            ],
+        }
+
+    def output_folder(self, job_id: int) -> Path:
+        job = self.job(job_id)
+        if not job['output_folder'] or job['status'] not in FINISHED_STATUSES:
+            raise APIError(409, f"Job {job_id} is {job['status']}")
+        folder = Path(job['output_folder'])
+        if not folder.is_dir():
+            raise APIError(410, f"Outputs of job {job_id} were removed by the retention policy")
+        touch_run(folder)
+        return folder
+
+    def output_files(self, job_id: int) -> List[str]:
+        folder = self.output_folder(job_id)
+        return sorted(p.relative_to(folder).as_posix() for p in folder.rglob('*') if p.is_file())
+
+    def output_file(self, job_id: int, relative: str) -> Path:
+        folder = self.output_folder(job_id).resolve()
+        path = (folder / unquote(relative)).resolve()
+        if folder not in path.parents or not path.is_file():
+            raise APIError(404, f"No output {relative}")
+        return path
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = f"QualCoderAPI/{__version__}"
+    protocol_version = 'HTTP/1.0'  # responses end at connection close, so streams need no framing
+
+    @property
+    def api(self) -> QualCoderAPI:
+        return self.server.api
+
+    def log_message(self, fmt, *args):
+        logger.info(f"{self.address_string()} {fmt % args}")
+
+    def _send_json(self, payload, status: int = 200):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > 10 * 1024 * 1024:
+            raise APIError(413, "JSON body too large")
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            raise APIError(400, "Body must be JSON")
+
+    def _send_file(self, path: Path, content_type: str = 'application/octet-stream'):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(path.stat().st_size))
+        self.send_header('Content-Disposition', f'attachment; filename="{path.name}"')
+        self.end_headers()
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+    def _stream_zip(self, job_id: int):
+        folder = self.api.output_folder(job_id)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/zip')
+        self.send_header('Content-Disposition', f'attachment; filename="{folder.name}.zip"')
+        self.end_headers()
+        # zipfile writes data descriptors when the target is not seekable, so this streams
+        with zipfile.ZipFile(self.wfile, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for rel in self.api.output_files(job_id):
+                zf.write(folder / rel, rel)
+
+    def _stream_events(self, job_id: int):
+        self.api.job(job_id)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        last = None
+        while True:
+            status = self.api.job_status(job_id)
+            if status != last:
+                self.wfile.write(f"event: progress\ndata: {json.dumps(status, default=str)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                last = status
+            if status['status'] in FINISHED_STATUSES:
+                return
+            time.sleep(self.api.poll_interval)
+
+    def _upload(self):
+        length = int(self.headers.get('Content-Length') or -1)
+        if length < 0:
+            raise APIError(411, "Content-Length required")
+        if length > self.api.max_upload_bytes:
+            raise APIError(413, f"Upload larger than {self.api.max_upload_bytes} bytes")
+        folder = self.api.queue.new_inputs_dir()
+        uploads = UploadSet(folder, self.api.max_upload_bytes)
+        try:
+            content_type = self.headers.get('Content-Type', '')
+            match = re.search(r'boundary="?([^";]+)"?', content_type)
+            if content_type.startswith('multipart/form-data') and match:
+                reader = MultipartReader(match.group(1).encode('latin-1'), uploads.on_part)
+                feed = reader.feed
+            else:
+                filename = self.headers.get('X-Filename')
+                if not filename:
+                    raise APIError(400, "Send multipart/form-data or a raw body with an X-Filename header")
+                reader, feed = None, uploads.open_file(filename)
+            remaining = length
+            while remaining > 0:
+                chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise APIError(400, "Upload ended early")
+                remaining -= len(chunk)
+                feed(chunk)
+            if reader is not None:
+                reader.close()
+            else:
+                feed(None)
+            if not uploads.files:
+                raise APIError(400, "No transcripts (.txt, .docx, .pdf) in the upload")
+        except Exception:
+            shutil.rmtree(folder, ignore_errors=True)
+            raise
+        self._send_json({'upload_id': folder.name, 'files': uploads.files, 'fields': uploads.fields}, 201)
+
+    def _route(self, method: str):
+        if self.api.token and self.headers.get('Authorization') != f"Bearer {self.api.token}":
+            raise APIError(401, "Missing or invalid bearer token")
+        path = urlparse(self.path).path.rstrip('/')
+        parts = path.split('/')[2:] if path.startswith('/api/') or path == '/api' else None
+        if parts is None:
+            raise APIError(404, f"No route {path}")
+        if method == 'GET' and parts == ['health']:
+            return self._send_json({'status': 'ok', 'version': __version__})
+        if method == 'POST' and parts == ['uploads']:
+            return self._upload()
+        if parts[:1] != ['jobs']:
+            raise APIError(404, f"No route {path}")
+        if len(parts) == 1:
+            if method == 'POST':
+                return self._send_json(self.api.create_job(self._read_json()), 202)
+            if method == 'GET':
+                return self._send_json(self.api.queue.list_jobs(limit=50).to_dict(orient='records'))
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise APIError(404, f"No route {path}")
+        job_id, rest = int(parts[1]), parts[2:]
+        if method == 'DELETE' and not rest:
+            self.api.job(job_id)
+            if not self.api.queue.cancel(job_id):
+                raise APIError(409, f"Job {job_id} has already finished")
+            return self._send_json(self.api.job_status(job_id))
+        if method == 'POST' and rest == ['resume']:
+            self.api.job(job_id)
+            if not self.api.queue.resume(job_id):
+                raise APIError(409, f"Job {job_id} is not cancelled or failed")
+            return self._send_json(self.api.job_status(job_id))
+        if method != 'GET':
+            raise APIError(405, f"{method} not allowed on {path}")
+        if not rest:
+            return self._send_json(self.api.job_status(job_id))
+        if rest == ['events']:
+            return self._stream_events(job_id)
+        if rest == ['results']:
+            return self._send_json(self.api.results(job_id))
+        if rest == ['outputs']:
+            return self._send_json({'files': self.api.output_files(job_id)})
+        if rest == ['outputs.zip']:
+            return self._stream_zip(job_id)
+        if rest[0] == 'outputs':
+            return self._send_file(self.api.output_file(job_id, '/'.join(rest[1:])))
+        raise APIError(404, f"No route {path}")
+
+    def _dispatch(self, method: str):
+        try:
+            self._route(method)
+        except APIError as e:
+            self._send_json({'error': str(e)}, e.status)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Client disconnected")
+        except Exception as e:
+            logger.exception(f"{method} {self.path} failed")
+            self._send_json({'error': f"Internal error: {e}"}, 500)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+
+def make_server(
+    host: str = '127.0.0.1',
+    port: int = DEFAULT_PORT,
+    jobs_path: Path = DEFAULT_JOBS_PATH,
+    store_path: Path = DEFAULT_STORE_PATH,
+    token: Optional[str] = None
+) -> ThreadingHTTPServer:
+    """
+    HTTP server bound to host:port (port 0 picks a free port); call serve_forever() on it.
+    Each request runs in its own thread; analyses run in the job queue's workers.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.api = QualCoderAPI(JobQueue(jobs_path), ProjectStore(store_path),
+                              token=token if token is not None else os.environ.get(TOKEN_ENV))
+    return server
+
+
+def serve(
+    host: str = '127.0.0.1',
+    port: int = DEFAULT_PORT,
+    workers: int = 2,
+    jobs_path: Path = DEFAULT_JOBS_PATH,
+    store_path: Path = DEFAULT_STORE_PATH
+):
+    """
+    Run the API with a pool of analysis worker processes until interrupted.
+    """
+    server = make_server(host, port, jobs_path, store_path)
+    procs = start_workers(workers, jobs_path, store_path) if workers else []
+    logger.info(f"QualCoder API listening on http://{host}:{server.server_address[1]}/api")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for p in procs:
+            p.terminate()
@@ -0,0 +1,121 @@
+"""
+qualcoder_cache.py
+On-disk, content-addressed cache for pipeline stage outputs. Keys are the
+input fingerprints computed in qualcoder_core, so re-running a project after
+changing only keywords or research questions recomputes just the affected stages.
+"""
+
+from pathlib import Path
+from typing import Any, Optional
+from collections import Counter
+import os
+import pickle
+import shutil
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path('.qualcoder_cache') / 'stages'
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+PRUNE_EVERY = 50  # writes between size checks
+
+
+def _unlink_quietly(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class StageCache:
+    """
+    Stage results pickled under <root>/<stage>/<key[:2]>/<key>.pkl.
+    Writes are atomic (temp file + rename) so concurrent workers can share a root.
+    Least recently used entries are evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, stage: str, key: str) -> Path:
+        return self.root / stage / key[:2] / f"{key}.pkl"
+
+    def get(self, stage: str, key: str) -> Optional[Any]:
+        """
+        Return the cached value, or None on a miss.
+        """
+        path = self._path(stage, key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses[stage] += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            _unlink_quietly(path)
+            self.misses[stage] += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        self.hits[stage] += 1
+        return value
+
+    def put(self, stage: str, key: str, value: Any):
+        path = self._path(stage, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"Failed to write cache entry {path}: {e}")
+            _unlink_quietly(Path(tmp))
+            return
+        with self._lock:
+            self._writes += 1
+            due = self._writes % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.root.rglob('*.pkl'))
+
+    def prune(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Evict least recently used entries until the cache fits in max_bytes.
+        Returns the number of bytes freed.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = []
+        for p in self.root.rglob('*.pkl'):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, p in sorted(entries, key=lambda e: e[0]):
+            if total - freed <= limit:
+                break
+            _unlink_quietly(p)
+            freed += size
+        if freed:
+            logger.info(f"Stage cache: evicted {freed} bytes")
+        return freed
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.root.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,327 @@
+"""
+qualcoder_cli.py
+Command line entry point for running the 3-stage pipeline without the Streamlit UI.
+
+    python qualcoder_cli.py run interview1.docx interview2.pdf --rq "How do teachers use AI?"
+"""
+
+from pathlib import Path
+from typing import List, Optional
+import sys
+import json
+import signal
+import logging
+import argparse
+import threading
+
+from qualcoder_core import (
+    load_codebook, make_output_folder, process_batch, RunMetrics, RunManifest, batch_config_key,
+    ProgressTracker, format_progress, configure_logging, __version__
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _read_keywords(value: Optional[str]) -> List[str]:
+    """
+    Keywords as a comma-separated list, or @path to a file with one keyword per line.
+    """
+    if not value:
+        return []
+    if value.startswith('@'):
+        with open(value[1:], 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    return [k.strip() for k in value.split(',') if k.strip()]
+
+
+def _cancel_on_interrupt() -> threading.Event:
+    """
+    Event set by the first Ctrl-C so the batch stops after the current file; a second
+    Ctrl-C interrupts immediately.
+    """
+    cancel = threading.Event()
+
+    def handler(signum, frame):
+        if cancel.is_set():
+            raise KeyboardInterrupt
+        cancel.set()
+        print("Stopping after the current file (Ctrl-C again to abort)", file=sys.stderr)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGINT, handler)
+    return cancel
+
+
+def _status_line(event):
+    """
+    ProgressTracker callback redrawing one status line on stderr.
+    """
+    line = format_progress(event)
+    if event['file'] and event['event'] != 'file_done':
+        line += f" · {event['file']}"
+    sys.stderr.write('\r' + line[:119].ljust(119))
+    sys.stderr.flush()
+
+
+def _restore_interrupt():
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+
+def cmd_run(args) -> int:
+    codebook = load_codebook(Path(args.codebook) if args.codebook else None)
+    keywords = _read_keywords(args.keywords)
+    if args.resume:
+        out_folder = Path(args.resume)
+        if not out_folder.is_dir():
+            print(f"Cannot resume: {out_folder} is not a folder", file=sys.stderr)
+            return 2
+    elif args.output:
+        out_folder = Path(args.output)
+        out_folder.mkdir(parents=True, exist_ok=True)
+    else:
+        out_folder = make_output_folder(args.project)
+
+    store = run_id = None
+    if args.store:
+        from qualcoder_store import ProjectStore
+        store = ProjectStore(Path(args.store))
+        run_id = store.start_run(args.project, out_folder, config={
+            'research_questions': args.rq,
+            'domain_keywords': keywords,
+            'codebook': codebook,
+        })
+
+    cache = None
+    if not args.no_cache and not args.streaming:
+        from qualcoder_cache import StageCache, DEFAULT_CACHE_DIR
+        cache = StageCache(Path(args.cache_dir) if args.cache_dir else DEFAULT_CACHE_DIR)
+
+    profiler = None
+    if args.profile:
+        from qualcoder_profiling import StageProfiler
+        profiler = StageProfiler(out_folder, mode=args.profile, interval=args.profile_interval)
+
+    metrics = RunMetrics(args.project)
+    memory = None
+    if args.memory or args.memory_budget:
+        from qualcoder_profiling import MemoryAccountant, MB
+        budget = int(args.memory_budget * MB) if args.memory_budget else None
+        memory = MemoryAccountant(metrics, budget_bytes=budget)
+    files = [Path(f) for f in args.files]
+    manifest = RunManifest.load(out_folder, batch_config_key(codebook, args.rq, keywords, args.streaming))
+    show_progress = not args.no_progress and sys.stderr.isatty()
+    progress = ProgressTracker(_status_line, files) if show_progress else None
+    cancel = _cancel_on_interrupt()
+    try:
+        results, errors = process_batch(
+            files, out_folder, codebook, args.rq, keywords,
+            store=store, run_id=run_id, cache=cache, metrics=metrics, profiler=profiler,
+            memory=memory, streaming=args.streaming, manifest=manifest, cancel=cancel,
+            progress=progress
+        )
+    finally:
+        _restore_interrupt()
+        if progress is not None:
+            sys.stderr.write('\n')
+        if memory is not None:
+            memory.close()
+    metrics.write_report(out_folder)
+    if not args.output and not args.resume:
+        from qualcoder_retention import OutputRetention
+        OutputRetention().enforce(protect=[out_folder])
+
+    for fname, s1, s2, s3 in results:
+        segments = len(s1) if s1 is not None else '-'
+        print(f"{fname}: {segments} segments, {len(s2)} groups, {len(s3)} themes")
+    for fname, err in errors.items():
+        print(f"{fname}: FAILED ({err})", file=sys.stderr)
+    if memory is not None:
+        for stage, peak in sorted(memory.summary().items(), key=lambda kv: -kv[1]):
+            print(f"  peak memory {stage}: {peak / MB:.1f} MB")
+    print(f"Outputs written to {out_folder}")
+    if cancel.is_set():
+        print(f"Cancelled; continue with: qualcoder run ... --resume {out_folder}", file=sys.stderr)
+    if args.json:
+        print(json.dumps(metrics.to_dict(), indent=2))
+    return 1 if errors or cancel.is_set() else 0
+
+
+def cmd_worker(args) -> int:
+    from qualcoder_jobs import run_worker, start_workers, DEFAULT_JOBS_PATH
+    from qualcoder_store import DEFAULT_STORE_PATH
+    jobs_path = Path(args.jobs) if args.jobs else DEFAULT_JOBS_PATH
+    store_path = Path(args.store) if args.store else DEFAULT_STORE_PATH
+    if args.workers > 1:
+        workers = start_workers(args.workers, jobs_path, store_path)
+        for w in workers:
+            w.join()
+        return 0
+    ran = run_worker(jobs_path, store_path, poll_interval=args.poll,
+                     max_jobs=args.max_jobs)
+    print(f"Ran {ran} job(s)")
+    return 0
+
+
+def cmd_serve(args) -> int:
+    from qualcoder_api import serve
+    from qualcoder_jobs import DEFAULT_JOBS_PATH
+    from qualcoder_store import DEFAULT_STORE_PATH
+    serve(args.host, args.port, args.workers,
+          Path(args.jobs) if args.jobs else DEFAULT_JOBS_PATH,
+          Path(args.store) if args.store else DEFAULT_STORE_PATH)
+    return 0
+
+
+def cmd_outputs(args) -> int:
+    from qualcoder_retention import OutputRetention, RetentionPolicy, DEFAULT_OUTPUT_ROOT
+    policy = RetentionPolicy.from_env()
+    if args.max_gb is not None:
+        policy.max_bytes = int(args.max_gb * 1024 ** 3)
+    if args.max_age_days is not None:
+        policy.max_age_days = args.max_age_days
+    if args.max_runs is not None:
+        policy.max_runs = args.max_runs
+    retention = OutputRetention(Path(args.root) if args.root else DEFAULT_OUTPUT_ROOT, policy)
+    removed = retention.enforce(dry_run=args.dry_run) if args.prune or args.dry_run else []
+    usage = retention.usage()
+    if args.json:
+        usage['removed'] = [r.name for r in removed]
+        print(json.dumps(usage, indent=2))
+        return 0
+    for run in removed:
+        verb = 'Would remove' if args.dry_run else 'Removed'
+        print(f"{verb} {run.name} ({run.bytes / 1024 ** 2:.1f} MB; over {', '.join(run.reasons)} quota)")
+    for item in usage['items']:
+        flag = ' (running)' if item['active'] else ''
+        print(f"{item['bytes'] / 1024 ** 2:10.1f} MB  {item['last_access']}  {item['run']}{flag}")
+    for item in usage['unmanaged']:
+        print(f"{item['bytes'] / 1024 ** 2:10.1f} MB  (not managed by the quotas)  {item['path']}")
+    limits = [f"{k}={v}" for k, v in usage['policy'].items() if v is not None]
+    print(f"{usage['runs']} run(s) and {usage['inputs']} job input folder(s), {usage['bytes'] / 1024 ** 2:.1f} MB"
+          f" (+{usage['unmanaged_bytes'] / 1024 ** 2:.1f} MB unmanaged) in {usage['root']}"
+          f" · quotas: {', '.join(limits) or 'none'}")
+    return 0
+
+
+def _read_coding(source: str, store_path: Optional[str]):
+    from qualcoder_agreement import read_coding_sheet, read_stage1_folder
+    if source.startswith('run:'):
+        from qualcoder_store import ProjectStore, DEFAULT_STORE_PATH
+        store = ProjectStore(Path(store_path) if store_path else DEFAULT_STORE_PATH)
+        try:
+            return store.coding_table(int(source[4:]))
+        finally:
+            store.close()
+    path = Path(source)
+    return read_stage1_folder(path) if path.is_dir() else read_coding_sheet(path)
+
+
+def cmd_agreement(args) -> int:
+    from qualcoder_agreement import compare_codings
+    report = compare_codings(_read_coding(args.first, args.store), _read_coding(args.second, args.store), on=args.on)
+    if args.report:
+        report.disagreements().to_csv(args.report, index=False)
+    summary = report.summary()
+    if args.json:
+        per_code = report.per_code()
+        summary = {k: None if isinstance(v, float) and v != v else v for k, v in summary.items()}  # NaN is not JSON
+        summary['per_code'] = per_code.astype(object).where(per_code.notna(), None).to_dict(orient='records')
+        print(json.dumps(summary, indent=2))
+        return 0
+    print(f"{summary['aligned_segments']} aligned segment(s) by {args.on}"
+          f" · {summary['only_a']} only in A · {summary['only_b']} only in B · {summary['codes']} code(s)")
+    print(f"Observed agreement {summary['observed_agreement']:.3f} · Cohen's kappa {summary['cohens_kappa']:.3f}"
+          f" · Krippendorff's alpha {summary['krippendorffs_alpha']:.3f}")
+    print(report.per_code().head(args.top).to_string(index=False, float_format='{:.3f}'.format))
+    confusions = report.confusions(args.top)
+    if not confusions.empty:
+        print("\nMost frequent disagreements (A -> B):")
+        print(confusions.to_string(index=False, float_format='{:.3f}'.format))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='qualcoder', description='QualCoder Pro command line')
+    parser.add_argument('--version', action='version', version=f"%(prog)s {__version__}")
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log progress to stderr')
+    sub = parser.add_subparsers(dest='command')
+    sub.required = True
+
+    run = sub.add_parser('run', help='Run the 3-stage analysis on transcript files')
+    run.add_argument('files', nargs='+', help='Transcript files (.txt, .docx, .pdf)')
+    run.add_argument('--project', default='Research_Project', help='Project name used for the output folder')
+    run.add_argument('--rq', action='append', required=True,
+                     help='Research question (repeat for several)')
+    run.add_argument('--keywords', help='Comma-separated domain keywords, or @file with one per line')
+    run.add_argument('--codebook', help='Codebook JSON (defaults to the built-in codebook)')
+    run.add_argument('--output', help='Output folder (default: outputs/<project>_<timestamp>)')
+    run.add_argument('--resume', metavar='FOLDER',
+                     help='Continue an interrupted run in FOLDER, skipping files it already completed')
+    run.add_argument('--store', help='Also record results in this project store database')
+    run.add_argument('--streaming', action='store_true',
+                     help='Constant-memory mode for very large transcripts')
+    run.add_argument('--no-cache', action='store_true', help='Do not reuse cached stage results')
+    run.add_argument('--cache-dir', help='Stage cache directory')
+    run.add_argument('--profile', choices=['cprofile', 'sample'],
+                     help='Profile each stage and write .prof / collapsed-stack files to <output>/profiles')
+    run.add_argument('--profile-interval', type=float, default=0.005,
+                     help='Sampling interval in seconds for --profile sample')
+    run.add_argument('--memory', action='store_true',
+                     help='Record peak/net memory and top allocation sites per stage (tracemalloc)')
+    run.add_argument('--memory-budget', type=float, metavar='MB',
+                     help='Fail a file whose traced memory exceeds this many MB (implies --memory)')
+    run.add_argument('--no-progress', action='store_true',
+                     help='Do not show the progress line (segments/s and ETA) on a terminal')
+    run.add_argument('--json', action='store_true', help='Print the run report as JSON')
+    run.set_defaults(func=cmd_run)
+
+    worker = sub.add_parser('worker', help='Run background analysis jobs queued from the web UI')
+    worker.add_argument('--workers', type=int, default=1, help='Number of worker processes')
+    worker.add_argument('--jobs', help='Job queue database (default: outputs/qualcoder_jobs.db)')
+    worker.add_argument('--store', help='Project store database (default: outputs/qualcoder_projects.db)')
+    worker.add_argument('--poll', type=float, default=1.0, help='Seconds between polls of an empty queue')
+    worker.add_argument('--max-jobs', type=int, help='Exit after this many jobs, or when the queue is empty')
+    worker.set_defaults(func=cmd_worker)
+
+    api = sub.add_parser('serve', help='Serve the local HTTP API (see qualcoder_api.py)')
+    api.add_argument('--host', default='127.0.0.1', help='Interface to bind (default: localhost only)')
+    api.add_argument('--port', type=int, default=8765)
+    api.add_argument('--workers', type=int, default=2, help='Analysis worker processes (0: use external workers)')
+    api.add_argument('--jobs', help='Job queue database (default: outputs/qualcoder_jobs.db)')
+    api.add_argument('--store', help='Project store database (default: outputs/qualcoder_projects.db)')
+    api.set_defaults(func=cmd_serve)
+
+    outputs = sub.add_parser('outputs', help='Report disk use of run outputs and enforce retention quotas')
+    outputs.add_argument('--root', help='Output root (default: outputs)')
+    outputs.add_argument('--prune', action='store_true', help='Remove least recently used runs over the quotas')
+    outputs.add_argument('--dry-run', action='store_true', help='List the runs --prune would remove')
+    outputs.add_argument('--max-gb', type=float, help='Total size quota (default: QUALCODER_OUTPUT_MAX_GB)')
+    outputs.add_argument('--max-age-days', type=float,
+                         help='Remove runs unused for longer (default: QUALCODER_OUTPUT_MAX_AGE_DAYS)')
+    outputs.add_argument('--max-runs', type=int, help='Run count quota (default: QUALCODER_OUTPUT_MAX_RUNS)')
+    outputs.add_argument('--json', action='store_true', help='Print the usage report as JSON')
+    outputs.set_defaults(func=cmd_outputs)
+
+    agreement = sub.add_parser('agreement', help='Inter-coder agreement between two codings of the same transcripts')
+    agreement.add_argument('first', help='Coding A: a Stage 1 sheet (.xlsx/.csv), a run output folder, or run:<id>')
+    agreement.add_argument('second', help='Reference coding B, in the same forms')
+    agreement.add_argument('--on', choices=['segment', 'offset', 'text'], default='segment',
+                           help='Align segments by Segment_ID, stored text offset (runs only) or segment text')
+    agreement.add_argument('--store', help='Project store database for run:<id> (default: outputs/qualcoder_projects.db)')
+    agreement.add_argument('--report', metavar='CSV', help='Write the disagreement report to this file')
+    agreement.add_argument('--top', type=int, default=20, help='Codes and confusions to print')
+    agreement.add_argument('--json', action='store_true', help='Print the summary and per-code table as JSON')
+    agreement.set_defaults(func=cmd_agreement)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    level = logging.INFO if args.verbose else logging.WARNING
+    configure_logging(level)
+    logging.getLogger().setLevel(level)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+qualcoder_concordance.py
+Keyword-in-context (KWIC) concordance over the extracted text of a set of
+transcripts, for judging suggested keywords before picking them. The corpus is
+tokenized once into a positional index (term -> sorted token positions, with each
+token's character span and document); a keyword or phrase lookup then only reads
+the postings of its rarest word and checks the words around each hit, and context
+windows are sliced from the original text by token offsets.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import re
+import numpy as np
+import pandas as pd
+
+CONCORDANCE_SORTS = ('document', 'left', 'right')
+CONCORDANCE_COLUMNS = ['File', 'Left', 'Keyword', 'Right', 'Offset']
+
+_TOKEN = re.compile(r'\w+')
+_SPACE = re.compile(r'\s+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens; phrases are matched token by token, so punctuation and
+    line breaks between words do not matter.
+    """
+    return _TOKEN.findall(text.lower())
+
+
+class _Postings:
+    """
+    Term -> token positions in CSR form over one token stream: positions of term t
+    are stream[order[indptr[t]:indptr[t + 1]]], in ascending order.
+    """
+
+    def __init__(self, stream: np.ndarray, ids: np.ndarray, n_terms: int):
+        self.stream = stream  # global token positions in this stream
+        self.ids = ids        # term id of each stream element
+        self.order = np.argsort(ids, kind='stable').astype(np.int32)
+        self.indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ids, minlength=n_terms), out=self.indptr[1:])
+
+    def count(self, term: int) -> int:
+        return int(self.indptr[term + 1] - self.indptr[term])
+
+    def find(self, terms: List[int], doc: np.ndarray) -> np.ndarray:
+        """
+        Stream indices where the terms occur consecutively within one document.
+        """
+        # start from the rarest word and check the others at their offsets
+        k = min(range(len(terms)), key=lambda i: self.count(terms[i]))
+        starts = self.order[self.indptr[terms[k]]:self.indptr[terms[k] + 1]].astype(np.int64) - k
+        starts = starts[(starts >= 0) & (starts + len(terms) <= len(self.ids))]
+        for i, term in enumerate(terms):
+            if i == k or not len(starts):
+                continue
+            starts = starts[self.ids[starts + i] == term]
+        if len(terms) > 1 and len(starts):
+            first, last = self.stream[starts], self.stream[starts + len(terms) - 1]
+            starts = starts[doc[first] == doc[last]]
+        return np.sort(starts)
+
+
+class ConcordanceIndex:
+    """
+    Positional token index over the texts of named documents (e.g. the uploads of a
+    session). Phrases match either every token (exact) or, with skip_stop_words,
+    only the words TF-IDF keeps (no stop words, no one-letter tokens), so that a
+    suggested bigram such as 'students online' also finds 'students are online'.
+    """
+
+    def __init__(self, names: List[str], texts: List[str]):
+        self.names = list(names)
+        self.texts = list(texts)
+        tokens: List[str] = []
+        starts: List[np.ndarray] = []
+        lengths: List[np.ndarray] = []
+        doc_start = [0]
+        folded = True
+        for text in self.texts:
+            lowered = text.lower()
+            if len(lowered) != len(text):  # offsets must stay those of the original text
+                lowered, folded = text, False
+            words = _TOKEN.findall(lowered)
+            gaps = _TOKEN.split(lowered)  # the text between words, one more than words
+            size = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+            gap = np.fromiter(map(len, gaps), dtype=np.int64, count=len(gaps))
+            starts.append(np.cumsum(gap[:-1]) + np.cumsum(size) - size)
+            lengths.append(size)
+            tokens.extend(words)
+            doc_start.append(len(tokens))
+        # term ids in alphabetical order, so sorting by term id sorts by word
+        words = pd.Series(tokens, dtype=object)
+        codes, terms = pd.factorize(words if folded else words.str.lower(), sort=True)
+        terms = terms.to_numpy(dtype=object)
+        self.vocab: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+        self.token_ids = codes.astype(np.int32)
+        self.starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+        self.ends = self.starts + (np.concatenate(lengths) if lengths else 0)
+        self.doc_start = np.asarray(doc_start, dtype=np.int64)
+        self.doc = np.repeat(np.arange(len(self.texts), dtype=np.int32), np.diff(self.doc_start))
+
+        every = np.arange(len(tokens), dtype=np.int64)
+        self._all = _Postings(every, self.token_ids, len(terms))
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS  # heavy; only needed once the index is built
+        self._stop_words = ENGLISH_STOP_WORDS
+        content_terms = np.array([self._is_content(t) for t in terms], dtype=bool)
+        content = every[content_terms[self.token_ids]] if len(tokens) else every
+        self._content = _Postings(content, self.token_ids[content], len(terms))
+
+    def _is_content(self, word: str) -> bool:
+        return len(word) > 1 and word not in self._stop_words
+
+    def __len__(self) -> int:
+        return len(self.token_ids)
+
+    def _positions(self, phrase: str, skip_stop_words: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Global token positions of the first and last word of every occurrence.
+        """
+        words = tokenize(phrase)
+        postings = self._all
+        if skip_stop_words:
+            words = [w for w in words if self._is_content(w)] or words
+            if all(self._is_content(w) for w in words):
+                postings = self._content
+        terms = [self.vocab.get(w) for w in words]
+        if not terms or any(t is None for t in terms):
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        hits = postings.find(terms, self.doc)
+        return postings.stream[hits], postings.stream[hits + len(terms) - 1]
+
+    def count(self, phrase: str, skip_stop_words: bool = False) -> int:
+        return len(self._positions(phrase, skip_stop_words)[0])
+
+    def file_counts(self, phrase: str, skip_stop_words: bool = False) -> pd.Series:
+        """
+        Occurrences per document, in document order (documents without any are left out).
+        """
+        first, _ = self._positions(phrase, skip_stop_words)
+        counts = np.bincount(self.doc[first], minlength=len(self.names))
+        return pd.Series(counts, index=self.names, dtype='int64')[counts > 0]
+
+    def concordance(
+        self,
+        phrase: str,
+        window: int = 8,
+        sort: str = 'document',
+        skip_stop_words: bool = False,
+        limit: int = 100,
+        offset: int = 0
+    ) -> Tuple[pd.DataFrame, int]:
+        """
+        One page of KWIC lines for a keyword or phrase and the total number of hits.
+        Left and Right hold up to window words of context from the same document;
+        sort 'left'/'right' orders hits by the word just before/after the keyword.
+        """
+        first, last = self._positions(phrase, skip_stop_words)
+        total = len(first)
+        if sort in ('left', 'right') and total:
+            neighbour = first - 1 if sort == 'left' else last + 1
+            doc = self.doc[first]
+            inside = (neighbour >= self.doc_start[doc]) & (neighbour < self.doc_start[doc + 1])
+            key = np.where(inside, self.token_ids[np.clip(neighbour, 0, max(len(self) - 1, 0))], -1)
+            order = np.argsort(key, kind='stable')  # term ids are in alphabetical order
+            first, last = first[order], last[order]
+        first, last = first[offset:offset + limit], last[offset:offset + limit]
+        rows = []
+        for a, b in zip(first.tolist(), last.tolist()):
+            d = int(self.doc[a])
+            text = self.texts[d]
+            lo = max(a - window, int(self.doc_start[d]))
+            hi = min(b + window, int(self.doc_start[d + 1]) - 1)
+            rows.append({
+                'File': self.names[d],
+                'Left': _SPACE.sub(' ', text[self.starts[lo]:self.starts[a]]).strip(),
+                'Keyword': _SPACE.sub(' ', text[self.starts[a]:self.ends[b]]),
+                'Right': _SPACE.sub(' ', text[self.ends[b]:self.ends[hi]]).strip(),
+                'Offset': int(self.starts[a]),
+            })
+        return pd.DataFrame(rows, columns=CONCORDANCE_COLUMNS), total
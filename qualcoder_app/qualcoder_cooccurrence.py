@@ -0,0 +1,308 @@
+"""
+qualcoder_cooccurrence.py
+Code co-occurrence for the Results tab. Segments are turned into a sparse
+segment × code incidence matrix, either from their Stage 1 code alone or from
+every codebook keyword they contain (multi-label), and then, optionally, widened to
+windows of N consecutive segments or to whole transcripts. The code × code
+co-occurrence counts are one sparse product, Bᵀ·B; Jaccard and lift are computed
+on its non-zero cells only, so nothing is densified however many segments there are.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import re
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from qualcoder_core import CodebookIndex, FALLBACK_CODE
+
+UNITS = ('segment', 'window', 'transcript')
+METRICS = ('Count', 'Jaccard', 'Lift')
+EDGE_COLUMNS = ['Source', 'Target', 'Count', 'Jaccard', 'Lift']
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex alternation of words as a prefix trie: at each position only the branch for
+    the next character is tried, and the longest word starting there wins.
+    """
+    trie: Dict[str, Dict] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class MultiLabelCoder:
+    """
+    Every code whose keywords occur in a segment, with the same substring matching as
+    CodebookIndex.code (which stops at the first hit). One regex scan per segment finds
+    the longest keyword starting at each position; a hit also implies every keyword
+    contained in it.
+    """
+
+    def __init__(self, codebook: Dict[str, List[str]], domain_keywords: Optional[List[str]] = None):
+        index = CodebookIndex(codebook, domain_keywords)
+        keyword_labels: Dict[str, List[str]] = {}
+        for kw, low in index.domain:
+            keyword_labels.setdefault(low, []).append(f"Domain-specific practice ({kw})")
+        for label, keywords in index.labels:
+            for low in keywords:
+                keyword_labels.setdefault(low, []).append(label)
+        keywords = sorted((k for k in keyword_labels if k), key=len, reverse=True)
+        self.keywords = {kw: i for i, kw in enumerate(keywords)}
+        self.labels: List[str] = list(dict.fromkeys(l for kw in keywords for l in keyword_labels[kw]))
+        position = {label: j for j, label in enumerate(self.labels)}
+        rows, cols = [], []
+        for i, kw in enumerate(keywords):
+            for other in keywords:
+                if other in kw:
+                    for label in keyword_labels[other]:
+                        rows.append(i)
+                        cols.append(position[label])
+        self._membership = sp.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                                         shape=(len(keywords), len(self.labels)))
+        self._pattern = re.compile('(?=(' + _trie_pattern(keywords) + '))') if keywords else None
+
+    def incidence(self, texts: Sequence[str]) -> sp.csr_matrix:
+        """
+        Binary segments × self.labels matrix of keyword hits.
+        """
+        if self._pattern is None or not len(texts):
+            return sp.csr_matrix((len(texts), len(self.labels)), dtype=np.int32)
+        # short turns ('Yes.', 'I agree.') repeat a lot; each distinct text is scanned once
+        which, distinct = pd.factorize(pd.Series(texts, dtype=object).fillna('').str.lower())
+        hits = pd.Series(distinct, dtype=object).str.findall(self._pattern)
+        rows = np.repeat(np.arange(len(distinct)), hits.str.len().to_numpy())
+        found = [self.keywords[kw] for kws in hits for kw in kws]
+        keyword_hits = sp.csr_matrix((np.ones(len(found), dtype=np.int32), (rows, found)),
+                                     shape=(len(distinct), len(self.keywords)))
+        return _binary(keyword_hits @ self._membership)[which]
+
+
+def _binary(m: sp.spmatrix) -> sp.csr_matrix:
+    m = sp.csr_matrix(m, dtype=np.int32)
+    m.sum_duplicates()
+    m.eliminate_zeros()
+    m.data[:] = 1
+    return m
+
+
+class CodeIncidence:
+    """
+    Segment × code incidence of a set of transcripts, kept as one block per transcript
+    so that keeping it in step with a SessionResults only rescans the transcripts added
+    or replaced since the last update. Each segment has its Stage 1 code; with a coder,
+    also every other code its keywords hit. Codes in exclude are left out.
+    """
+
+    def __init__(self, coder: Optional[MultiLabelCoder] = None, exclude: Sequence[str] = (FALLBACK_CODE,)):
+        self.coder = coder
+        self.exclude = set(exclude)
+        self.labels: List[str] = []
+        self._label_index: Dict[str, int] = {}
+        self._blocks: Dict[str, sp.csr_matrix] = {}  # file name -> segments × (labels so far)
+        self._stamps: Dict[str, int] = {}
+
+    def _columns(self, labels: Iterable[str]) -> np.ndarray:
+        for label in labels:
+            if label not in self._label_index:
+                self._label_index[label] = len(self.labels)
+                self.labels.append(label)
+        return np.array([self._label_index[l] for l in labels], dtype=np.int64)
+
+    def set_file(self, file_name: str, stage1: Optional[pd.DataFrame]):
+        if stage1 is None or stage1.empty:
+            self._blocks[file_name] = sp.csr_matrix((0, 0), dtype=np.int32)
+            return
+        codes, code_labels = pd.factorize(stage1['Initial_Code'].astype(str).to_numpy(dtype=object))
+        n = len(codes)
+        columns = self._columns(list(code_labels))[codes]
+        block = sp.csr_matrix((np.ones(n, dtype=np.int32), (np.arange(n), columns)), shape=(n, len(self.labels)))
+        if self.coder is not None:
+            hits = self.coder.incidence(stage1['Interview_Text'].to_numpy(dtype=object)).tocoo()
+            columns = self._columns(self.coder.labels)
+            block.resize((n, len(self.labels)))
+            block = block + sp.csr_matrix((hits.data, (hits.row, columns[hits.col])), shape=(n, len(self.labels)))
+        self._blocks[file_name] = _binary(block)
+
+    def update(self, results) -> List[str]:
+        """
+        Rescan the transcripts of a SessionResults that changed since the last update;
+        returns their names.
+        """
+        stamps = results.stamps()
+        changed = [f for f, stamp in stamps.items() if self._stamps.get(f) != stamp]
+        names = results.file_names()
+        for fname in changed:
+            self.set_file(fname, results[names.index(fname)][1])
+            self._stamps[fname] = stamps[fname]
+        for fname in set(self._blocks) - set(stamps):
+            del self._blocks[fname]
+        return changed
+
+    def matrix(self) -> Tuple[sp.csr_matrix, List[str], np.ndarray]:
+        """
+        All segments × the kept codes, with the transcript number of each segment.
+        """
+        blocks = [b for b in self._blocks.values() if b.shape[0]]
+        for b in blocks:
+            b.resize((b.shape[0], len(self.labels)))
+        stacked = sp.vstack(blocks, format='csr') if blocks else sp.csr_matrix((0, len(self.labels)), dtype=np.int32)
+        file_ids = np.repeat(np.arange(len(blocks), dtype=np.int32), [b.shape[0] for b in blocks])
+        keep = [j for j, label in enumerate(self.labels) if label not in self.exclude]
+        return sp.csr_matrix(stacked[:, keep]), [self.labels[j] for j in keep], file_ids
+
+    def cooccurrence(self, unit: str = 'segment', window: int = 3) -> 'CooccurrenceMatrix':
+        """
+        Co-occurrence within segments, windows of window consecutive segments, or transcripts.
+        """
+        incidence, labels, file_ids = self.matrix()
+        if unit == 'window':
+            incidence = window_incidence(incidence, file_ids, window)
+        elif unit == 'transcript':
+            incidence = transcript_incidence(incidence, file_ids)
+        elif unit != 'segment':
+            raise ValueError(f"Unknown unit: {unit}")
+        return CooccurrenceMatrix(incidence, labels)
+
+
+def window_incidence(incidence: sp.csr_matrix, file_ids: np.ndarray, window: int) -> sp.csr_matrix:
+    """
+    One row per segment: the codes of that segment and the next window - 1 segments of
+    the same transcript (a band matrix times the incidence).
+    """
+    n = incidence.shape[0]
+    rows, cols = [], []
+    for offset in range(max(1, window)):
+        i = np.arange(n - offset)
+        same = file_ids[i] == file_ids[i + offset]
+        rows.append(i[same])
+        cols.append(i[same] + offset)
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    band = sp.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(n, n))
+    return _binary(band @ incidence)
+
+
+def transcript_incidence(incidence: sp.csr_matrix, file_ids: np.ndarray) -> sp.csr_matrix:
+    """
+    One row per transcript: every code used anywhere in it.
+    """
+    _, transcript = np.unique(file_ids, return_inverse=True)
+    member = sp.csr_matrix((np.ones(len(file_ids), dtype=np.int32), (transcript, np.arange(len(file_ids)))),
+                           shape=(int(transcript.max()) + 1 if len(file_ids) else 0, len(file_ids)))
+    return _binary(member @ incidence)
+
+
+class CooccurrenceMatrix:
+    """
+    Code × code co-occurrence over a set of units (segments, windows or transcripts):
+    counts[i, j] is the number of units with both codes, the diagonal the number of
+    units with code i.
+    """
+
+    def __init__(self, incidence: sp.csr_matrix, labels: List[str]):
+        incidence = _binary(incidence)
+        self.labels = list(labels)
+        self.units = incidence.shape[0]
+        self.counts = sp.csr_matrix(incidence.T @ incidence, dtype=np.int64)
+        self.frequency = self.counts.diagonal()
+
+    @classmethod
+    def from_results(
+        cls,
+        results: Iterable[Tuple],
+        unit: str = 'segment',
+        window: int = 3,
+        coder: Optional[MultiLabelCoder] = None,
+        exclude: Sequence[str] = (FALLBACK_CODE,)
+    ) -> 'CooccurrenceMatrix':
+        """
+        One-off co-occurrence of [(file_name, stage1, stage2, stage3)]; see CodeIncidence
+        for keeping the incidence between calls.
+        """
+        incidence = CodeIncidence(coder, exclude)
+        for fname, s1, _, _ in results:
+            incidence.set_file(fname, s1)
+        return incidence.cooccurrence(unit, window)
+
+    def normalized(self, how: str = 'Count') -> sp.csr_matrix:
+        """
+        'Count'; 'Jaccard' = n(i and j) / n(i or j); 'Lift' = n(i and j) · units / (n(i) · n(j)),
+        above 1 when two codes meet more often than independence would predict.
+        """
+        c = self.counts.tocoo()
+        f = self.frequency.astype(np.float64)
+        if how == 'Count':
+            data = c.data.astype(np.float64)
+        elif how == 'Jaccard':
+            data = c.data / (f[c.row] + f[c.col] - c.data)
+        elif how == 'Lift':
+            data = c.data * float(self.units) / (f[c.row] * f[c.col])
+        else:
+            raise ValueError(f"Unknown normalization: {how}")
+        return sp.csr_matrix((data, (c.row, c.col)), shape=self.counts.shape)
+
+    def edges(
+        self,
+        min_count: int = 1,
+        min_jaccard: float = 0.0,
+        min_lift: float = 0.0,
+        sort_by: str = 'Count',
+        top: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Pairs of distinct codes that co-occur, with count, Jaccard and lift, filtered and
+        sorted (largest first) by sort_by.
+        """
+        c = sp.triu(self.counts, k=1).tocoo()
+        f = self.frequency.astype(np.float64)
+        count = c.data.astype(np.int64)
+        jaccard = count / (f[c.row] + f[c.col] - count) if len(count) else np.empty(0)
+        lift = count * float(self.units) / (f[c.row] * f[c.col]) if len(count) else np.empty(0)
+        keep = (count >= min_count) & (jaccard >= min_jaccard) & (lift >= min_lift)
+        labels = np.array(self.labels, dtype=object)
+        frame = pd.DataFrame({
+            'Source': labels[c.row[keep]] if keep.any() else [],
+            'Target': labels[c.col[keep]] if keep.any() else [],
+            'Count': count[keep],
+            'Jaccard': np.round(jaccard[keep], 4),
+            'Lift': np.round(lift[keep], 4),
+        }, columns=EDGE_COLUMNS)
+        frame = frame.sort_values([sort_by, 'Source', 'Target'], ascending=[False, True, True], kind='stable',
+                                  ignore_index=True)
+        return frame.head(top) if top is not None else frame
+
+
+def _dot_escape(text: str) -> str:
+    return str(text).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def to_dot(edges: pd.DataFrame, frequency: Optional[Dict[str, int]] = None, weight: str = 'Count') -> str:
+    """
+    Graphviz (DOT) source of an edge list, for st.graphviz_chart; edge width follows weight.
+    """
+    lines = ['graph cooccurrence {', '  graph [layout=neato, overlap=false, splines=true];',
+             '  node [shape=box, style="rounded,filled", fillcolor="#eef2ff", fontsize=10];',
+             '  edge [color="#667eea"];']
+    nodes = list(dict.fromkeys(list(edges['Source']) + list(edges['Target'])))
+    for node in nodes:
+        label = _dot_escape(node) + (f"\\n({frequency[node]})" if frequency and node in frequency else '')
+        lines.append(f'  "{_dot_escape(node)}" [label="{label}"];')
+    top = float(edges[weight].max()) if len(edges) else 1.0
+    for source, target, value in zip(edges['Source'], edges['Target'], edges[weight]):
+        width = 1.0 + 5.0 * float(value) / top if top else 1.0
+        lines.append(f'  "{_dot_escape(source)}" -- "{_dot_escape(target)}" '
+                     f'[penwidth={width:.2f}, tooltip="{weight}: {value}"];')
+    lines.append('}')
+    return '\n'.join(lines)
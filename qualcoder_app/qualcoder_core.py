@@ -5,22 +5,38 @@ an offline NLP keyword suggestion helper (TF-IDF based).
 """
 
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator
+import os
 import re
 import json
+import hashlib
 import logging
 import datetime
+import itertools
+import platform
+import time
+import zlib
+import bisect
+import shutil
+from collections import defaultdict
+from functools import partial
+from contextlib import contextmanager, nullcontext, ExitStack
 import pandas as pd
-import PyPDF2
-import docx
-from openpyxl import load_workbook
-from openpyxl.styles import Font, Alignment
-
-# New: TF-IDF
-from sklearn.feature_extraction.text import TfidfVectorizer
+# PyPDF2, python-docx, openpyxl and scikit-learn are imported where they are used:
+# together they take longer to import than everything else, and a TXT-only run, a
+# CLI call or a freshly spawned worker may never need them.
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def configure_logging(level: int = logging.INFO):
+    """
+    Root logging setup for the entry points (app, CLI, API, workers); importing this
+    module leaves logging alone. Does nothing if the root logger already has handlers.
+    """
+    logging.basicConfig(level=level, format=LOG_FORMAT)
 
 
 DEFAULT_CODEBOOK = {
@@ -43,6 +59,49 @@ DEFAULT_CODEBOOK = {
 }
 
 
+# Bump a stage's version whenever its logic changes so cached results are invalidated
+STAGE_VERSIONS = {
+    'extract': '1',
+    'segment': '1',
+    'code': '1',
+    'group': '1',
+    'theme': '2',
+    'write': '1',
+}
+
+
+def fingerprint(*parts) -> str:
+    """
+    Stable SHA-256 fingerprint of JSON-serializable (or bytes) parts.
+    Order-sensitive on purpose: codebook and keyword order decide which code wins.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            h.update(part)
+        else:
+            h.update(json.dumps(part, ensure_ascii=False, default=str).encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+def file_fingerprint(file_path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    SHA-256 of a file's content, read in chunks.
+    """
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+__version__ = '1.0.0'
+
+FALLBACK_CODE = "General educational practice"
+DOMAIN_NOTE_PREFIX = "Matched domain keyword: "  # Stage 1 Notes of segments coded by a domain keyword
+
+
 def load_codebook(path: Optional[Path] = None) -> Dict[str, List[str]]:
     """
     Load codebook from JSON file. If none provided, return DEFAULT_CODEBOOK.
@@ -58,24 +117,29 @@ def load_codebook(path: Optional[Path] = None) -> Dict[str, List[str]]:
     return DEFAULT_CODEBOOK
 
 
-def extract_text_from_file(file_path: Path) -> str:
+def extract_text_from_file(file_path: Path, on_page=None) -> str:
     """
     Extract text from .docx, .pdf, .txt.
     Returns extracted text (empty string if none).
+    on_page: optional callback(pages_done, pages_total) after each PDF page.
     """
     try:
         suffix = file_path.suffix.lower()
         if suffix == '.docx':
+            import docx
             doc = docx.Document(file_path)
             return '\n'.join(p.text for p in doc.paragraphs if p.text)
         elif suffix == '.pdf':
+            import PyPDF2
             text = []
             with open(file_path, 'rb') as f:
                 reader = PyPDF2.PdfReader(f)
-                for page in reader.pages:
+                for n, page in enumerate(reader.pages, 1):
                     page_text = page.extract_text()
                     if page_text:
                         text.append(page_text)
+                    if on_page is not None:
+                        on_page(n, len(reader.pages))
             return '\n'.join(text)
         elif suffix == '.txt':
             with open(file_path, 'r', encoding='utf-8') as f:
@@ -88,38 +152,75 @@ def extract_text_from_file(file_path: Path) -> str:
         return ""
 
 
-def extract_participant_responses(
-    transcript_text: str,
+def iter_text_lines(file_path: Path, on_page=None) -> Iterator[str]:
+    """
+    Streaming counterpart of extract_text_from_file: yields the text line by line
+    (TXT read lazily, PDF page by page, DOCX paragraph by paragraph).
+    on_page: optional callback(pages_done, pages_total) after each PDF page.
+    """
+    suffix = file_path.suffix.lower()
+    try:
+        if suffix == '.docx':
+            import docx
+            doc = docx.Document(file_path)
+            for p in doc.paragraphs:
+                if p.text:
+                    yield from p.text.splitlines()
+        elif suffix == '.pdf':
+            import PyPDF2
+            with open(file_path, 'rb') as f:
+                reader = PyPDF2.PdfReader(f)
+                for n, page in enumerate(reader.pages, 1):
+                    page_text = page.extract_text()
+                    if page_text:
+                        yield from page_text.splitlines()
+                    if on_page is not None:
+                        on_page(n, len(reader.pages))
+        elif suffix == '.txt':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for raw in f:
+                    yield from raw.splitlines()
+        else:
+            logger.warning(f"Unsupported format: {file_path}")
+    except Exception as e:
+        logger.error(f"Error extracting {file_path}: {e}")
+
+
+def iter_participant_responses(
+    lines: Iterable[str],
     speaker_markers: Optional[List[str]] = None,
     interviewer_markers: Optional[List[str]] = None,
     min_length: int = 20
-) -> List[str]:
+) -> Iterator[str]:
     """
-    Extract participant (respondent) segments from a transcript string.
+    Yield participant (respondent) segments from an iterable of transcript lines.
     """
     if speaker_markers is None:
         speaker_markers = ['participant:', 'interviewee:', 'teacher:', 'respondent:']
     if interviewer_markers is None:
         interviewer_markers = ['researcher:', 'interviewer:', 'moderator:']
 
-    lines = [ln.strip() for ln in transcript_text.splitlines() if ln.strip()]
-    participant_responses = []
+    responses_seen = 0  # responses closed so far, before the min_length filter
     current = []
     is_participant = None  # unknown initially
 
     for line in lines:
+        line = line.strip()
+        if not line:
+            continue
         low = line.lower()
+        response = None
         # detect explicit markers
         if any(low.startswith(m) for m in speaker_markers):
             if current and is_participant:
-                participant_responses.append(' '.join(current).strip())
+                response = ' '.join(current).strip()
             is_participant = True
             # remove marker prefix (like "Participant:")
             cleaned = re.sub(r'^\w+:\s*', '', line)
             current = [cleaned] if cleaned else []
         elif any(low.startswith(m) for m in interviewer_markers):
             if current and is_participant:
-                participant_responses.append(' '.join(current).strip())
+                response = ' '.join(current).strip()
             is_participant = False
             current = []
         else:
@@ -128,18 +229,36 @@ def extract_participant_responses(
                 if len(line) > 40 or re.search(r'\b(I|we|my|our|us)\b', line, re.I):
                     is_participant = True
                 else:
-                    is_participant = False if (len(participant_responses) % 2 == 0) else True
+                    is_participant = False if (responses_seen % 2 == 0) else True
             if is_participant:
                 current.append(line)
             else:
                 if current:
-                    participant_responses.append(' '.join(current).strip())
+                    response = ' '.join(current).strip()
                 current = []
+        if response is not None:
+            responses_seen += 1
+            if len(response) >= min_length:
+                yield response
 
     if current and is_participant:
-        participant_responses.append(' '.join(current).strip())
+        response = ' '.join(current).strip()
+        if len(response) >= min_length:
+            yield response
 
-    participant_responses = [r for r in participant_responses if len(r) >= min_length]
+
+def extract_participant_responses(
+    transcript_text: str,
+    speaker_markers: Optional[List[str]] = None,
+    interviewer_markers: Optional[List[str]] = None,
+    min_length: int = 20
+) -> List[str]:
+    """
+    Extract participant (respondent) segments from a transcript string.
+    """
+    participant_responses = list(iter_participant_responses(
+        transcript_text.splitlines(), speaker_markers, interviewer_markers, min_length
+    ))
     logger.info(f"Extracted {len(participant_responses)} participant response segments")
     return participant_responses
 
@@ -155,6 +274,31 @@ def split_into_sentences(text: str) -> List[str]:
     return [s.strip() for s in sentences if s.strip()]
 
 
+def locate_segments(text: str, segments: List[str]) -> List[Tuple[Optional[int], Optional[int]]]:
+    """
+    Find (start, end) character offsets of each segment in the source text.
+    Segments are searched in order from the end of the previous match; whitespace
+    inside a segment matches any whitespace run (responses are re-joined with spaces).
+    Returns (None, None) for segments that cannot be located.
+    """
+    offsets = []
+    cursor = 0
+    for seg in segments:
+        start = text.find(seg, cursor)
+        if start >= 0:
+            end = start + len(seg)
+        else:
+            pattern = r'\s+'.join(re.escape(tok) for tok in seg.split())
+            m = re.compile(pattern).search(text, cursor) if pattern else None
+            if not m:
+                offsets.append((None, None))
+                continue
+            start, end = m.start(), m.end()
+        offsets.append((start, end))
+        cursor = end
+    return offsets
+
+
 def suggest_keywords_from_texts(texts: List[str], top_n: int = 20, ngram_range=(1, 2)) -> List[str]:
     """
     Suggest domain keywords using TF-IDF across a list of texts (uploaded transcripts).
@@ -163,6 +307,7 @@ def suggest_keywords_from_texts(texts: List[str], top_n: int = 20, ngram_range=(
     if not texts:
         return []
     try:
+        from sklearn.feature_extraction.text import TfidfVectorizer
         vectorizer = TfidfVectorizer(stop_words='english', ngram_range=ngram_range, max_df=0.85)
         X = vectorizer.fit_transform(texts)
         scores = X.sum(axis=0).A1  # sum TF-IDF scores across docs
@@ -210,7 +355,88 @@ def generate_initial_code(text: str, codebook: Dict[str, List[str]], domain_keyw
         return "Technology-related practice", None
     if any(w in text_lower for w in ['student', 'class', 'teach', 'learner']):
         return "Teaching-related practice", None
-    return "General educational practice", None
+    return FALLBACK_CODE, None
+
+
+class CodebookIndex:
+    """
+    A codebook and domain keywords lowercased once, for coding many segments with the
+    same configuration. code(text) returns exactly what generate_initial_code would.
+    """
+
+    def __init__(self, codebook: Dict[str, List[str]], domain_keywords: Optional[List[str]] = None):
+        self.domain = [(kw, kw.lower()) for kw in domain_keywords or []]
+        self.labels = [(label, [kw.lower() for kw in keywords]) for label, keywords in codebook.items()]
+
+    def code(self, text: str) -> Tuple[str, Optional[str]]:
+        text_lower = text.lower()
+        for kw, kw_lower in self.domain:
+            if kw_lower in text_lower:
+                return f"Domain-specific practice ({kw})", kw
+        for label, keywords in self.labels:
+            for kw_lower in keywords:
+                if kw_lower in text_lower:
+                    return label, None
+        if any(w in text_lower for w in ['technology', 'digital', 'computer']):
+            return "Technology-related practice", None
+        if any(w in text_lower for w in ['student', 'class', 'teach', 'learner']):
+            return "Teaching-related practice", None
+        return FALLBACK_CODE, None
+
+
+def iter_segments(responses: Iterable[str], min_segment_length: int = 15) -> Iterator[str]:
+    """
+    Yield meaning units: each response split into sentences, dropping fragments
+    shorter than min_segment_length characters.
+    """
+    for resp in responses:
+        for sent in split_into_sentences(resp):
+            if len(sent) < min_segment_length:
+                continue
+            yield sent
+
+
+def segment_transcript(transcript_text: str, min_segment_length: int = 15) -> List[str]:
+    """
+    Split a transcript into meaning units: participant responses broken into sentences,
+    dropping fragments shorter than min_segment_length characters.
+    """
+    return list(iter_segments(extract_participant_responses(transcript_text), min_segment_length))
+
+
+def iter_coded_rows(
+    segments: Iterable[str],
+    codebook: Dict[str, List[str]],
+    domain_keywords: Optional[List[str]] = None,
+    index: Optional[CodebookIndex] = None
+) -> Iterator[Dict[str, str]]:
+    """
+    Yield one Stage 1 row (Segment_ID, Interview_Text, Initial_Code, Notes) per segment.
+    index: optional prebuilt CodebookIndex of codebook and domain_keywords.
+    """
+    index = index or CodebookIndex(codebook, domain_keywords)
+    for seg_id, sent in enumerate(segments, 1):
+        code, matched_kw = index.code(sent)
+        note = f"{DOMAIN_NOTE_PREFIX}{matched_kw}" if matched_kw else ""
+        yield {
+            'Segment_ID': f'S{seg_id:03d}',
+            'Interview_Text': sent,
+            'Initial_Code': code,
+            'Notes': note
+        }
+
+
+def code_segments(
+    segments: List[str],
+    codebook: Dict[str, List[str]],
+    domain_keywords: Optional[List[str]] = None,
+    index: Optional[CodebookIndex] = None
+) -> pd.DataFrame:
+    """
+    Assign an initial code to every segment.
+    Returns DataFrame with columns: Segment_ID, Interview_Text, Initial_Code, Notes
+    """
+    return pd.DataFrame(list(iter_coded_rows(segments, codebook, domain_keywords, index)))
 
 
 def stage1_initial_coding(
@@ -223,61 +449,152 @@ def stage1_initial_coding(
     Stage 1: extract participant responses, split into meaning units, assign initial codes.
     Returns DataFrame with columns: Segment_ID, Interview_Text, Initial_Code, Notes
     """
-    participant_responses = extract_participant_responses(transcript_text)
-    rows = []
-    seg_id = 1
-    for resp in participant_responses:
-        sentences = split_into_sentences(resp)
-        for sent in sentences:
-            if len(sent) < 15:
-                continue
-            code, matched_kw = generate_initial_code(sent, codebook, domain_keywords)
-            note = f"Matched domain keyword: {matched_kw}" if matched_kw else ""
-            rows.append({
-                'Segment_ID': f'S{seg_id:03d}',
-                'Interview_Text': sent,
-                'Initial_Code': code,
-                'Notes': note
-            })
-            seg_id += 1
-    df = pd.DataFrame(rows)
+    df = code_segments(segment_transcript(transcript_text), codebook, domain_keywords)
     logger.info(f"Stage1: {len(df)} segments coded for {interview_id}")
     return df
 
 
+STAGE1_COLUMNS = ['Segment_ID', 'Interview_Text', 'Initial_Code', 'Notes']
+STAGE2_COLUMNS = ['Group_ID', 'Group_Title', 'Codes_Included', 'Segment_IDs', 'Number_of_Codes']
+STAGE3_COLUMNS = ['Research_Question', 'Main_Theme', 'Sub_Theme', 'Supporting_Code', 'Supporting_Quote', 'Segment_ID']
+
+STAGE2_GROUPS = [
+    ('G01', 'Professional Background and Identity', ['professional', 'identity', 'experience', 'career']),
+    ('G02', 'Digital Tools and Platforms', ['lms', 'multimedia', 'social media', 'virtual', 'presentation', 'technology']),
+    ('G03', 'Professional Development and Learning', ['professional development', 'continuous learning', 'training', 'workshop']),
+    ('G04', 'Technology Integration Challenges', ['challenge', 'limitation', 'barrier', 'problem', 'resource']),
+    ('G05', 'Assessment and Feedback Practices', ['assessment', 'feedback', 'grading', 'evaluation']),
+    ('G06', 'Student Engagement and Interaction', ['engagement', 'interaction', 'motivation', 'participation']),
+    ('G07', 'General Teaching Practices', ['teaching', 'educational', 'general'])
+]
+
+STAGE3_THEMES = {
+    'Technology Integration Barriers': ['challenge', 'limitation', 'barrier', 'problem'],
+    'Skill and Knowledge Gaps': ['lack', 'limited', 'insufficient', 'gap'],
+    'Institutional Constraints': ['resource', 'support', 'institutional'],
+    'Professional Development Strategies': ['training', 'workshop', 'development', 'learning'],
+    'Peer and Collaborative Learning': ['colleague', 'peer', 'collaboration'],
+    'Self-Directed Learning': ['self', 'independent', 'personal'],
+    'Communication and Collaboration Tools': ['lms', 'social media', 'virtual', 'communication'],
+    'Multimedia and Presentation Tools': ['multimedia', 'presentation', 'video', 'visual'],
+    'Assessment and Feedback Systems': ['assessment', 'feedback', 'evaluation', 'grading'],
+    'Student Engagement Technologies': ['engagement', 'interaction', 'motivation']
+}
+
+
+class Stage2Accumulator:
+    """
+    Incremental Stage 2: feed Stage 1 rows one at a time, read the groups at any point.
+    Keyword matching is memoized per code label, since labels repeat across rows.
+    """
+
+    def __init__(self, groups=None):
+        self.groups = groups if groups is not None else STAGE2_GROUPS
+        self.matched_codes = [[] for _ in self.groups]
+        self.segment_ids = [[] for _ in self.groups]
+        self._group_hits: Dict[str, List[int]] = {}
+
+    def group_hits(self, initial_code) -> List[int]:
+        """
+        Indexes of the groups a code label belongs to.
+        """
+        ic = str(initial_code)
+        hits = self._group_hits.get(ic)
+        if hits is None:
+            low = ic.lower()
+            hits = [i for i, (_, _, keywords) in enumerate(self.groups) if any(k in low for k in keywords)]
+            self._group_hits[ic] = hits
+        return hits
+
+    def add(self, segment_id: str, initial_code):
+        ic = str(initial_code)
+        for i in self.group_hits(ic):
+            if ic not in self.matched_codes[i]:
+                self.matched_codes[i].append(ic)
+            self.segment_ids[i].append(segment_id)
+
+    def group_row(self, i: int, matched_codes, segment_ids: List[str]) -> Dict:
+        gid, title, _ = self.groups[i]
+        return {
+            'Group_ID': gid,
+            'Group_Title': title,
+            'Codes_Included': ', '.join(sorted(set(matched_codes))),
+            'Segment_IDs': ', '.join(segment_ids),
+            'Number_of_Codes': len(segment_ids)
+        }
+
+    def result(self) -> pd.DataFrame:
+        stage2_rows = [
+            self.group_row(i, matched_codes, segment_ids)
+            for i, (matched_codes, segment_ids) in enumerate(zip(self.matched_codes, self.segment_ids))
+            if matched_codes
+        ]
+        return pd.DataFrame(stage2_rows)
+
+
+class Stage3Accumulator:
+    """
+    Incremental Stage 3: keeps only the first max_quotes supporting rows per theme,
+    so memory stays bounded however many segments are fed in.
+    """
+
+    def __init__(self, research_questions: List[str], themes=None, max_quotes: int = 5):
+        self.research_questions = research_questions
+        self.themes = themes if themes is not None else STAGE3_THEMES
+        self.max_quotes = max_quotes
+        self.relevant: Dict[str, List[Dict]] = {name: [] for name in self.themes}
+        self._theme_hits: Dict[str, List[str]] = {}
+
+    def theme_hits(self, initial_code) -> List[str]:
+        """
+        Names of the themes a code label supports.
+        """
+        key = str(initial_code)
+        hits = self._theme_hits.get(key)
+        if hits is None:
+            low = key.lower()
+            hits = [name for name, keywords in self.themes.items() if any(k in low for k in keywords)]
+            self._theme_hits[key] = hits
+        return hits
+
+    def add(self, segment_id: str, initial_code, text: str):
+        for name in self.theme_hits(initial_code):
+            if len(self.relevant[name]) < self.max_quotes:
+                self.relevant[name].append({'code': initial_code, 'quote': text, 'segment_id': segment_id})
+
+    def theme_rows(self, theme_name: str, relevant: List[Dict]) -> List[Dict]:
+        if self.research_questions:
+            # crc32 rather than hash(): str hashes are salted per process
+            rq_idx = zlib.crc32(theme_name.encode('utf-8')) % len(self.research_questions)
+            rq_text = self.research_questions[rq_idx]
+        else:
+            rq_text = f"(No RQ) — {theme_name}"
+        return [{
+            'Research_Question': rq_text,
+            'Main_Theme': theme_name,
+            'Sub_Theme': f"{theme_name} - Example {i+1}",
+            'Supporting_Code': item['code'],
+            'Supporting_Quote': item['quote'][:500],
+            'Segment_ID': item['segment_id']
+        } for i, item in enumerate(relevant)]
+
+    def result(self) -> pd.DataFrame:
+        rows = []
+        for theme_name in self.themes:
+            rows.extend(self.theme_rows(theme_name, self.relevant[theme_name]))
+        return pd.DataFrame(rows)
+
+
 def stage2_code_grouping(stage1_df: pd.DataFrame) -> pd.DataFrame:
     """
     Stage 2: group similar initial codes into broader groups by simple keyword mapping.
     Returns DataFrame: Group_ID, Group_Title, Codes_Included, Segment_IDs, Number_of_Codes
     """
-    groups = [
-        ('G01', 'Professional Background and Identity', ['professional', 'identity', 'experience', 'career']),
-        ('G02', 'Digital Tools and Platforms', ['lms', 'multimedia', 'social media', 'virtual', 'presentation', 'technology']),
-        ('G03', 'Professional Development and Learning', ['professional development', 'continuous learning', 'training', 'workshop']),
-        ('G04', 'Technology Integration Challenges', ['challenge', 'limitation', 'barrier', 'problem', 'resource']),
-        ('G05', 'Assessment and Feedback Practices', ['assessment', 'feedback', 'grading', 'evaluation']),
-        ('G06', 'Student Engagement and Interaction', ['engagement', 'interaction', 'motivation', 'participation']),
-        ('G07', 'General Teaching Practices', ['teaching', 'educational', 'general'])
-    ]
-    stage2_rows = []
-    for gid, title, keywords in groups:
-        matched_codes = []
-        segment_ids = []
-        for _, row in stage1_df.iterrows():
-            ic = str(row['Initial_Code'])
-            if any(k in ic.lower() for k in keywords):
-                if ic not in matched_codes:
-                    matched_codes.append(ic)
-                segment_ids.append(row['Segment_ID'])
-        if matched_codes:
-            stage2_rows.append({
-                'Group_ID': gid,
-                'Group_Title': title,
-                'Codes_Included': ', '.join(sorted(set(matched_codes))),
-                'Segment_IDs': ', '.join(segment_ids),
-                'Number_of_Codes': len(segment_ids)
-            })
-    df2 = pd.DataFrame(stage2_rows)
+    acc = Stage2Accumulator()
+    if not stage1_df.empty:
+        for seg_id, code in zip(stage1_df['Segment_ID'], stage1_df['Initial_Code']):
+            acc.add(seg_id, code)
+    df2 = acc.result()
     logger.info(f"Stage2: {len(df2)} groups created")
     return df2
 
@@ -287,50 +604,143 @@ def stage3_thematic_framework(stage1_df: pd.DataFrame, research_questions: List[
     Stage 3: build thematic framework mapping initial codes to RQs
     Returns DataFrame: Research_Question, Main_Theme, Sub_Theme, Supporting_Code, Supporting_Quote, Segment_ID
     """
-    rq_mappings = {
-        'Technology Integration Barriers': ['challenge', 'limitation', 'barrier', 'problem'],
-        'Skill and Knowledge Gaps': ['lack', 'limited', 'insufficient', 'gap'],
-        'Institutional Constraints': ['resource', 'support', 'institutional'],
-        'Professional Development Strategies': ['training', 'workshop', 'development', 'learning'],
-        'Peer and Collaborative Learning': ['colleague', 'peer', 'collaboration'],
-        'Self-Directed Learning': ['self', 'independent', 'personal'],
-        'Communication and Collaboration Tools': ['lms', 'social media', 'virtual', 'communication'],
-        'Multimedia and Presentation Tools': ['multimedia', 'presentation', 'video', 'visual'],
-        'Assessment and Feedback Systems': ['assessment', 'feedback', 'evaluation', 'grading'],
-        'Student Engagement Technologies': ['engagement', 'interaction', 'motivation']
-    }
-
-    rows = []
-    for theme_name, keywords in rq_mappings.items():
-        relevant = []
-        for _, r in stage1_df.iterrows():
-            if any(k in str(r['Initial_Code']).lower() for k in keywords):
-                relevant.append({'code': r['Initial_Code'], 'quote': r['Interview_Text'], 'segment_id': r['Segment_ID']})
-        if not relevant:
-            continue
-        if research_questions:
-            rq_idx = (abs(hash(theme_name)) % len(research_questions))
-            rq_text = research_questions[rq_idx]
-        else:
-            rq_text = f"(No RQ) — {theme_name}"
-        for i, item in enumerate(relevant[:5]):
-            rows.append({
-                'Research_Question': rq_text,
-                'Main_Theme': theme_name,
-                'Sub_Theme': f"{theme_name} - Example {i+1}",
-                'Supporting_Code': item['code'],
-                'Supporting_Quote': item['quote'][:500],
-                'Segment_ID': item['segment_id']
-            })
-    df3 = pd.DataFrame(rows)
+    acc = Stage3Accumulator(research_questions)
+    if not stage1_df.empty:
+        for seg_id, code, text in zip(stage1_df['Segment_ID'], stage1_df['Initial_Code'], stage1_df['Interview_Text']):
+            acc.add(seg_id, code, text)
+    df3 = acc.result()
     logger.info(f"Stage3: {len(df3)} thematic entries created")
     return df3
 
 
+def _remove_sorted(values: List[int], value: int) -> int:
+    i = bisect.bisect_left(values, value)
+    del values[i]
+    return i
+
+
+class IncrementalStages:
+    """
+    One transcript's Stage 1 table with its Stage 2/3 kept current under manual recoding.
+    Maintains code -> segment positions and, per group and theme, the sorted positions of
+    their member segments; recode() updates only the groups and themes a change touches and
+    patches those rows of stage2/stage3 in place. The tables always equal what
+    stage2_code_grouping / stage3_thematic_framework would produce from stage1.
+    """
+
+    def __init__(self, stage1_df: pd.DataFrame, research_questions: List[str],
+                 groups=None, themes=None, max_quotes: int = 5):
+        self.stage1 = stage1_df.reset_index(drop=True).copy()
+        if not self.stage1.empty:
+            self.stage1['Initial_Code'] = self.stage1['Initial_Code'].astype(object)
+        self._grouping = Stage2Accumulator(groups)
+        self._framework = Stage3Accumulator(research_questions, themes, max_quotes)
+        self._segment_ids = self.stage1['Segment_ID'].tolist() if not self.stage1.empty else []
+        self._position = {sid: i for i, sid in enumerate(self._segment_ids)}
+        codes = self.stage1['Initial_Code'].tolist() if not self.stage1.empty else []
+        self.code_segments: Dict[str, List[int]] = defaultdict(list)
+        for i, code in enumerate(codes):
+            self.code_segments[code].append(i)
+        self._group_members: List[List[int]] = [[] for _ in self._grouping.groups]
+        self._group_codes: List[Dict[str, int]] = [defaultdict(int) for _ in self._grouping.groups]
+        self._theme_members: Dict[str, List[int]] = {name: [] for name in self._framework.themes}
+        for code, positions in self.code_segments.items():
+            for g in self._grouping.group_hits(code):
+                self._group_members[g].extend(positions)
+                self._group_codes[g][str(code)] += len(positions)
+            for t in self._framework.theme_hits(code):
+                self._theme_members[t].extend(positions)
+        for members in itertools.chain(self._group_members, self._theme_members.values()):
+            members.sort()
+        self.stage2 = pd.DataFrame([r for g in range(len(self._grouping.groups)) for r in self._group_rows(g)],
+                                   columns=STAGE2_COLUMNS)
+        self.stage3 = pd.DataFrame([r for t in self._framework.themes for r in self._theme_rows(t)],
+                                   columns=STAGE3_COLUMNS)
+
+    def _group_rows(self, g: int) -> List[Dict]:
+        members = self._group_members[g]
+        if not members:
+            return []
+        codes = [c for c, n in self._group_codes[g].items() if n]
+        return [self._grouping.group_row(g, codes, [self._segment_ids[i] for i in members])]
+
+    def _theme_rows(self, name: str) -> List[Dict]:
+        relevant = [{'code': self.stage1.at[i, 'Initial_Code'], 'quote': self.stage1.at[i, 'Interview_Text'],
+                     'segment_id': self._segment_ids[i]}
+                    for i in self._theme_members[name][:self._framework.max_quotes]]
+        return self._framework.theme_rows(name, relevant)
+
+    def recode(self, changes: Dict[str, str]) -> Tuple[List[str], List[str]]:
+        """
+        Apply {Segment_ID: new Initial_Code}; returns the Group_IDs and theme names whose rows changed.
+        """
+        groups, themes = set(), set()
+        quotes = self._framework.max_quotes
+        for segment_id, new_code in changes.items():
+            i = self._position[segment_id]
+            old_code = self.stage1.at[i, 'Initial_Code']
+            if old_code == new_code:
+                continue
+            self.stage1.at[i, 'Initial_Code'] = new_code
+            _remove_sorted(self.code_segments[old_code], i)
+            if not self.code_segments[old_code]:
+                del self.code_segments[old_code]
+            bisect.insort(self.code_segments[new_code], i)
+
+            old_groups, new_groups = self._grouping.group_hits(old_code), self._grouping.group_hits(new_code)
+            for g in old_groups:
+                self._group_codes[g][str(old_code)] -= 1
+                if g not in new_groups:
+                    _remove_sorted(self._group_members[g], i)
+            for g in new_groups:
+                self._group_codes[g][str(new_code)] += 1
+                if g not in old_groups:
+                    bisect.insort(self._group_members[g], i)
+            groups.update(old_groups, new_groups)
+
+            old_themes, new_themes = self._framework.theme_hits(old_code), self._framework.theme_hits(new_code)
+            for t in old_themes:
+                if t not in new_themes and _remove_sorted(self._theme_members[t], i) < quotes:
+                    themes.add(t)
+            for t in new_themes:
+                members = self._theme_members[t]
+                if t not in old_themes:
+                    bisect.insort(members, i)
+                # only the first max_quotes members are quoted
+                if bisect.bisect_left(members, i) < quotes:
+                    themes.add(t)
+
+        group_order = [gid for gid, _, _ in self._grouping.groups]
+        for g in sorted(groups):
+            self.stage2 = _patch_rows(self.stage2, 'Group_ID', group_order[g], self._group_rows(g), group_order)
+        theme_order = list(self._framework.themes)
+        for t in themes:
+            self.stage3 = _patch_rows(self.stage3, 'Main_Theme', t, self._theme_rows(t), theme_order)
+        return [group_order[g] for g in sorted(groups)], [t for t in theme_order if t in themes]
+
+
+def _patch_rows(df: pd.DataFrame, key_column: str, key: str, rows: List[Dict], order: List[str]) -> pd.DataFrame:
+    """
+    Replace the rows of df whose key_column is key (rows are kept grouped in order);
+    same-sized blocks are overwritten in place, otherwise the block is spliced in.
+    """
+    mask = (df[key_column] == key).to_numpy()
+    if rows and mask.sum() == len(rows):
+        df.loc[mask, list(df.columns)] = pd.DataFrame(rows, columns=df.columns).to_numpy()
+        return df
+    rank = {k: n for n, k in enumerate(order)}
+    ranks = df[key_column].map(rank).to_numpy()
+    before = ranks < rank[key]
+    return pd.concat([df[before], pd.DataFrame(rows, columns=df.columns), df[~before & ~mask]],
+                     ignore_index=True)
+
+
 def create_excel_file(df: pd.DataFrame, file_path: Path, sheet_name: str = 'Sheet1'):
     """
     Write DataFrame to Excel and do minimal header styling.
     """
+    from openpyxl import load_workbook
+    from openpyxl.styles import Font, Alignment
     file_path.parent.mkdir(parents=True, exist_ok=True)
     with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
         df.to_excel(writer, sheet_name=sheet_name, index=False)
@@ -344,46 +754,882 @@ def create_excel_file(df: pd.DataFrame, file_path: Path, sheet_name: str = 'Shee
     logger.info(f"Excel saved: {file_path}")
 
 
+class StreamingExcelWriter:
+    """
+    Append rows to a write-only openpyxl workbook. Rows go to disk as they arrive,
+    so a sheet never has to be materialized as a DataFrame first.
+    """
+
+    def __init__(self, file_path: Path, columns: List[str], sheet_name: str = 'Sheet1'):
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment, Border, Side
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        self.file_path = file_path
+        self.columns = columns
+        self.rows = 0
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(sheet_name)
+        thin = Side(style='thin')
+        header = []
+        for col in columns:
+            cell = WriteOnlyCell(self.ws, value=col)
+            cell.font = Font(bold=True)
+            cell.alignment = Alignment(wrap_text=True)
+            cell.border = Border(top=thin, right=thin, bottom=thin, left=thin)
+            header.append(cell)
+        self.ws.append(header)
+
+    def append(self, row: Dict):
+        self.ws.append([row[c] for c in self.columns])
+        self.rows += 1
+
+    def close(self):
+        self.wb.save(self.file_path)
+        logger.info(f"Excel saved: {self.file_path} ({self.rows} rows, streamed)")
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class RunMetrics:
+    """
+    Low-overhead instrumentation for one analysis run: wall time per stage, event
+    counters (segments, keyword hits, ...) and bytes read/written, overall and per file.
+    Written as a JSON run report next to the outputs and optionally in Prometheus
+    text format, so throughput can be compared across releases and machines.
+    """
+
+    def __init__(self, run_name: str = ''):
+        self.run_name = run_name
+        self.started_at = datetime.datetime.now().isoformat(timespec='seconds')
+        self._t0 = time.perf_counter()
+        self.stage_seconds: Dict[str, float] = defaultdict(float)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.files: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self.extra: Dict[str, Dict] = {}  # per-file sections added by other instrumentation
+
+    def _file(self, file: str) -> Dict[str, Dict[str, float]]:
+        entry = self.files.get(file)
+        if entry is None:
+            entry = self.files[file] = {'stages': defaultdict(float), 'counters': defaultdict(int)}
+        return entry
+
+    @contextmanager
+    def stage(self, name: str, file: Optional[str] = None):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t
+            self.stage_seconds[name] += elapsed
+            if file is not None:
+                self._file(file)['stages'][name] += elapsed
+
+    def incr(self, name: str, value: int = 1, file: Optional[str] = None):
+        self.counters[name] += value
+        if file is not None:
+            self._file(file)['counters'][name] += value
+
+    def to_dict(self) -> Dict:
+        wall = time.perf_counter() - self._t0
+        segments = self.counters.get('segments', 0)
+        return {
+            'run_name': self.run_name,
+            'version': __version__,
+            'started_at': self.started_at,
+            'wall_seconds': round(wall, 6),
+            'host': {
+                'hostname': platform.node(),
+                'python': platform.python_version(),
+                'cpu_count': os.cpu_count(),
+            },
+            'stage_seconds': {k: round(v, 6) for k, v in self.stage_seconds.items()},
+            'counters': dict(self.counters),
+            'throughput': {
+                'segments_per_second': round(segments / wall, 3) if wall else 0.0,
+                'bytes_read_per_second': round(self.counters.get('bytes_read', 0) / wall, 3) if wall else 0.0,
+            },
+            'files': {
+                name: dict(
+                    stages={k: round(v, 6) for k, v in entry['stages'].items()},
+                    counters=dict(entry['counters']),
+                    **self.extra.get(name, {})
+                )
+                for name, entry in self.files.items()
+            },
+        }
+
+    def to_prometheus(self, prefix: str = 'qualcoder') -> str:
+        """
+        Prometheus text exposition format (suitable for the node_exporter textfile collector).
+        """
+        def esc(v) -> str:
+            return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        base = f'run="{esc(self.run_name)}",version="{esc(__version__)}"'
+        lines = [
+            f'# HELP {prefix}_stage_seconds_total Wall time spent in each pipeline stage.',
+            f'# TYPE {prefix}_stage_seconds_total counter',
+        ]
+        for name, v in sorted(self.stage_seconds.items()):
+            lines.append(f'{prefix}_stage_seconds_total{{{base},stage="{esc(name)}"}} {v:.6f}')
+        lines += [
+            f'# HELP {prefix}_events_total Pipeline event counters (segments, keyword hits, bytes, files).',
+            f'# TYPE {prefix}_events_total counter',
+        ]
+        for name, v in sorted(self.counters.items()):
+            lines.append(f'{prefix}_events_total{{{base},counter="{esc(name)}"}} {v}')
+        lines += [
+            f'# HELP {prefix}_run_wall_seconds Wall time of the run so far.',
+            f'# TYPE {prefix}_run_wall_seconds gauge',
+            f'{prefix}_run_wall_seconds{{{base}}} {time.perf_counter() - self._t0:.6f}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, output_folder: Path, prometheus: Optional[bool] = None) -> Path:
+        """
+        Write run_report.json (and metrics.prom if prometheus is enabled) into output_folder.
+        prometheus defaults to the QUALCODER_PROMETHEUS environment variable; if
+        QUALCODER_PROMETHEUS_DIR is set, the .prom file is also written there.
+        """
+        output_folder.mkdir(parents=True, exist_ok=True)
+        report_path = output_folder / 'run_report.json'
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        prom_dir = os.environ.get('QUALCODER_PROMETHEUS_DIR')
+        if prometheus is None:
+            prometheus = bool(os.environ.get('QUALCODER_PROMETHEUS')) or bool(prom_dir)
+        if prometheus:
+            text = self.to_prometheus()
+            (output_folder / 'metrics.prom').write_text(text, encoding='utf-8')
+            if prom_dir:
+                Path(prom_dir).mkdir(parents=True, exist_ok=True)
+                (Path(prom_dir) / 'qualcoder.prom').write_text(text, encoding='utf-8')
+        logger.info(f"Run report saved: {report_path}")
+        return report_path
+
+
+class ProgressTracker:
+    """
+    Rate-limited progress events from the pipeline for a UI or CLI. The pipeline reports
+    pages extracted, participant turns parsed, segments coded and workbooks written;
+    callback(event) receives at most one event per min_interval seconds (plus every file
+    boundary) as a dict with the batch-wide fraction done, segments/s and ETA.
+    files: the whole batch, so the ETA covers every file (weighted by size).
+    """
+
+    # Share of a file's time spent up to the end of each event's phase
+    SPANS = {'pages': (0.0, 0.1), 'turns': (0.1, 0.15), 'segments': (0.15, 0.9), 'written': (0.9, 1.0)}
+    # Streaming interleaves reading and coding, so reading progress drives the whole file
+    STREAMING_SPANS = {'pages': (0.0, 0.9), 'read': (0.0, 0.9), 'written': (0.9, 1.0)}
+
+    def __init__(self, callback, files: Optional[List[Path]] = None, min_interval: float = 0.5):
+        self.callback = callback
+        self.min_interval = min_interval
+        self.sizes = {Path(f).name: self._size(Path(f)) for f in files or []}
+        self.files_total = len(self.sizes)
+        self.files_done = 0
+        self.bytes_done = 0
+        self.bytes_skipped = 0  # files resumed as already done do not count towards throughput
+        self.segments = 0  # coded in finished files
+        self.file = None
+        self._spans = self.SPANS
+        self._latest: Dict[str, Tuple[int, Optional[int]]] = {}
+        self._t0 = time.perf_counter()
+        self._next_emit = 0.0
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        try:
+            return max(path.stat().st_size, 1)
+        except OSError:
+            return 1
+
+    def begin_file(self, file: str, size: int, streaming: bool = False):
+        if file not in self.sizes:
+            self.sizes[file] = max(size, 1)
+            self.files_total = len(self.sizes)
+        self.file = file
+        self._spans = self.STREAMING_SPANS if streaming else self.SPANS
+        self._latest = {}
+        self._emit('file_started', file, 0, None)
+
+    def update(self, event: str, file: str, done: int, total: Optional[int] = None, force: bool = False):
+        """
+        Record that done of total units of event are complete for file. Cheap when
+        rate-limited: a dict store and a clock read unless an event is due.
+        """
+        self._latest[event] = (done, total)
+        now = time.perf_counter()
+        if force or now >= self._next_emit:
+            self._emit(event, file, done, total, now)
+
+    def track(self, iterable: Iterable, event: str, file: str, total: Optional[int] = None,
+              measure=None) -> Iterator:
+        """
+        Pass items of iterable through, reporting how many (or, with measure, how much
+        of them) have been consumed.
+        """
+        done = 0
+        for item in iterable:
+            done += 1 if measure is None else measure(item)
+            self.update(event, file, done, total)
+            yield item
+        self.update(event, file, done, total if total is not None else done, force=True)
+
+    def finish_file(self, file: str, error: Optional[str] = None):
+        self.files_done += 1
+        self.bytes_done += self.sizes.get(file, 1)
+        self.segments += self._file_segments()
+        self.file = None
+        self._latest = {}
+        self._emit('file_done', file, 1, 1, error=error)
+
+    def skip_file(self, file: str):
+        self.files_done += 1
+        self.bytes_skipped += self.sizes.get(file, 1)
+        self._emit('file_skipped', file, 1, 1)
+
+    def _file_segments(self) -> int:
+        return self._latest.get('segments', (0, None))[0]
+
+    def _file_fraction(self) -> float:
+        fraction = 0.0
+        for event, (done, total) in self._latest.items():
+            span = self._spans.get(event)
+            if span is not None:
+                lo, hi = span
+                fraction = max(fraction, lo + (hi - lo) * (min(done / total, 1.0) if total else 0.0))
+        return fraction
+
+    def fraction(self) -> float:
+        total = sum(self.sizes.values()) - self.bytes_skipped
+        if total <= 0:
+            return 1.0 if self.files_total and self.files_done >= self.files_total else 0.0
+        current = self.sizes.get(self.file, 0) * self._file_fraction() if self.file else 0
+        return min((self.bytes_done + current) / total, 1.0)
+
+    def _emit(self, event: str, file: str, done: int, total: Optional[int],
+              now: Optional[float] = None, error: Optional[str] = None):
+        now = time.perf_counter() if now is None else now
+        self._next_emit = now + self.min_interval
+        elapsed = now - self._t0
+        fraction = self.fraction()
+        segments = self.segments + self._file_segments()
+        self.callback({
+            'event': event,
+            'file': file,
+            'done': done,
+            'total': total,
+            'error': error,
+            'files_done': self.files_done,
+            'files_total': self.files_total,
+            'segments': segments,
+            'segments_per_second': round(segments / elapsed, 1) if elapsed > 0 else 0.0,
+            'fraction': round(fraction, 4),
+            'elapsed_seconds': round(elapsed, 1),
+            'eta_seconds': round(elapsed * (1 - fraction) / fraction, 1) if fraction > 0 else None,
+        })
+
+
+def _tracked(iterable: Iterable, progress: Optional[ProgressTracker], event: str, file: str,
+             total: Optional[int] = None, measure=None) -> Iterable:
+    """
+    iterable itself without a tracker, so untracked runs pay nothing in the hot loop.
+    """
+    if progress is None:
+        return iterable
+    return progress.track(iterable, event, file, total, measure)
+
+
+def format_progress(event: Dict) -> str:
+    """
+    One-line summary of a ProgressTracker event, e.g. for a status line or caption.
+    """
+    eta = event['eta_seconds']
+    eta_text = str(datetime.timedelta(seconds=int(eta))) if eta is not None else '--:--'
+    return (f"{event['fraction'] * 100:3.0f}% · {event['files_done']}/{event['files_total']} files · "
+            f"{event['segments']:,} segments ({event['segments_per_second']:,.0f}/s) · ETA {eta_text}")
+
+
+def _guarded(iterable: Iterable, hooks: Tuple) -> Iterable:
+    """
+    iterable with the memory budget checked before every item (see MemoryAccountant),
+    so an over-budget stage stops part way; iterable itself when no hook has a budget.
+    """
+    checks = [h.check_budget for h in hooks if getattr(h, 'budget_bytes', None) is not None]
+    if not checks:
+        return iterable
+    return _checked(iterable, checks[0])
+
+
+def _checked(iterable: Iterable, check) -> Iterator:
+    for item in iterable:
+        check()
+        yield item
+
+
+def _stage_scope(hooks: Tuple, stage: str, file: Optional[str] = None):
+    """
+    Enter stage(name, file) on every active instrumentation hook (metrics, memory, profiler).
+    With no hooks this is a bare nullcontext, so uninstrumented runs pay nothing.
+    """
+    if not hooks:
+        return nullcontext()
+    if len(hooks) == 1:
+        return hooks[0].stage(stage, file)
+    stack = ExitStack()
+    for hook in hooks:
+        stack.enter_context(hook.stage(stage, file))
+    return stack
+
+
+@contextmanager
+def _instrumented(output_folder: Path, file: str, metrics, profiler, memory):
+    """
+    Resolve the instrumentation hooks for one transcript and flush them when it is done.
+    QUALCODER_PROFILE / QUALCODER_MEMORY(_BUDGET_MB) switch profiling and memory
+    accounting on when no hook was passed explicitly.
+    """
+    owned_memory = None
+    if profiler is None and os.environ.get('QUALCODER_PROFILE'):
+        from qualcoder_profiling import profiler_from_env
+        profiler = profiler_from_env(output_folder)
+    if memory is None and (os.environ.get('QUALCODER_MEMORY') or os.environ.get('QUALCODER_MEMORY_BUDGET_MB')):
+        from qualcoder_profiling import memory_accountant_from_env
+        memory = owned_memory = memory_accountant_from_env(metrics)
+    try:
+        yield tuple(h for h in (metrics, memory, profiler) if h is not None)
+    finally:
+        if profiler is not None:
+            profiler.flush(file)
+        if memory is not None:
+            memory.flush(file)
+        if owned_memory is not None:
+            owned_memory.close()
+
+
+def _count_stage1(metrics: Optional[RunMetrics], stage1: pd.DataFrame, file: str):
+    if metrics is None or stage1.empty:
+        return
+    domain_hits = int((stage1['Notes'] != '').sum())
+    fallback = int((stage1['Initial_Code'] == FALLBACK_CODE).sum())
+    metrics.incr('segments', len(stage1), file)
+    metrics.incr('domain_keyword_hits', domain_hits, file)
+    metrics.incr('codebook_hits', len(stage1) - domain_hits - fallback, file)
+    metrics.incr('uncoded_segments', fallback, file)
+
+
+def _stage_keys(
+    file_path: Path,
+    codebook: Dict[str, List[str]],
+    research_questions: List[str],
+    domain_keywords: Optional[List[str]]
+) -> Dict[str, str]:
+    """
+    Cache keys for every stage of one transcript. Each key chains the key of the
+    stage it depends on, so a change only invalidates the stages downstream of it.
+    """
+    keys = {}
+    keys['extract'] = fingerprint('extract', STAGE_VERSIONS['extract'], file_path.suffix.lower(), file_fingerprint(file_path))
+    keys['segment'] = fingerprint('segment', STAGE_VERSIONS['segment'], keys['extract'])
+    keys['code'] = fingerprint('code', STAGE_VERSIONS['code'], keys['segment'], codebook, domain_keywords or [])
+    keys['group'] = fingerprint('group', STAGE_VERSIONS['group'], keys['code'])
+    keys['theme'] = fingerprint('theme', STAGE_VERSIONS['theme'], keys['code'], research_questions)
+    for stage in ('code', 'group', 'theme'):
+        keys[f'write_{stage}'] = fingerprint('write', STAGE_VERSIONS['write'], keys[stage])
+    return keys
+
+
+def _cached(cache, stage: str, key: Optional[str], compute):
+    """
+    Return the cached value for (stage, key), computing and storing it on a miss.
+    """
+    if cache is None:
+        return compute()
+    value = cache.get(stage, key)
+    if value is None:
+        value = compute()
+        cache.put(stage, key, value)
+    else:
+        logger.info(f"Cache hit: {stage} stage ({key[:12]})")
+    return value
+
+
+def _write_excel_cached(df: pd.DataFrame, file_path: Path, sheet_name: str, cache, key: Optional[str]) -> int:
+    """
+    create_excel_file, reusing the workbook bytes produced for identical input earlier.
+    Returns the number of bytes written.
+    """
+    data = cache.get('write', key) if cache is not None else None
+    if data is not None:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(data)
+        logger.info(f"Excel restored from cache: {file_path}")
+        return len(data)
+    create_excel_file(df, file_path, sheet_name=sheet_name)
+    if cache is not None:
+        data = file_path.read_bytes()
+        cache.put('write', key, data)
+        return len(data)
+    return file_path.stat().st_size
+
+
 def process_single_transcript(
     file_path: Path,
     output_folder: Path,
     codebook: Dict[str, List[str]],
     research_questions: List[str],
-    domain_keywords: Optional[List[str]] = None
+    domain_keywords: Optional[List[str]] = None,
+    store=None,
+    run_id: Optional[int] = None,
+    cache=None,
+    metrics: Optional[RunMetrics] = None,
+    profiler=None,
+    memory=None,
+    progress: Optional[ProgressTracker] = None
 ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
     Process a single transcript file through Stage1-3 and write excel files to disk.
     domain_keywords: optional list of domain-specific keywords to prioritize.
+    store/run_id: optional ProjectStore (qualcoder_store) and run to record results into.
+    cache: optional StageCache (qualcoder_cache); only stages whose input fingerprint
+    changed since a previous run are recomputed.
+    metrics: optional RunMetrics collecting stage timings, counters and bytes for this file.
+    profiler: optional StageProfiler (qualcoder_profiling); also enabled by QUALCODER_PROFILE.
+    memory: optional MemoryAccountant (qualcoder_profiling) recording per-stage allocations
+    and enforcing a per-file budget; also enabled by QUALCODER_MEMORY(_BUDGET_MB).
+    progress: optional ProgressTracker receiving pages, turns, segments and written events.
     """
+    with _instrumented(output_folder, file_path.name, metrics, profiler, memory) as hooks:
+        return _process_single_transcript(
+            file_path, output_folder, codebook, research_questions, domain_keywords,
+            store, run_id, cache, metrics, hooks, progress
+        )
+
+
+def _process_single_transcript(
+    file_path: Path,
+    output_folder: Path,
+    codebook: Dict[str, List[str]],
+    research_questions: List[str],
+    domain_keywords: Optional[List[str]],
+    store,
+    run_id: Optional[int],
+    cache,
+    metrics: Optional[RunMetrics],
+    hooks: Tuple,
+    progress: Optional[ProgressTracker] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     interview_id = file_path.stem
-    text = extract_text_from_file(file_path)
+    fname = file_path.name
+    keys = _stage_keys(file_path, codebook, research_questions, domain_keywords) if cache is not None else {}
+    if metrics is not None:
+        metrics.incr('files', 1)
+        metrics.incr('bytes_read', file_path.stat().st_size, fname)
+    on_page = None
+    if progress is not None:
+        progress.begin_file(fname, file_path.stat().st_size)
+        on_page = partial(progress.update, 'pages', fname)
+
+    with _stage_scope(hooks, 'extract', fname):
+        text = _cached(cache, 'extract', keys.get('extract'), lambda: extract_text_from_file(file_path, on_page))
+    if progress is not None:
+        progress.update('pages', fname, 1, 1, force=True)
     if not text:
         logger.warning(f"No text for {file_path}")
+        if metrics is not None:
+            metrics.incr('files_without_text', 1, fname)
         return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
-    stage1 = stage1_initial_coding(text, interview_id, codebook, domain_keywords)
-    stage2 = stage2_code_grouping(stage1) if not stage1.empty else pd.DataFrame()
-    stage3 = stage3_thematic_framework(stage1, research_questions) if not stage1.empty else pd.DataFrame()
+    with _stage_scope(hooks, 'segment', fname):
+        segments = _cached(cache, 'segment', keys.get('segment'), lambda: list(iter_segments(
+            _tracked(_guarded(extract_participant_responses(text), hooks), progress, 'turns', fname))))
+    with _stage_scope(hooks, 'code', fname):
+        stage1 = _cached(cache, 'code', keys.get('code'), lambda: code_segments(
+            _tracked(_guarded(segments, hooks), progress, 'segments', fname, len(segments)),
+            codebook, domain_keywords))
+    if progress is not None:
+        progress.update('segments', fname, len(stage1), len(stage1), force=True)
+    logger.info(f"Stage1: {len(stage1)} segments coded for {interview_id}")
+    _count_stage1(metrics, stage1, fname)
+    with _stage_scope(hooks, 'group', fname):
+        stage2 = _cached(cache, 'group', keys.get('group'), lambda: stage2_code_grouping(stage1)) if not stage1.empty else pd.DataFrame()
+    with _stage_scope(hooks, 'theme', fname):
+        stage3 = _cached(cache, 'theme', keys.get('theme'), lambda: stage3_thematic_framework(stage1, research_questions)) if not stage1.empty else pd.DataFrame()
 
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     out_base = output_folder / f"{interview_id}_{timestamp}"
     out_base.mkdir(parents=True, exist_ok=True)
 
-    if not stage1.empty:
-        create_excel_file(stage1, out_base / f"{interview_id}_Stage1_Initial_Coding.xlsx", sheet_name="Initial Coding")
-    if not stage2.empty:
-        create_excel_file(stage2, out_base / f"{interview_id}_Stage2_Code_Grouping.xlsx", sheet_name="Code Grouping")
-    if not stage3.empty:
-        create_excel_file(stage3, out_base / f"{interview_id}_Stage3_Thematic_Framework.xlsx", sheet_name="Thematic Framework")
+    written = 0
+    with _stage_scope(hooks, 'write', fname):
+        if not stage1.empty:
+            written += _write_excel_cached(stage1, out_base / f"{interview_id}_Stage1_Initial_Coding.xlsx", "Initial Coding", cache, keys.get('write_code'))
+        if progress is not None:
+            progress.update('written', fname, 1, 3)
+        if not stage2.empty:
+            written += _write_excel_cached(stage2, out_base / f"{interview_id}_Stage2_Code_Grouping.xlsx", "Code Grouping", cache, keys.get('write_group'))
+        if progress is not None:
+            progress.update('written', fname, 2, 3)
+        if not stage3.empty:
+            written += _write_excel_cached(stage3, out_base / f"{interview_id}_Stage3_Thematic_Framework.xlsx", "Thematic Framework", cache, keys.get('write_theme'))
+    if progress is not None:
+        progress.update('written', fname, 3, 3, force=True)
+    if metrics is not None:
+        metrics.incr('bytes_written', written, fname)
+
+    if store is not None and run_id is not None:
+        with _stage_scope(hooks, 'store', fname):
+            store.record_transcript(run_id, fname, stage1, stage2, stage3, text=text)
 
     return stage1, stage2, stage3
 
 
+def process_single_transcript_streaming(
+    file_path: Path,
+    output_folder: Path,
+    codebook: Dict[str, List[str]],
+    research_questions: List[str],
+    domain_keywords: Optional[List[str]] = None,
+    store=None,
+    run_id: Optional[int] = None,
+    chunk_size: int = 1000,
+    metrics: Optional[RunMetrics] = None,
+    profiler=None,
+    memory=None,
+    progress: Optional[ProgressTracker] = None
+) -> Tuple[Optional[Path], pd.DataFrame, pd.DataFrame]:
+    """
+    Constant-memory variant of process_single_transcript for very large transcripts.
+    Extraction, turn parsing, sentence splitting and coding are chained generators;
+    Stage 1 rows are written to the workbook (and the project store) in chunks of
+    chunk_size while Stage 2 and Stage 3 are accumulated incrementally.
+    Returns (stage1_workbook_path or None, stage2, stage3); Stage 1 is not kept in memory.
+    metrics: optional RunMetrics; extraction through Stage 1 writing is timed as one 'stream' stage.
+    profiler: optional StageProfiler (qualcoder_profiling); also enabled by QUALCODER_PROFILE.
+    memory: optional MemoryAccountant (qualcoder_profiling); also enabled by QUALCODER_MEMORY(_BUDGET_MB).
+    progress: optional ProgressTracker; completion is estimated from how much of the file was read.
+    """
+    with _instrumented(output_folder, file_path.name, metrics, profiler, memory) as hooks:
+        return _process_single_transcript_streaming(
+            file_path, output_folder, codebook, research_questions, domain_keywords,
+            store, run_id, chunk_size, metrics, hooks, progress
+        )
+
+
+def _process_single_transcript_streaming(
+    file_path: Path,
+    output_folder: Path,
+    codebook: Dict[str, List[str]],
+    research_questions: List[str],
+    domain_keywords: Optional[List[str]],
+    store,
+    run_id: Optional[int],
+    chunk_size: int,
+    metrics: Optional[RunMetrics],
+    hooks: Tuple,
+    progress: Optional[ProgressTracker] = None
+) -> Tuple[Optional[Path], pd.DataFrame, pd.DataFrame]:
+    interview_id = file_path.stem
+    fname = file_path.name
+    size = file_path.stat().st_size
+    if metrics is not None:
+        metrics.incr('files', 1)
+        metrics.incr('bytes_read', size, fname)
+    on_page = None
+    if progress is not None:
+        progress.begin_file(fname, size, streaming=True)
+        on_page = partial(progress.update, 'pages', fname)
+    lines = iter_text_lines(file_path, on_page)
+    if file_path.suffix.lower() == '.txt':
+        # Characters read approximate bytes (+1 for the line break)
+        lines = _tracked(lines, progress, 'read', fname, size, measure=lambda line: len(line) + 1)
+    lines = _guarded(lines, hooks)  # read lazily inside the 'stream' stage
+    rows = iter_coded_rows(
+        _tracked(iter_segments(_tracked(iter_participant_responses(lines), progress, 'turns', fname)),
+                 progress, 'segments', fname),
+        codebook, domain_keywords
+    )
+    acc2 = Stage2Accumulator()
+    acc3 = Stage3Accumulator(research_questions)
+    out_base = None
+    writer = None
+    tid = None
+    n_segments = 0
+    domain_hits = 0
+    fallback = 0
+
+    with _stage_scope(hooks, 'stream', fname):
+        for chunk in _chunked(rows, chunk_size):
+            if writer is None:
+                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                out_base = output_folder / f"{interview_id}_{timestamp}"
+                writer = StreamingExcelWriter(out_base / f"{interview_id}_Stage1_Initial_Coding.xlsx",
+                                              STAGE1_COLUMNS, sheet_name="Initial Coding")
+                if store is not None and run_id is not None:
+                    tid = store.begin_transcript(run_id, file_path.name)
+            for row in chunk:
+                writer.append(row)
+                acc2.add(row['Segment_ID'], row['Initial_Code'])
+                acc3.add(row['Segment_ID'], row['Initial_Code'], row['Interview_Text'])
+                if row['Notes']:
+                    domain_hits += 1
+                elif row['Initial_Code'] == FALLBACK_CODE:
+                    fallback += 1
+            if tid is not None:
+                store.add_segments(tid, chunk)
+            n_segments += len(chunk)
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        logger.warning(f"No segments for {file_path}")
+        return None, pd.DataFrame(), pd.DataFrame()
+
+    logger.info(f"Stage1: {n_segments} segments coded for {interview_id} (streaming)")
+    if metrics is not None:
+        metrics.incr('segments', n_segments, fname)
+        metrics.incr('domain_keyword_hits', domain_hits, fname)
+        metrics.incr('codebook_hits', n_segments - domain_hits - fallback, fname)
+        metrics.incr('uncoded_segments', fallback, fname)
+    with _stage_scope(hooks, 'group', fname):
+        stage2 = acc2.result()
+    with _stage_scope(hooks, 'theme', fname):
+        stage3 = acc3.result()
+    logger.info(f"Stage2: {len(stage2)} groups created")
+    logger.info(f"Stage3: {len(stage3)} thematic entries created")
+
+    with _stage_scope(hooks, 'write', fname):
+        if not stage2.empty:
+            create_excel_file(stage2, out_base / f"{interview_id}_Stage2_Code_Grouping.xlsx", sheet_name="Code Grouping")
+        if not stage3.empty:
+            create_excel_file(stage3, out_base / f"{interview_id}_Stage3_Thematic_Framework.xlsx", sheet_name="Thematic Framework")
+    if progress is not None:
+        progress.update('written', fname, 3, 3, force=True)
+    if metrics is not None:
+        metrics.incr('bytes_written', sum(p.stat().st_size for p in out_base.glob('*.xlsx')), fname)
+    if tid is not None:
+        with _stage_scope(hooks, 'store', fname):
+            store.finish_transcript(tid, stage2, stage3, n_segments)
+
+    return writer.file_path, stage2, stage3
+
+
+MANIFEST_NAME = 'run_manifest.json'
+
+
+class RunManifest:
+    """
+    Checkpoint of a batch run, kept as run_manifest.json in its output folder: one
+    entry per transcript with its input hash, status and output subfolders. A resumed
+    run skips transcripts already done with the same input and configuration.
+    """
+
+    def __init__(self, output_folder: Path, config_key: str = ''):
+        self.folder = Path(output_folder)
+        self.path = self.folder / MANIFEST_NAME
+        self.data = {'version': 1, 'config_key': config_key, 'status': 'running', 'files': {}}
+
+    @classmethod
+    def load(cls, output_folder: Path, config_key: str = '') -> 'RunManifest':
+        """
+        Manifest of output_folder, or a fresh one. Entries recorded under a different
+        configuration are kept for reference but no longer count as done.
+        """
+        manifest = cls(output_folder, config_key)
+        if manifest.path.exists():
+            with open(manifest.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('config_key') != config_key:
+                logger.warning(f"Run configuration changed since {manifest.path} was written; re-running all files")
+                for entry in saved.get('files', {}).values():
+                    entry['status'] = 'stale'
+            saved['config_key'] = config_key
+            saved['status'] = 'running'
+            manifest.data = saved
+        return manifest
+
+    @classmethod
+    def read(cls, output_folder: Path) -> Optional['RunManifest']:
+        """
+        Manifest of output_folder as written, or None if the folder has none.
+        """
+        manifest = cls(output_folder)
+        if not manifest.path.exists():
+            return None
+        with open(manifest.path, 'r', encoding='utf-8') as f:
+            manifest.data = json.load(f)
+        return manifest
+
+    @property
+    def files(self) -> Dict[str, Dict]:
+        return self.data['files']
+
+    def output_files(self, file_name: str) -> List[Path]:
+        """
+        Files written for file_name by its completed run, from the recorded output subfolders.
+        """
+        entry = self.files.get(file_name)
+        if not entry or entry['status'] != 'done':
+            return []
+        return sorted(p for d in entry.get('outputs', []) if (self.folder / d).is_dir()
+                      for p in (self.folder / d).iterdir() if p.is_file())
+
+    def is_done(self, file_name: str, input_hash: str) -> bool:
+        entry = self.files.get(file_name)
+        return bool(entry) and entry['status'] == 'done' and entry['input_hash'] == input_hash
+
+    def discard_partial_outputs(self, file_name: str):
+        """
+        Remove output subfolders left by an interrupted attempt at file_name.
+        """
+        entry = self.files.get(file_name)
+        if not entry or entry['status'] != 'running':
+            return
+        claimed = {o for e in self.files.values() if e['status'] == 'done' for o in e.get('outputs', [])}
+        for d in self.folder.glob(f"{Path(file_name).stem}_*"):
+            if d.is_dir() and d.name not in claimed:
+                logger.info(f"Removing partial outputs {d}")
+                shutil.rmtree(d, ignore_errors=True)
+
+    def mark(self, file_name: str, input_hash: Optional[str], status: str,
+             outputs: Optional[List[str]] = None, error: Optional[str] = None):
+        self.files[file_name] = {
+            'input_hash': input_hash,
+            'status': status,
+            'outputs': sorted(outputs or []),
+            'error': error,
+            'updated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+        self.save()
+
+    def set_status(self, status: str):
+        self.data['status'] = status
+        self.save()
+
+    def save(self):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def batch_config_key(codebook: Dict[str, List[str]], research_questions: List[str],
+                     domain_keywords: Optional[List[str]], streaming: bool = False) -> str:
+    """
+    Fingerprint of everything besides the input files that determines a batch's outputs.
+    """
+    return fingerprint(STAGE_VERSIONS, codebook, research_questions, domain_keywords or [], streaming)
+
+
+def process_batch(
+    files: List[Path],
+    output_folder: Path,
+    codebook: Dict[str, List[str]],
+    research_questions: List[str],
+    domain_keywords: Optional[List[str]] = None,
+    store=None,
+    run_id: Optional[int] = None,
+    cache=None,
+    metrics: Optional[RunMetrics] = None,
+    profiler=None,
+    memory=None,
+    streaming: bool = False,
+    on_file=None,
+    manifest: Optional[RunManifest] = None,
+    cancel=None,
+    progress: Optional[ProgressTracker] = None,
+    slot=None
+) -> Tuple[List[Tuple[str, Optional[pd.DataFrame], pd.DataFrame, pd.DataFrame]], Dict[str, str]]:
+    """
+    Run the pipeline over several transcripts into one output folder.
+    Returns ([(file_name, stage1, stage2, stage3)], {file_name: error}); stage1 is None in
+    streaming mode. A failing file is logged and skipped so the rest of the batch completes.
+    on_file: optional callback(files_done, file_name, error_or_None) after each file.
+    manifest: optional RunManifest; files it records as done (same input hash) are skipped
+    and every finished file is checkpointed, so an interrupted batch can be resumed.
+    cancel: optional object with is_set() (e.g. threading.Event), checked between files so
+    a stop request lets the current file finish cleanly.
+    progress: optional ProgressTracker (created over files) for in-file progress, throughput and ETA.
+    slot: optional callable(file_path) returning a context manager held while a file is processed
+    (e.g. a qualcoder_scheduler.FairScheduler slot), so a shared server can bound concurrent work.
+    """
+    results = []
+    errors: Dict[str, str] = {}
+    cancelled = False
+    for idx, file_path in enumerate(files):
+        file_path = Path(file_path)
+        if cancel is not None and cancel.is_set():
+            logger.info(f"Batch cancelled after {idx} of {len(files)} files")
+            cancelled = True
+            break
+        input_hash = None
+        if manifest is not None:
+            input_hash = file_fingerprint(file_path) if file_path.exists() else None
+            if input_hash is not None and manifest.is_done(file_path.name, input_hash):
+                logger.info(f"Skipping {file_path.name}: already completed in this run")
+                if progress is not None:
+                    progress.skip_file(file_path.name)
+                if on_file is not None:
+                    on_file(idx + 1, file_path.name, None)
+                continue
+            manifest.discard_partial_outputs(file_path.name)
+            before = set(p.name for p in output_folder.glob(f"{file_path.stem}_*"))
+            manifest.mark(file_path.name, input_hash, 'running')
+        try:
+            with slot(file_path) if slot is not None else nullcontext():
+                if streaming:
+                    _, s2, s3 = process_single_transcript_streaming(
+                        file_path, output_folder, codebook, research_questions, domain_keywords,
+                        store=store, run_id=run_id, metrics=metrics, profiler=profiler, memory=memory,
+                        progress=progress
+                    )
+                    s1 = None
+                else:
+                    s1, s2, s3 = process_single_transcript(
+                        file_path, output_folder, codebook, research_questions, domain_keywords,
+                        store=store, run_id=run_id, cache=cache, metrics=metrics, profiler=profiler,
+                        memory=memory, progress=progress
+                    )
+            results.append((file_path.name, s1, s2, s3))
+            if manifest is not None:
+                outputs = set(p.name for p in output_folder.glob(f"{file_path.stem}_*")) - before
+                manifest.mark(file_path.name, input_hash, 'done', outputs=list(outputs))
+        except Exception as e:
+            logger.error(f"Failed processing {file_path.name}: {e}")
+            errors[file_path.name] = str(e)
+            if manifest is not None:
+                manifest.mark(file_path.name, input_hash, 'failed', error=str(e))
+        if progress is not None:
+            progress.finish_file(file_path.name, errors.get(file_path.name))
+        if on_file is not None:
+            on_file(idx + 1, file_path.name, errors.get(file_path.name))
+    if manifest is not None:
+        manifest.set_status('cancelled' if cancelled else 'complete')
+    return results, errors
+
+
 def make_output_folder(project_name: str) -> Path:
     """
     Create an outputs folder named by project and timestamp.
     """
     ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    p = Path('outputs') / f"{project_name}_{ts}"
-    p.mkdir(parents=True, exist_ok=True)
-    return p
+    base = Path('outputs') / f"{project_name}_{ts}"
+    base.parent.mkdir(parents=True, exist_ok=True)
+    # Runs started in the same second (e.g. by parallel workers) get their own folders
+    for n in itertools.count(1):
+        p = base if n == 1 else base.with_name(f"{base.name}_{n}")
+        try:
+            p.mkdir()
+            return p
+        except FileExistsError:
+            continue
@@ -0,0 +1,245 @@
+"""
+qualcoder_crosscase.py
+Cross-case matrices for the Results tab: transcripts × codes and transcripts × themes
+counts. Rows are added (or replaced) one transcript at a time from its Stage 1 code
+counts and kept as scipy sparse rows, so thousands of transcripts and hundreds of
+codes are never held as a dense array; only the slice shown in a heatmap or written
+to a wide export is densified. The theme matrix is the code matrix times a sparse
+code -> theme membership matrix built from the Stage 3 theme keywords.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from qualcoder_core import Stage3Accumulator
+
+logger = logging.getLogger(__name__)
+
+NORMALIZATIONS = ('count', 'row', 'column', 'binary')
+ORDERS = ('input', 'name', 'total', 'cluster')
+
+
+def _inverse(values: np.ndarray) -> np.ndarray:
+    out = np.zeros(len(values), dtype=np.float64)
+    np.divide(1.0, values, out=out, where=values != 0)
+    return out
+
+
+class CrossCaseMatrix:
+    """
+    Sparse count matrix with named rows (transcripts) and columns (codes or themes).
+    Columns are added as new labels appear; the CSR matrix is rebuilt from the per-row
+    cells only after a change.
+    """
+
+    def __init__(self, row_label: str = 'File', column_label: str = 'Code'):
+        self.row_label = row_label
+        self.column_label = column_label
+        self.rows: List[str] = []
+        self.columns: List[str] = []
+        self._row_index: Dict[str, int] = {}
+        self._column_index: Dict[str, int] = {}
+        self._cells: List[Tuple[np.ndarray, np.ndarray]] = []  # per row: column indices, counts
+        self._stamps: Dict[str, int] = {}
+        self._csr: Optional[sp.csr_matrix] = None
+        self._clusters: Optional[Tuple[int, np.ndarray, np.ndarray]] = None
+        self._themes: Optional['CrossCaseMatrix'] = None
+
+    @classmethod
+    def from_results(cls, results: Iterable[Tuple]) -> 'CrossCaseMatrix':
+        """
+        Transcripts × codes from [(file_name, stage1, stage2, stage3)]; use update() to
+        keep a matrix in step with a SessionResults instead.
+        """
+        matrix = cls()
+        for fname, s1, _, _ in results:
+            counts = s1['Initial_Code'].value_counts(sort=False) if s1 is not None and not s1.empty else {}
+            matrix.set_row(fname, {code: int(n) for code, n in dict(counts).items() if n})
+        return matrix
+
+    @classmethod
+    def from_csr(cls, matrix: sp.csr_matrix, rows: List[str], columns: List[str],
+                 row_label: str = 'File', column_label: str = 'Code') -> 'CrossCaseMatrix':
+        out = cls(row_label, column_label)
+        out.rows, out.columns = list(rows), list(columns)
+        out._row_index = {name: i for i, name in enumerate(out.rows)}
+        out._column_index = {name: j for j, name in enumerate(out.columns)}
+        matrix = sp.csr_matrix(matrix)
+        matrix.eliminate_zeros()
+        out._cells = [(matrix.indices[a:b].astype(np.int32), matrix.data[a:b])
+                      for a, b in zip(matrix.indptr[:-1], matrix.indptr[1:])]
+        out._csr = matrix
+        return out
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.rows), len(self.columns)
+
+    def set_row(self, name: str, counts: Dict[str, int]):
+        """
+        Add a transcript's counts, or replace them if the transcript is already a row.
+        """
+        cols = np.empty(len(counts), dtype=np.int32)
+        vals = np.empty(len(counts), dtype=np.float64)
+        for k, (label, n) in enumerate(counts.items()):
+            j = self._column_index.get(label)
+            if j is None:
+                j = self._column_index[label] = len(self.columns)
+                self.columns.append(label)
+            cols[k], vals[k] = j, n
+        order = np.argsort(cols)
+        i = self._row_index.get(name)
+        if i is None:
+            self._row_index[name] = len(self.rows)
+            self.rows.append(name)
+            self._cells.append((cols[order], vals[order]))
+        else:
+            self._cells[i] = (cols[order], vals[order])
+        self._csr = self._clusters = self._themes = None
+
+    def update(self, results) -> List[str]:
+        """
+        Bring the rows in line with a SessionResults: only transcripts added or replaced
+        since the last update are recounted. Returns their names.
+        """
+        stamps = results.stamps()
+        changed = [f for f, stamp in stamps.items() if self._stamps.get(f) != stamp]
+        for fname in changed:
+            self.set_row(fname, results.file_code_counts(fname))
+            self._stamps[fname] = stamps[fname]
+        return changed
+
+    @property
+    def matrix(self) -> sp.csr_matrix:
+        if self._csr is None:
+            indptr = np.zeros(len(self._cells) + 1, dtype=np.int64)
+            np.cumsum([len(c) for c, _ in self._cells], out=indptr[1:])
+            indices = np.concatenate([c for c, _ in self._cells]) if self._cells else np.empty(0, np.int32)
+            data = np.concatenate([v for _, v in self._cells]) if self._cells else np.empty(0)
+            self._csr = sp.csr_matrix((data, indices, indptr), shape=self.shape)
+        return self._csr
+
+    def themes(self, themes: Optional[Dict[str, List[str]]] = None) -> 'CrossCaseMatrix':
+        """
+        Transcripts × themes: each code's count goes to every theme it supports (the
+        Stage 3 theme keywords), computed as one sparse product.
+        """
+        if self._themes is not None and themes is None:
+            return self._themes
+        acc = Stage3Accumulator([], themes)
+        names = list(acc.themes)
+        position = {name: k for k, name in enumerate(names)}
+        pairs = [(j, position[t]) for j, code in enumerate(self.columns) for t in acc.theme_hits(code)]
+        r = np.fromiter((j for j, _ in pairs), dtype=np.int64, count=len(pairs))
+        c = np.fromiter((k for _, k in pairs), dtype=np.int64, count=len(pairs))
+        membership = sp.csr_matrix((np.ones(len(pairs)), (r, c)), shape=(len(self.columns), len(names)))
+        out = CrossCaseMatrix.from_csr(self.matrix @ membership, self.rows, names, self.row_label, 'Theme')
+        if themes is None:
+            self._themes = out
+        return out
+
+    def normalized(self, how: str = 'count') -> sp.csr_matrix:
+        """
+        'count' as is, 'row' as shares of each transcript's total, 'column' as shares of
+        each code's total, 'binary' as presence (1/0).
+        """
+        m = self.matrix.astype(np.float64)
+        if how == 'count':
+            return m
+        if how == 'binary':
+            m.data[:] = 1.0
+            return m
+        if how == 'row':
+            return sp.csr_matrix(sp.diags(_inverse(np.asarray(m.sum(axis=1)).ravel())) @ m)
+        if how == 'column':
+            return sp.csr_matrix(m @ sp.diags(_inverse(np.asarray(m.sum(axis=0)).ravel())))
+        raise ValueError(f"Unknown normalization: {how}")
+
+    def coclusters(self, n_clusters: int = 4, random_state: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row and column cluster labels from spectral co-clustering of the rows and columns
+        that have counts (-1 for empty ones); clusters are numbered largest first.
+        """
+        if self._clusters is not None and self._clusters[0] == n_clusters:
+            return self._clusters[1], self._clusters[2]
+        m = self.matrix
+        rows = np.flatnonzero(np.diff(m.indptr))
+        cols = np.flatnonzero(np.bincount(m.indices, minlength=m.shape[1]))
+        row_labels = np.full(m.shape[0], -1, dtype=np.int64)
+        col_labels = np.full(m.shape[1], -1, dtype=np.int64)
+        k = min(n_clusters, len(rows), len(cols))
+        if k >= 2:
+            from sklearn.cluster import SpectralCoclustering
+            model = SpectralCoclustering(n_clusters=k, random_state=random_state)
+            try:
+                model.fit(m[rows][:, cols])
+                row_labels[rows], col_labels[cols] = model.row_labels_, model.column_labels_
+            except ValueError as e:  # e.g. too few distinct rows for k singular vectors
+                logger.warning(f"Co-clustering into {k} clusters failed: {e}")
+                k = 1
+        if k == 1:
+            row_labels[rows], col_labels[cols] = 0, 0
+        sizes = np.bincount(row_labels[rows], minlength=max(k, 0)) if k > 0 else np.empty(0, np.int64)
+        rank = np.empty(len(sizes), dtype=np.int64)
+        rank[np.argsort(-sizes, kind='stable')] = np.arange(len(sizes))
+        row_labels[rows] = rank[row_labels[rows]]
+        col_labels[cols] = rank[col_labels[cols]]
+        self._clusters = (n_clusters, row_labels, col_labels)
+        return row_labels, col_labels
+
+    def order(self, axis: int, by: str = 'input', n_clusters: int = 4) -> np.ndarray:
+        """
+        Display order of the rows (axis 0) or columns (axis 1): as added, by name, by
+        total (largest first) or by co-cluster (then by total within a cluster).
+        """
+        names = self.rows if axis == 0 else self.columns
+        totals = np.asarray(self.matrix.sum(axis=1 - axis)).ravel()
+        if by == 'input':
+            return np.arange(len(names))
+        if by == 'name':
+            return np.argsort(np.array(names, dtype=object), kind='stable')
+        if by == 'total':
+            return np.argsort(-totals, kind='stable')
+        if by == 'cluster':
+            labels = self.coclusters(n_clusters)[axis]
+            labels = np.where(labels < 0, np.iinfo(np.int64).max, labels)  # empty rows/columns last
+            return np.lexsort((-totals, labels))
+        raise ValueError(f"Unknown order: {by}")
+
+    def to_frame(
+        self,
+        normalize: str = 'count',
+        row_order: str = 'input',
+        column_order: str = 'input',
+        n_clusters: int = 4,
+        max_rows: Optional[int] = None,
+        max_columns: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        The ordered matrix as a dense frame (rows × columns); only the first max_rows ×
+        max_columns are densified.
+        """
+        rows = self.order(0, row_order, n_clusters)[:max_rows]
+        cols = self.order(1, column_order, n_clusters)[:max_columns]
+        block = self.normalized(normalize)[rows][:, cols].toarray()
+        frame = pd.DataFrame(block, index=pd.Index([self.rows[i] for i in rows], name=self.row_label),
+                             columns=[self.columns[j] for j in cols])
+        return frame.astype('int64') if normalize in ('count', 'binary') else frame
+
+    def to_long(self, normalize: str = 'count') -> pd.DataFrame:
+        """
+        Non-zero cells as (row, column, value) records: the export whose size follows
+        the number of counts, not rows × columns.
+        """
+        coo = self.normalized(normalize).tocoo()
+        value = 'Count' if normalize == 'count' else 'Value'
+        frame = pd.DataFrame({
+            self.row_label: np.array(self.rows, dtype=object)[coo.row] if len(coo.row) else [],
+            self.column_label: np.array(self.columns, dtype=object)[coo.col] if len(coo.col) else [],
+            value: coo.data.astype('int64') if normalize in ('count', 'binary') else coo.data,
+        })
+        return frame.sort_values([self.row_label, value], ascending=[True, False], kind='stable',
+                                 ignore_index=True)
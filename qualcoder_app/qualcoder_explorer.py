@@ -0,0 +1,102 @@
+"""
+qualcoder_explorer.py
+Paged, filtered and sorted queries over the Stage 1 segments of a run, for the
+Results tab explorer. Runs recorded in the project store are queried there
+(qualcoder_store.ProjectStore.search_segments); SegmentTable serves runs that
+only exist in the session. Either way only one page of rows leaves the backend.
+"""
+
+from typing import List, Optional, Tuple
+import re
+import numpy as np
+import pandas as pd
+
+from qualcoder_core import DOMAIN_NOTE_PREFIX
+
+SORTS = ('document', 'file', 'code', 'length')  # same keys as qualcoder_store.SEARCH_SORTS
+PAGE_COLUMNS = ['File', 'Segment_ID', 'Initial_Code', 'Domain_Keyword', 'Interview_Text']
+
+
+def _search_terms(query: str) -> List[str]:
+    """
+    Lowercased words of a search box query; like the store's full-text search, every
+    word must match and a trailing '*' is a prefix (any substring matches here).
+    """
+    return [t.rstrip('*').lower() for t in re.findall(r'\w+\*?', query)]
+
+
+class SegmentTable:
+    """
+    All Stage 1 segments of a run in one frame, in document order, with the lowercased
+    text kept alongside so repeated searches do not re-lowercase every segment.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame.reset_index(drop=True)
+        self._lower = self.frame['Interview_Text'].str.lower()
+        self._length = self.frame['Interview_Text'].str.len()
+
+    @classmethod
+    def from_results(cls, results: List[Tuple]) -> 'SegmentTable':
+        """
+        Build from session results [(file_name, stage1, stage2, stage3)]; files whose
+        Stage 1 was streamed to disk (stage1 None) are left out.
+        """
+        parts = [s1.assign(File=fname) for fname, s1, _, _ in results if s1 is not None and not s1.empty]
+        if not parts:
+            return cls(pd.DataFrame(columns=PAGE_COLUMNS))
+        frame = pd.concat(parts, ignore_index=True)
+        notes = frame['Notes'].fillna('')
+        frame['Domain_Keyword'] = notes.astype(str).str.slice(len(DOMAIN_NOTE_PREFIX)).where(
+            notes.astype(str).str.startswith(DOMAIN_NOTE_PREFIX), '')
+        # labels repeat on every row; only the text columns stay as strings
+        for col in ('File', 'Initial_Code', 'Domain_Keyword'):
+            frame[col] = frame[col].astype('category')
+        return cls(frame[PAGE_COLUMNS])
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def files(self) -> List[str]:
+        return [str(f) for f in self.frame['File'].drop_duplicates()]
+
+    def codes(self) -> List[str]:
+        counts = self.frame['Initial_Code'].value_counts()
+        return counts[counts > 0].index.tolist()
+
+    def keywords(self) -> List[str]:
+        return sorted(str(k) for k in self.frame['Domain_Keyword'].unique() if k)
+
+    def query(
+        self,
+        text: str = '',
+        code: Optional[str] = None,
+        file_name: Optional[str] = None,
+        keyword: Optional[str] = None,
+        sort: str = 'document',
+        descending: bool = False,
+        limit: int = 25,
+        offset: int = 0
+    ) -> Tuple[pd.DataFrame, int]:
+        """
+        One page of matching segments and the total number of matches.
+        """
+        mask = np.ones(len(self.frame), dtype=bool)
+        if code:
+            mask &= (self.frame['Initial_Code'] == code).to_numpy()
+        if file_name:
+            mask &= (self.frame['File'] == file_name).to_numpy()
+        if keyword:
+            mask &= (self.frame['Domain_Keyword'] == keyword).to_numpy()
+        rows = np.flatnonzero(mask)
+        for term in _search_terms(text):
+            # narrow the candidates first so each further word scans fewer rows
+            rows = rows[self._lower.iloc[rows].str.contains(term, regex=False).to_numpy()]
+        total = len(rows)
+        if sort != 'document':
+            key = {'file': self.frame['File'], 'code': self.frame['Initial_Code'], 'length': self._length}[sort]
+            # stable sort keeps document order among equal keys
+            rows = rows[np.argsort(key.iloc[rows].to_numpy(), kind='stable')]
+        if descending:
+            rows = rows[::-1]
+        return self.frame.iloc[rows[offset:offset + limit]], total
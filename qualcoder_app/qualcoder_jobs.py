@@ -0,0 +1,419 @@
+"""
+qualcoder_jobs.py
+Background job queue for analyses. Jobs are rows in a SQLite database; worker
+processes claim queued jobs, run the pipeline and record the results in the
+project store, so a run keeps going when the browser tab reloads or disconnects
+and the Results tab can pick it up afterwards.
+"""
+
+from pathlib import Path
+from typing import List, Dict, Optional, Any
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import sqlite3
+import logging
+import datetime
+import threading
+import multiprocessing
+import pandas as pd
+
+from qualcoder_core import (
+    make_output_folder, process_batch, RunMetrics, RunManifest, batch_config_key, ProgressTracker,
+    configure_logging
+)
+from qualcoder_store import ProjectStore, DEFAULT_STORE_PATH
+from qualcoder_retention import OutputRetention
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_PATH = Path('outputs') / 'qualcoder_jobs.db'
+DEFAULT_JOBS_DIR = Path('outputs') / 'jobs'  # uploaded transcripts, one folder per job
+FINISHED_STATUSES = ('done', 'failed', 'cancelled')
+ACTIVE_STATUSES = ('queued', 'running', 'cancelling')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    project_name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    heartbeat_at TEXT,
+    worker TEXT,
+    config TEXT NOT NULL,
+    files TEXT NOT NULL,
+    files_total INTEGER NOT NULL,
+    files_done INTEGER NOT NULL DEFAULT 0,
+    current_file TEXT,
+    output_folder TEXT,
+    run_id INTEGER,
+    errors TEXT,
+    error TEXT,
+    progress TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, job_id);
+"""
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+def _worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists but owned by someone else
+    return True
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue shared by the app and any number of worker processes.
+    Claiming a job is a single guarded UPDATE inside an IMMEDIATE transaction, so two
+    workers never run the same job.
+    """
+
+    def __init__(self, path: Path = DEFAULT_JOBS_PATH, jobs_dir: Path = DEFAULT_JOBS_DIR):
+        self.path = Path(path)
+        self.jobs_dir = Path(jobs_dir)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.executescript(SCHEMA)
+        columns = {r['name'] for r in self.conn.execute('PRAGMA table_info(jobs)')}
+        if 'progress' not in columns:  # queues created before progress events
+            self.conn.execute('ALTER TABLE jobs ADD COLUMN progress TEXT')
+
+    def _update(self, job_id: int, **fields):
+        cols = ', '.join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self.conn.execute(f"UPDATE jobs SET {cols} WHERE job_id = ?", (*fields.values(), job_id))
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job['config'] = json.loads(job['config'])
+        job['files'] = json.loads(job['files'])
+        job['errors'] = json.loads(job['errors']) if job['errors'] else {}
+        job['progress'] = json.loads(job['progress']) if job['progress'] else None
+        return job
+
+    def new_inputs_dir(self) -> Path:
+        """
+        Fresh folder to save a job's uploaded transcripts into before submitting it.
+        """
+        d = self.jobs_dir / f"{datetime.datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}"
+        d.mkdir(parents=True, exist_ok=True)
+        return d
+
+    def inputs_dir(self, job: Dict[str, Any]) -> Optional[Path]:
+        """
+        The new_inputs_dir folder holding a job's transcripts, or None if its files live elsewhere.
+        """
+        parents = {Path(f).parent for f in job['files']}
+        if len(parents) == 1:
+            folder = parents.pop()
+            if folder.parent == self.jobs_dir.resolve():
+                return folder
+        return None
+
+    def input_dirs(self) -> Dict[Path, str]:
+        """
+        Input folder -> status of the latest job using it, for retention (qualcoder_retention.py).
+        """
+        with self._lock:
+            rows = self.conn.execute('SELECT files, status FROM jobs ORDER BY job_id').fetchall()
+        found = {}
+        for row in rows:
+            folder = self.inputs_dir({'files': json.loads(row['files'])})
+            if folder is not None:
+                found[folder] = row['status']
+        return found
+
+    def discard_inputs(self, job: Dict[str, Any]):
+        folder = self.inputs_dir(job)
+        if folder is not None:
+            shutil.rmtree(folder, ignore_errors=True)
+            logger.info(f"Removed the inputs of job {job['job_id']} ({folder.name})")
+
+    def submit(self, project_name: str, files: List[Path], config: Dict[str, Any]) -> int:
+        """
+        Queue an analysis of files (paths that stay readable until the job runs).
+        config: research_questions, domain_keywords, codebook and optional run options
+        (streaming, reuse_cache, profile, memory_budget_mb).
+        """
+        files = [str(Path(f).resolve()) for f in files]
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT INTO jobs (project_name, created_at, config, files, files_total) VALUES (?, ?, ?, ?, ?)",
+                (project_name, _now(), json.dumps(config), json.dumps(files), len(files))
+            )
+        logger.info(f"Queued job {cur.lastrowid} ({len(files)} files) for {project_name}")
+        return cur.lastrowid
+
+    def claim(self, worker: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest queued job, or return None if there is none.
+        """
+        worker = worker or _worker_name()
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.conn.execute(
+                    "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY job_id LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, heartbeat_at = ? "
+                        "WHERE job_id = ?", (worker, _now(), _now(), row['job_id'])
+                    )
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return self.get(row['job_id']) if row is not None else None
+
+    def progress(self, job_id: int, files_done: int, current_file: Optional[str] = None):
+        self._update(job_id, files_done=files_done, current_file=current_file, heartbeat_at=_now())
+
+    def progress_event(self, job_id: int, event: Dict[str, Any]):
+        """
+        Latest ProgressTracker event of a running job (fraction, segments/s, ETA).
+        """
+        self._update(job_id, progress=json.dumps(event), heartbeat_at=_now())
+
+    def finish(self, job_id: int, errors: Optional[Dict[str, str]] = None, cancelled: bool = False) -> str:
+        """
+        Record the end of a job's run; returns its final status.
+        """
+        job = self.get(job_id)
+        errors = errors or {}
+        if cancelled:
+            status = 'cancelled'
+        elif job and errors and len(errors) >= job['files_total']:
+            status = 'failed'
+        else:
+            status = 'done'
+        self._update(job_id, status=status, finished_at=_now(), current_file=None,
+                     errors=json.dumps(errors) if errors else None)
+        return status
+
+    def fail(self, job_id: int, error: str):
+        self._update(job_id, status='failed', finished_at=_now(), current_file=None, error=error)
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancel a queued job at once, or ask a running one to stop after its current file.
+        Returns False if the job has already finished.
+        """
+        with self._lock:
+            cur = self.conn.execute(
+                "UPDATE jobs SET status = CASE status WHEN 'queued' THEN 'cancelled' ELSE 'cancelling' END, "
+                "finished_at = CASE status WHEN 'queued' THEN ? ELSE finished_at END "
+                "WHERE job_id = ? AND status IN ('queued', 'running')",
+                (_now(), job_id)
+            )
+        return cur.rowcount == 1
+
+    def cancel_requested(self, job_id: int) -> bool:
+        job = self.get(job_id)
+        return job is not None and job['status'] == 'cancelling'
+
+    def resume(self, job_id: int) -> bool:
+        """
+        Queue a cancelled or failed job again; it continues in the same output folder and
+        skips the transcripts its run manifest records as done.
+        """
+        with self._lock:
+            cur = self.conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, finished_at = NULL, errors = NULL, error = NULL, "
+                "progress = NULL WHERE job_id = ? AND status IN ('cancelled', 'failed')", (job_id,)
+            )
+        return cur.rowcount == 1
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row(row)
+
+    def list_jobs(self, limit: int = 20) -> pd.DataFrame:
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT job_id, status, project_name, created_at, finished_at, files_done, files_total, "
+                "current_file, run_id, output_folder FROM jobs ORDER BY job_id DESC LIMIT ?",
+                self.conn, params=(limit,)
+            )
+
+    def requeue_orphans(self) -> int:
+        """
+        Put back in the queue running jobs whose worker process on this host has died.
+        """
+        host = socket.gethostname()
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT job_id, worker, status FROM jobs WHERE status IN ('running', 'cancelling')").fetchall()
+        requeued = 0
+        for row in rows:
+            worker_host, _, pid = (row['worker'] or '').rpartition(':')
+            if worker_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                if row['status'] == 'cancelling':
+                    self._update(row['job_id'], status='cancelled', finished_at=_now(), current_file=None)
+                    continue
+                self._update(row['job_id'], status='queued', worker=None, files_done=0, current_file=None)
+                requeued += 1
+        if requeued:
+            logger.warning(f"Requeued {requeued} job(s) left running by a dead worker")
+        return requeued
+
+
+class _JobCancel:
+    """
+    cancel flag for process_batch backed by the job's status in the queue.
+    """
+
+    def __init__(self, queue: JobQueue, job_id: int):
+        self.queue = queue
+        self.job_id = job_id
+
+    def is_set(self) -> bool:
+        return self.queue.cancel_requested(self.job_id)
+
+
+def run_job(queue: JobQueue, job: Dict[str, Any], store: ProjectStore, cache=None):
+    """
+    Run one claimed job to completion, recording progress in the queue and results in the store.
+    A job that already has an output folder (resumed or requeued) continues in it, unless
+    the retention quotas have removed the folder in the meantime.
+    """
+    from qualcoder_profiling import StageProfiler, MemoryAccountant, MB
+
+    job_id = job['job_id']
+    config = job['config']
+    if job['output_folder'] and Path(job['output_folder']).is_dir() and job['run_id'] is not None \
+            and store.get_run(job['run_id']) is not None:
+        out_folder, run_id = Path(job['output_folder']), job['run_id']
+        logger.info(f"Resuming job {job_id} in {out_folder}")
+    else:
+        out_folder = make_output_folder(job['project_name'])
+        run_id = store.start_run(job['project_name'], out_folder, config={
+            'research_questions': config['research_questions'],
+            'domain_keywords': config.get('domain_keywords', []),
+            'codebook': config['codebook'],
+            'job_id': job_id,
+        })
+        queue._update(job_id, output_folder=str(out_folder), run_id=run_id)
+    streaming = config.get('streaming', False)
+    manifest = RunManifest.load(out_folder, batch_config_key(
+        config['codebook'], config['research_questions'], config.get('domain_keywords'), streaming))
+
+    metrics = RunMetrics(job['project_name'])
+    profiler = StageProfiler(out_folder, mode=config['profile']) if config.get('profile') else None
+    memory = None
+    if config.get('memory_budget_mb') is not None or config.get('track_memory'):
+        budget = config.get('memory_budget_mb')
+        memory = MemoryAccountant(metrics, budget_bytes=int(budget * MB) if budget else None)
+    files = [Path(f) for f in job['files']]
+
+    def on_file(done: int, name: str, error: Optional[str]):
+        nxt = files[done].name if done < len(files) else None
+        queue.progress(job_id, done, nxt)
+
+    cancel = _JobCancel(queue, job_id)
+    progress = ProgressTracker(lambda event: queue.progress_event(job_id, event), files, min_interval=1.0)
+    try:
+        queue.progress(job_id, 0, files[0].name if files else None)
+        _, errors = process_batch(
+            files, out_folder, config['codebook'], config['research_questions'],
+            config.get('domain_keywords') or [], store=store, run_id=run_id,
+            cache=cache if config.get('reuse_cache', True) else None,
+            metrics=metrics, profiler=profiler, memory=memory,
+            streaming=streaming, on_file=on_file, manifest=manifest, cancel=cancel,
+            progress=progress
+        )
+    finally:
+        if memory is not None:
+            memory.close()
+    metrics.write_report(out_folder)
+    cancelled = manifest.data['status'] == 'cancelled'
+    # Errors of earlier attempts that a resume did not retry stay on record
+    errors = dict({n: e['error'] for n, e in manifest.files.items() if e['status'] == 'failed'}, **errors)
+    if queue.finish(job_id, errors, cancelled=cancelled) == 'done':
+        queue.discard_inputs(job)  # failed and cancelled jobs can be resumed, so they keep theirs
+    OutputRetention(out_folder.parent).enforce(protect=[out_folder])
+    logger.info(f"Job {job_id} {'cancelled' if cancelled else 'finished'}: "
+                f"{sum(e['status'] == 'done' for e in manifest.files.values())}/{len(files)} files done")
+
+
+def run_worker(
+    jobs_path: Path = DEFAULT_JOBS_PATH,
+    store_path: Path = DEFAULT_STORE_PATH,
+    cache_dir: Optional[Path] = None,
+    poll_interval: float = 1.0,
+    max_jobs: Optional[int] = None,
+    stop_event=None
+) -> int:
+    """
+    Worker loop: claim and run jobs until stop_event is set or max_jobs have run
+    (with max_jobs, return as soon as the queue is empty). Returns the number of jobs run.
+    """
+    from qualcoder_cache import StageCache, DEFAULT_CACHE_DIR
+
+    configure_logging()  # spawned workers start with unconfigured logging
+    queue = JobQueue(jobs_path)
+    store = ProjectStore(store_path)
+    cache = StageCache(cache_dir or DEFAULT_CACHE_DIR)
+    ran = 0
+    while stop_event is None or not stop_event.is_set():
+        if max_jobs is not None and ran >= max_jobs:
+            break
+        job = queue.claim()
+        if job is None:
+            if max_jobs is not None:
+                break
+            time.sleep(poll_interval)
+            continue
+        try:
+            run_job(queue, job, store, cache)
+        except Exception as e:
+            logger.exception(f"Job {job['job_id']} failed")
+            queue.fail(job['job_id'], str(e))
+        ran += 1
+    return ran
+
+
+def start_workers(
+    count: int = 1,
+    jobs_path: Path = DEFAULT_JOBS_PATH,
+    store_path: Path = DEFAULT_STORE_PATH,
+    cache_dir: Optional[Path] = None
+) -> List[multiprocessing.Process]:
+    """
+    Start worker processes (spawned, so they share nothing with the caller's threads).
+    Jobs left running by dead workers are requeued first.
+    """
+    JobQueue(jobs_path).requeue_orphans()
+    ctx = multiprocessing.get_context('spawn')
+    workers = []
+    for _ in range(count):
+        p = ctx.Process(target=run_worker, args=(jobs_path, store_path, cache_dir), daemon=True)
+        p.start()
+        workers.append(p)
+    logger.info(f"Started {count} analysis worker process(es)")
+    return workers
@@ -0,0 +1,320 @@
+"""
+qualcoder_profiling.py
+Opt-in profiling of pipeline stages. Each stage of a transcript runs under
+cProfile (or a lightweight stack sampler) and one .prof file plus one
+collapsed-stack text file (flamegraph.pl / speedscope input) is written per
+transcript. Enable with QUALCODER_PROFILE=cprofile|sample, the CLI --profile
+flag or the Analysis tab toggle; nothing is imported or run when disabled.
+
+MemoryAccountant does the same for memory: tracemalloc peak/net allocation and
+the top allocation sites per stage, with an optional per-file budget.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+import os
+import re
+import sys
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = 'QUALCODER_PROFILE'
+PROFILE_MODES = ('cprofile', 'sample')
+DEFAULT_SAMPLE_INTERVAL = 0.005  # seconds
+MEMORY_ENV = 'QUALCODER_MEMORY'
+MEMORY_BUDGET_ENV = 'QUALCODER_MEMORY_BUDGET_MB'
+MB = 1024 * 1024
+
+
+def _frame_label(filename: str, lineno: int, funcname: str) -> str:
+    return f"{Path(filename).stem}:{funcname}:{lineno}".replace(';', ',').replace(' ', '_')
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', name)
+
+
+def pstats_to_collapsed(stats: pstats.Stats, root: str, max_depth: int = 64) -> Counter:
+    """
+    Approximate collapsed stacks ("root;f1;f2 microseconds") from a cProfile call graph.
+    cProfile only records caller->callee edges, so a function's self time is split
+    across the paths that reach it in proportion to each edge's cumulative time.
+    """
+    raw = stats.stats  # func -> (cc, nc, tt, ct, callers)
+    callees: Dict[Tuple, List[Tuple[Tuple, float]]] = defaultdict(list)
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            if caller in raw:
+                callees[caller].append((func, edge[3]))
+    roots = [f for f, v in raw.items() if not any(c in raw for c in v[4])]
+
+    out: Counter = Counter()
+
+    def walk(func, path: List[str], weight: float, seen: frozenset):
+        _, _, tt, ct, _ = raw[func]
+        label = _frame_label(*func)
+        stack = path + [label]
+        self_us = int(tt * weight * 1e6)
+        if self_us:
+            out[';'.join(stack)] += self_us
+        if len(stack) >= max_depth:
+            return
+        for callee, edge_ct in callees.get(func, ()):
+            if callee in seen:
+                continue
+            callee_ct = raw[callee][3]
+            if callee_ct <= 0 or edge_ct <= 0:
+                continue
+            walk(callee, stack, weight * edge_ct / callee_ct, seen | {callee})
+
+    for func in roots:
+        walk(func, [root], 1.0, frozenset([func]))
+    return out
+
+
+class _StackSampler(threading.Thread):
+    """
+    Samples the target thread's Python stack every interval seconds.
+    """
+
+    def __init__(self, target_thread_id: int, root: str, interval: float, counts: Counter):
+        super().__init__(daemon=True)
+        self.target = target_thread_id
+        self.root = root
+        self.interval = interval
+        self.counts = counts
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(_frame_label(code.co_filename, frame.f_lineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join([self.root] + stack[::-1])] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class StageProfiler:
+    """
+    Profiles pipeline stages per transcript and writes the artifacts to
+    <output_folder>/profiles/: <file>.prof (cprofile mode) and <file>.collapsed.txt.
+    In cprofile mode collapsed values are microseconds; in sample mode they are sample counts.
+    """
+
+    def __init__(self, output_folder: Path, mode: str = 'cprofile', interval: float = DEFAULT_SAMPLE_INTERVAL):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}; expected one of {PROFILE_MODES}")
+        self.folder = Path(output_folder) / 'profiles'
+        self.mode = mode
+        self.interval = interval
+        self._profiles: Dict[str, List[Tuple[str, cProfile.Profile]]] = defaultdict(list)
+        self._samples: Dict[str, Counter] = defaultdict(Counter)
+
+    @contextmanager
+    def stage(self, name: str, file: Optional[str] = None):
+        file = file or 'run'
+        if self.mode == 'cprofile':
+            prof = cProfile.Profile()
+            prof.enable()
+            try:
+                yield
+            finally:
+                prof.disable()
+                self._profiles[file].append((name, prof))
+        else:
+            sampler = _StackSampler(threading.get_ident(), name, self.interval, self._samples[file])
+            sampler.start()
+            try:
+                yield
+            finally:
+                sampler.stop()
+
+    def flush(self, file: str) -> List[Path]:
+        """
+        Write the artifacts collected for one transcript and release them.
+        """
+        written = []
+        self.folder.mkdir(parents=True, exist_ok=True)
+        base = self.folder / _safe_name(Path(file).stem)
+        collapsed: Counter = Counter()
+        profiles = self._profiles.pop(file, [])
+        if profiles:
+            combined = None
+            for stage, prof in profiles:
+                st = pstats.Stats(prof)
+                collapsed.update(pstats_to_collapsed(st, stage))
+                if combined is None:
+                    combined = st
+                else:
+                    combined.add(st)
+            prof_path = base.with_suffix('.prof')
+            combined.dump_stats(str(prof_path))
+            written.append(prof_path)
+        collapsed.update(self._samples.pop(file, Counter()))
+        if collapsed:
+            txt_path = Path(f"{base}.collapsed.txt")
+            with open(txt_path, 'w', encoding='utf-8') as f:
+                for stack, value in sorted(collapsed.items()):
+                    f.write(f"{stack} {value}\n")
+            written.append(txt_path)
+        if written:
+            logger.info(f"Profile written for {file}: {', '.join(p.name for p in written)}")
+        return written
+
+
+def profiler_from_env(output_folder: Path) -> Optional[StageProfiler]:
+    """
+    StageProfiler configured by QUALCODER_PROFILE (cprofile|sample|1), or None when unset.
+    QUALCODER_PROFILE_INTERVAL overrides the sampling interval in seconds.
+    """
+    mode = os.environ.get(PROFILE_ENV, '').strip().lower()
+    if not mode or mode in ('0', 'false', 'off'):
+        return None
+    if mode in ('1', 'true', 'on'):
+        mode = 'cprofile'
+    interval = float(os.environ.get('QUALCODER_PROFILE_INTERVAL', DEFAULT_SAMPLE_INTERVAL))
+    return StageProfiler(output_folder, mode=mode, interval=interval)
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """
+    Raised when a transcript's traced allocations exceed the per-file memory budget.
+    """
+
+
+class MemoryAccountant:
+    """
+    Per-stage memory accounting with tracemalloc: peak and net traced bytes and the
+    top allocation sites (net growth by source line) for every stage of every file.
+    Results go to metrics.extra[file]['memory'] so they appear in the run report.
+
+    budget_bytes caps the traced peak of one file above the level it started at. The
+    pipeline calls check_budget() for every turn, segment or line it reads, so a stage
+    fails part way through as soon as the budget is crossed; stages without such a
+    loop are checked when they end. Either way MemoryBudgetExceeded names the stage.
+    Peaks are per stage on Python 3.9+ (tracemalloc.reset_peak); older versions
+    report the peak since tracing started.
+    """
+
+    def __init__(self, metrics=None, budget_bytes: Optional[int] = None, top_n: int = 5, nframes: int = 1):
+        self.metrics = metrics
+        self.budget_bytes = budget_bytes
+        self.top_n = top_n
+        self.nframes = nframes
+        self.files: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+        self._file_base: Dict[str, int] = {}
+        self._running: Optional[Tuple[str, str, int]] = None  # file, stage, base of the stage in progress
+        self._started = False
+
+    def _ensure_tracing(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.nframes)
+            self._started = True
+
+    def _top_sites(self, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> List[Dict]:
+        here = tracemalloc.Filter(False, __file__)
+        diffs = after.filter_traces([here]).compare_to(before.filter_traces([here]), 'lineno')
+        sites = []
+        for d in sorted(diffs, key=lambda d: -d.size_diff)[:self.top_n]:
+            if d.size_diff <= 0:
+                break
+            frame = d.traceback[0]
+            sites.append({'site': f"{Path(frame.filename).name}:{frame.lineno}",
+                          'net_bytes': d.size_diff, 'count': d.count_diff})
+        return sites
+
+    @contextmanager
+    def stage(self, name: str, file: Optional[str] = None):
+        file = file or 'run'
+        self._ensure_tracing()
+        before = tracemalloc.take_snapshot() if self.top_n else None
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        base = self._file_base.setdefault(file, start)
+        outer, self._running = self._running, (file, name, base)
+        try:
+            yield
+        finally:
+            self._running = outer
+            current, peak = tracemalloc.get_traced_memory()
+            record = {'peak_bytes': max(peak - start, 0), 'net_bytes': current - start}
+            if before is not None:
+                record['top_sites'] = self._top_sites(before, tracemalloc.take_snapshot())
+            self.files[file][name] = record
+            if self.metrics is not None:
+                self.metrics.extra.setdefault(file, {})['memory'] = self.files[file]
+        if self.budget_bytes is not None and peak - base > self.budget_bytes:
+            raise MemoryBudgetExceeded(self._over_budget(file, name, peak - base, 'reached'))
+
+    def _over_budget(self, file: str, name: str, used: int, verb: str) -> str:
+        return (f"{file}: stage '{name}' {verb} {used / MB:.1f} MB of traced memory, "
+                f"over the per-file budget of {self.budget_bytes / MB:.1f} MB")
+
+    def check_budget(self):
+        """
+        Raise MemoryBudgetExceeded now if the stage in progress is over the budget.
+        One get_traced_memory() call, cheap enough to run per segment.
+        """
+        running = self._running
+        if running is None or self.budget_bytes is None:
+            return
+        file, name, base = running
+        used = tracemalloc.get_traced_memory()[1] - base
+        if used > self.budget_bytes:
+            raise MemoryBudgetExceeded(self._over_budget(file, name, used, 'passed'))
+
+    def flush(self, file: str) -> Dict[str, Dict]:
+        """
+        Finish accounting for one transcript and return its per-stage records.
+        """
+        self._file_base.pop(file, None)
+        stages = self.files.get(file, {})
+        if stages:
+            worst = max(stages, key=lambda k: stages[k]['peak_bytes'])
+            logger.info(f"Memory for {file}: peak {stages[worst]['peak_bytes'] / MB:.1f} MB in '{worst}'")
+        return stages
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Peak traced bytes per stage across all files.
+        """
+        peaks: Dict[str, int] = defaultdict(int)
+        for stages in self.files.values():
+            for name, rec in stages.items():
+                peaks[name] = max(peaks[name], rec['peak_bytes'])
+        return dict(peaks)
+
+    def close(self):
+        """
+        Stop tracemalloc if this accountant started it.
+        """
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+
+def memory_accountant_from_env(metrics=None) -> Optional[MemoryAccountant]:
+    """
+    MemoryAccountant enabled by QUALCODER_MEMORY=1 or a QUALCODER_MEMORY_BUDGET_MB budget,
+    or None when neither is set.
+    """
+    budget = os.environ.get(MEMORY_BUDGET_ENV, '').strip()
+    enabled = os.environ.get(MEMORY_ENV, '').strip().lower() not in ('', '0', 'false', 'off')
+    if not budget and not enabled:
+        return None
+    return MemoryAccountant(metrics, budget_bytes=int(float(budget) * MB) if budget else None)
@@ -0,0 +1,313 @@
+"""
+qualcoder_results.py
+Compact, spillable storage for the per-file results a Streamlit session keeps
+(st.session_state['results']). Each file's stage tables are held with categorical
+code/label columns whose categories are interned process-wide, and Segment_IDs
+('S001', ...) as integers decoded through one shared table of ID strings. When a
+session's results grow past QUALCODER_RESULTS_MEMORY_MB, the least recently used
+files are spilled to disk (Parquet when pyarrow is installed, pickle otherwise)
+and read back on access.
+"""
+
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import os
+import sys
+import uuid
+import shutil
+import pickle
+import logging
+import tempfile
+import threading
+import weakref
+import importlib.util
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MEMORY_LIMIT_BYTES = int(float(os.environ.get('QUALCODER_RESULTS_MEMORY_MB', '200')) * 1024 * 1024)
+SPILL_DIR_ENV = 'QUALCODER_SPILL_DIR'
+SPILL_FORMAT = 'parquet' if importlib.util.find_spec('pyarrow') is not None else 'pickle'
+
+# Columns with few distinct values per table; stored as categoricals
+CATEGORICAL_COLUMNS = {
+    'Initial_Code', 'Notes', 'Group_ID', 'Group_Title', 'Codes_Included',
+    'Research_Question', 'Main_Theme', 'Sub_Theme', 'Supporting_Code'
+}
+ID_COLUMNS = ('Segment_ID',)   # one Segment_ID per row
+ID_LIST_COLUMNS = ('Segment_IDs',)  # ', '-joined Segment_IDs (Stage 2)
+
+_id_lock = threading.Lock()
+_id_strings = np.array([''], dtype=object)  # _id_strings[n] is 'S%03d' % n, shared by every session
+
+
+def _id_table(n: int) -> np.ndarray:
+    """
+    The shared Segment_ID string table, grown to cover sequence number n.
+    """
+    global _id_strings
+    if n >= len(_id_strings):
+        with _id_lock:
+            if n >= len(_id_strings):
+                size = max(n + 1, 2 * len(_id_strings))
+                grown = np.empty(size, dtype=object)
+                grown[:len(_id_strings)] = _id_strings
+                grown[len(_id_strings):] = [sys.intern(f'S{i:03d}') for i in range(len(_id_strings), size)]
+                _id_strings = grown
+    return _id_strings
+
+
+def encode_segment_ids(ids) -> Optional[np.ndarray]:
+    """
+    int32 sequence numbers for Segment_IDs of the form 'S001', or None if any ID
+    would not round-trip (those columns are then kept as strings).
+    """
+    ids = [str(i) for i in ids]
+    try:
+        seq = np.fromiter((int(i[1:]) for i in ids), dtype=np.int64, count=len(ids))
+    except ValueError:
+        return None
+    if len(seq) and (seq.min() < 0 or seq.max() > np.iinfo(np.int32).max):
+        return None
+    table = _id_table(int(seq.max()) if len(seq) else 0)
+    if any(table[n] != i for n, i in zip(seq, ids)):
+        return None
+    return seq.astype(np.int32)
+
+
+def decode_segment_ids(seq: np.ndarray) -> np.ndarray:
+    seq = np.asarray(seq)
+    if not len(seq):
+        return np.empty(0, dtype=object)
+    return _id_table(int(seq.max()))[seq]
+
+
+def _interned_categorical(values: pd.Series) -> pd.Categorical:
+    categories = [sys.intern(c) if isinstance(c, str) else c for c in pd.unique(values.dropna())]
+    return pd.Categorical(values, categories=categories)
+
+
+def compact_frame(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """
+    Compact copy of a stage table: categorical label columns and integer segment IDs.
+    ID columns that were encoded are renamed with a '#' suffix so expand_frame can
+    tell them apart from ID columns kept as strings.
+    """
+    if df is None or df.empty:
+        return df
+    out = {}
+    for col in df.columns:
+        values = df[col]
+        if col in ID_COLUMNS:
+            seq = encode_segment_ids(values)
+            if seq is not None:
+                out[f'{col}#'] = seq
+                continue
+        elif col in ID_LIST_COLUMNS:
+            lists = [encode_segment_ids(v.split(', ')) if v else np.empty(0, np.int32) for v in values.astype(str)]
+            if all(seq is not None for seq in lists):
+                column = np.empty(len(lists), dtype=object)  # one array per row, never a 2-D block
+                column[:] = lists
+                out[f'{col}#'] = column
+                continue
+        elif col in CATEGORICAL_COLUMNS and pd.api.types.is_string_dtype(values.dtype):
+            out[col] = _interned_categorical(values)
+            continue
+        out[col] = values
+    return pd.DataFrame(out, index=df.index)
+
+
+def expand_frame(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """
+    Inverse of compact_frame; label columns stay categorical (they compare, count and
+    display like strings), segment IDs are strings again.
+    """
+    if df is None or df.empty:
+        return df
+    out = {}
+    for col in df.columns:
+        if col.endswith('#') and col[:-1] in ID_COLUMNS:
+            out[col[:-1]] = decode_segment_ids(df[col].to_numpy())
+        elif col.endswith('#'):
+            out[col[:-1]] = [', '.join(decode_segment_ids(seq)) for seq in df[col]]
+        else:
+            out[col] = df[col]
+    return pd.DataFrame(out, index=df.index)
+
+
+def frame_bytes(df: Optional[pd.DataFrame]) -> int:
+    if df is None:
+        return 0
+    # categories are interned and shared, so only codes count towards this table
+    total = 0
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            total += values.cat.codes.nbytes
+        elif col.endswith('#') and values.dtype == object:
+            total += sum(seq.nbytes for seq in values) + values.memory_usage(index=False)
+        else:
+            total += values.memory_usage(index=False, deep=True)
+    return int(total)
+
+
+class _Entry:
+    __slots__ = ('file_name', 'frames', 'nbytes', 'path', 'last_used', 'stamp')
+
+    def __init__(self, file_name: str, frames: Tuple, last_used: int, stamp: int):
+        self.file_name = file_name
+        self.frames = frames
+        self.nbytes = sum(frame_bytes(f) for f in frames)
+        self.path: Optional[Path] = None
+        self.last_used = last_used
+        self.stamp = stamp  # results version when these tables were stored
+
+
+class SessionResults:
+    """
+    Sequence of (file_name, stage1, stage2, stage3) like the lists process_batch and
+    ProjectStore.load_run return, stored compactly. Items are expanded on access;
+    spilled files are read back from disk without being made resident again, so
+    iterating over a large session does not thrash.
+    """
+
+    def __init__(self, results=(), memory_limit: int = MEMORY_LIMIT_BYTES, spill_dir: Optional[Path] = None):
+        self.memory_limit = memory_limit
+        self._spill_root = spill_dir or os.environ.get(SPILL_DIR_ENV) or None
+        self._spill_dir: Optional[Path] = None
+        self._entries: List[_Entry] = []
+        self._clock = 0
+        self._lock = threading.Lock()
+        self.version = 0  # bumped on every change, for caches derived from the results
+        for fname, s1, s2, s3 in results:
+            self.append(fname, s1, s2, s3)
+
+    def append(self, file_name: str, stage1, stage2, stage3):
+        frames = tuple(compact_frame(df) for df in (stage1, stage2, stage3))
+        with self._lock:
+            self._clock += 1
+            self.version += 1
+            self._entries.append(_Entry(file_name, frames, self._clock, self.version))
+            self._enforce_limit()
+
+    def replace(self, file_name: str, stage1, stage2, stage3):
+        """
+        Swap in new tables for a file (e.g. after manual recoding); a spilled copy is discarded.
+        """
+        i = self.file_names().index(file_name)
+        frames = tuple(compact_frame(df) for df in (stage1, stage2, stage3))
+        with self._lock:
+            self._clock += 1
+            self.version += 1
+            old = self._entries[i]
+            self._entries[i] = _Entry(file_name, frames, self._clock, self.version)
+            if old.path is not None and old.path.is_dir():
+                shutil.rmtree(old.path, ignore_errors=True)
+            elif old.path is not None:
+                old.path.unlink()
+            self._enforce_limit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def __getitem__(self, i: int) -> Tuple:
+        entry = self._entries[i]
+        return (entry.file_name,) + tuple(expand_frame(df) for df in self._frames(entry))
+
+    def __iter__(self) -> Iterator[Tuple]:
+        for i in range(len(self._entries)):
+            yield self[i]
+
+    def file_names(self) -> List[str]:
+        return [e.file_name for e in self._entries]
+
+    def resident_bytes(self) -> int:
+        return sum(e.nbytes for e in self._entries if e.path is None)
+
+    def spilled_files(self) -> List[str]:
+        return [e.file_name for e in self._entries if e.path is not None]
+
+    def stamps(self) -> Dict[str, int]:
+        """
+        Per file, the results version its tables were stored at; it changes only when the
+        file is replaced, so derived views can refresh just the files that changed.
+        """
+        return {e.file_name: e.stamp for e in self._entries}
+
+    def file_code_counts(self, file_name: str) -> Dict[str, int]:
+        """
+        Initial_Code counts of one file's Stage 1 table, from the categorical codes alone.
+        """
+        entry = self._entries[self.file_names().index(file_name)]
+        return self._code_counts(entry)
+
+    def code_frequencies(self) -> pd.Series:
+        """
+        Initial_Code counts over all Stage 1 tables.
+        """
+        counts: Dict[str, int] = {}
+        for entry in self._entries:
+            for code, n in self._code_counts(entry).items():
+                counts[code] = counts.get(code, 0) + n
+        return pd.Series(counts, dtype='int64').sort_values(ascending=False, kind='stable')
+
+    def _code_counts(self, entry: _Entry) -> Dict[str, int]:
+        s1 = self._frames(entry)[0]
+        if s1 is None or s1.empty:
+            return {}
+        return {code: int(n) for code, n in s1['Initial_Code'].value_counts(sort=False).items() if n}
+
+    def _frames(self, entry: _Entry) -> Tuple:
+        with self._lock:
+            self._clock += 1
+            entry.last_used = self._clock
+            path = entry.path
+            frames = entry.frames
+        return frames if path is None else self._read_spill(path)
+
+    def _enforce_limit(self):
+        """
+        Spill least recently used files until the resident ones fit the memory limit.
+        """
+        resident = sorted((e for e in self._entries if e.path is None), key=lambda e: e.last_used)
+        total = sum(e.nbytes for e in resident)
+        for entry in resident:
+            if total <= self.memory_limit:
+                break
+            try:
+                entry.path = self._write_spill(entry.frames)
+            except OSError as e:
+                logger.warning(f"Could not spill results of {entry.file_name} to disk: {e}")
+                return
+            entry.frames = ()
+            total -= entry.nbytes
+            logger.debug(f"Spilled results of {entry.file_name} ({entry.nbytes} bytes) to {entry.path}")
+
+    def _write_spill(self, frames: Tuple) -> Path:
+        if self._spill_dir is None:
+            if self._spill_root:
+                Path(self._spill_root).mkdir(parents=True, exist_ok=True)
+            self._spill_dir = Path(tempfile.mkdtemp(prefix='qualcoder_results_', dir=self._spill_root))
+            weakref.finalize(self, shutil.rmtree, str(self._spill_dir), True)
+        path = self._spill_dir / uuid.uuid4().hex
+        if SPILL_FORMAT == 'parquet':
+            path.mkdir()
+            for i, df in enumerate(frames):
+                if df is not None:
+                    df.to_parquet(path / f'stage{i + 1}.parquet')
+        else:
+            with open(path, 'wb') as f:
+                pickle.dump(frames, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path
+
+    @staticmethod
+    def _read_spill(path: Path) -> Tuple:
+        if path.is_dir():
+            return tuple(pd.read_parquet(path / f'stage{i}.parquet') if (path / f'stage{i}.parquet').exists()
+                         else None for i in (1, 2, 3))
+        with open(path, 'rb') as f:
+            return pickle.load(f)
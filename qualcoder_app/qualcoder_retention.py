@@ -0,0 +1,342 @@
+"""
+qualcoder_retention.py
+Retention for run outputs under outputs/: each run is a <project>_<timestamp>
+folder (make_output_folder) plus an optional sibling .zip. Quotas on total size,
+age and number of runs are enforced by evicting the least recently used runs;
+opening or downloading a run counts as use (touch_run). The transcripts copied
+for background jobs (outputs/jobs/<folder>) count toward the size and age quotas
+too, except while their job is queued or running. Runs are removed
+atomically: folder and zip are first renamed into a hidden trash name, so a
+reader never sees a half-deleted run, then deleted.
+
+Quotas come from QUALCODER_OUTPUT_MAX_GB, QUALCODER_OUTPUT_MAX_AGE_DAYS and
+QUALCODER_OUTPUT_MAX_RUNS; unset means unlimited. Anything else under the root
+(the project store and job databases, the stage cache) is reported as unmanaged.
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import logging
+import datetime
+
+from qualcoder_core import MANIFEST_NAME
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT_ROOT = Path('outputs')
+ACTIVE_GRACE_SECONDS = 24 * 3600  # a 'running' manifest younger than this protects its run
+TRASH_PREFIX = '.trash-'
+INPUTS_DIR = 'jobs'  # job input folders (qualcoder_jobs.DEFAULT_JOBS_DIR)
+JOBS_DB_NAME = 'qualcoder_jobs.db'  # qualcoder_jobs.DEFAULT_JOBS_PATH
+_RUN_NAME = re.compile(r'^(?!\.).+_\d{8}_\d{6}(_\d+)?$')
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name, '').strip()
+    return float(value) if value else None
+
+
+class RetentionPolicy:
+    """
+    Quotas for the runs under an output root; None means no limit.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, max_age_days: Optional[float] = None,
+                 max_runs: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.max_runs = max_runs
+
+    @classmethod
+    def from_env(cls) -> 'RetentionPolicy':
+        max_gb = _env_float('QUALCODER_OUTPUT_MAX_GB')
+        max_runs = _env_float('QUALCODER_OUTPUT_MAX_RUNS')
+        return cls(
+            max_bytes=int(max_gb * 1024 ** 3) if max_gb is not None else None,
+            max_age_days=_env_float('QUALCODER_OUTPUT_MAX_AGE_DAYS'),
+            max_runs=int(max_runs) if max_runs is not None else None,
+        )
+
+    def is_unlimited(self) -> bool:
+        return self.max_bytes is None and self.max_age_days is None and self.max_runs is None
+
+
+class RunUsage:
+    """
+    One run's folder and/or zip, with their combined size and times (epoch seconds);
+    kind 'inputs' is a job's input folder, which has no zip.
+    """
+
+    def __init__(self, name: str, created: float, last_access: float, kind: str = 'run'):
+        self.name = name
+        self.kind = kind
+        self.folder: Optional[Path] = None
+        self.archive: Optional[Path] = None
+        self.bytes = 0
+        self.files = 0
+        self.created = created
+        self.last_access = last_access
+        self.active = False
+        self.reasons: List[str] = []  # quotas that make plan() evict this run
+
+    def to_dict(self) -> Dict:
+        return {
+            'run': self.name,
+            'bytes': self.bytes,
+            'files': self.files,
+            'created': datetime.datetime.fromtimestamp(self.created).isoformat(timespec='seconds'),
+            'last_access': datetime.datetime.fromtimestamp(self.last_access).isoformat(timespec='seconds'),
+            'active': self.active,
+            'kind': self.kind,
+        }
+
+
+def touch_run(folder: Path):
+    """
+    Record that a run was used (opened or downloaded) now; eviction is least recently used first.
+    """
+    try:
+        os.utime(folder)
+    except OSError:
+        pass
+
+
+def _tree_size(folder: Path):
+    size, count = 0, 0
+    for root, _, names in os.walk(folder):
+        for n in names:
+            try:
+                size += os.stat(os.path.join(root, n)).st_size
+                count += 1
+            except OSError:
+                pass
+    return size, count
+
+
+def _is_active(folder: Path, now: float) -> bool:
+    manifest = folder / MANIFEST_NAME
+    try:
+        stat = manifest.stat()
+        with open(manifest, 'r', encoding='utf-8') as f:
+            status = json.load(f).get('status')
+    except (OSError, ValueError):
+        return False
+    return status == 'running' and now - stat.st_mtime < ACTIVE_GRACE_SECONDS
+
+
+class OutputRetention:
+    """
+    Usage report and quota enforcement for the run outputs in one root folder.
+    """
+
+    def __init__(self, root: Path = DEFAULT_OUTPUT_ROOT, policy: Optional[RetentionPolicy] = None):
+        self.root = Path(root)
+        self.policy = policy if policy is not None else RetentionPolicy.from_env()
+
+    def _input_jobs(self) -> Dict[Path, bool]:
+        """
+        Input folder -> whether the job using it is queued or running, from the job
+        queue in the root (if there is one).
+        """
+        if not (self.root / JOBS_DB_NAME).exists():
+            return {}
+        from qualcoder_jobs import JobQueue, ACTIVE_STATUSES  # qualcoder_jobs imports this module
+        queue = JobQueue(self.root / JOBS_DB_NAME, self.root / INPUTS_DIR)
+        try:
+            return {folder: status in ACTIVE_STATUSES for folder, status in queue.input_dirs().items()}
+        finally:
+            queue.conn.close()
+
+    def _inputs(self, now: float) -> List[RunUsage]:
+        """
+        Job input folders; those of queued or running jobs are active, and so is a
+        recent folder no job refers to yet (an API upload waiting to be submitted).
+        """
+        inputs_root = self.root / INPUTS_DIR
+        if not inputs_root.is_dir():
+            return []
+        jobs = self._input_jobs()
+        found = []
+        for entry in os.scandir(inputs_root):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            path = Path(entry.path)
+            stat = entry.stat()
+            item = RunUsage(f"{INPUTS_DIR}/{entry.name}", stat.st_mtime, stat.st_mtime, kind='inputs')
+            item.folder = path
+            item.bytes, item.files = _tree_size(path)
+            running = jobs.get(path.resolve())
+            item.active = running if running is not None else now - stat.st_mtime < ACTIVE_GRACE_SECONDS
+            found.append(item)
+        return found
+
+    def runs(self) -> List[RunUsage]:
+        """
+        All runs and job input folders under the root, least recently used first.
+        """
+        if not self.root.is_dir():
+            return []
+        now = time.time()
+        found: Dict[str, RunUsage] = {}
+        for entry in os.scandir(self.root):
+            path = Path(entry.path)
+            if entry.is_dir() and _RUN_NAME.match(entry.name):
+                name = entry.name
+            elif entry.is_file() and entry.name.endswith('.zip') and _RUN_NAME.match(entry.name[:-4]):
+                name = entry.name[:-4]
+            else:
+                continue
+            stat = entry.stat()
+            run = found.setdefault(name, RunUsage(name, stat.st_mtime, stat.st_mtime))
+            if entry.is_dir():
+                run.folder = path
+                size, count = _tree_size(path)
+                run.active = _is_active(path, now)
+            else:
+                run.archive = path
+                size, count = stat.st_size, 1
+            run.bytes += size
+            run.files += count
+            run.created = min(run.created, stat.st_mtime)
+            run.last_access = max(run.last_access, stat.st_mtime)
+        items = list(found.values()) + self._inputs(now)
+        return sorted(items, key=lambda r: (r.last_access, r.name))
+
+    def plan(self, protect: Iterable[Path] = (), now: Optional[float] = None) -> List[RunUsage]:
+        """
+        Runs that enforce() would remove, with the quota each one breaks in .reasons.
+        Active runs and runs in protect are never evicted; input folders count toward
+        the size and age quotas but not the run count.
+        """
+        now = time.time() if now is None else now
+        protected = {Path(p).resolve() for p in protect}
+
+        def pinned(run: RunUsage) -> bool:
+            return run.active or (run.folder is not None and run.folder.resolve() in protected)
+
+        evict: List[RunUsage] = []
+        kept: List[RunUsage] = []
+        for run in self.runs():
+            if pinned(run):
+                kept.append(run)
+            elif self.policy.max_age_days is not None and now - run.last_access > self.policy.max_age_days * 86400:
+                run.reasons.append('age')
+                evict.append(run)
+            else:
+                kept.append(run)
+        total = sum(r.bytes for r in kept)
+        count = sum(r.kind == 'run' for r in kept)
+        for run in kept:  # least recently used first
+            if pinned(run):
+                continue
+            over_runs = run.kind == 'run' and self.policy.max_runs is not None and count > self.policy.max_runs
+            over_bytes = self.policy.max_bytes is not None and total > self.policy.max_bytes
+            if not (over_runs or over_bytes):
+                continue
+            run.reasons.extend(r for r, over in (('runs', over_runs), ('bytes', over_bytes)) if over)
+            evict.append(run)
+            total -= run.bytes
+            count -= run.kind == 'run'
+        return evict
+
+    def remove(self, run: RunUsage):
+        """
+        Rename the run's folder and zip out of the way, then delete them.
+        """
+        token = uuid.uuid4().hex[:8]
+        trashed = []
+        for path in (run.archive, run.folder):
+            if path is None:
+                continue
+            target = path.with_name(f"{TRASH_PREFIX}{token}-{path.name}")
+            try:
+                os.replace(path, target)
+            except FileNotFoundError:
+                continue
+            trashed.append(target)
+        for target in trashed:
+            if target.is_dir():
+                shutil.rmtree(target, ignore_errors=True)
+            else:
+                target.unlink()
+
+    def enforce(self, protect: Iterable[Path] = (), dry_run: bool = False) -> List[RunUsage]:
+        """
+        Evict runs until every quota holds; returns the evicted (or, dry_run, to be evicted) runs.
+        """
+        if self.policy.is_unlimited():
+            return []
+        self._clear_trash()
+        evicted = self.plan(protect)
+        if not dry_run:
+            for run in evicted:
+                self.remove(run)
+                logger.info(f"Removed outputs of {run.name} ({run.bytes} bytes; over {', '.join(run.reasons)} quota)")
+        return evicted
+
+    def _clear_trash(self):
+        """
+        Finish removals that an earlier process was interrupted in.
+        """
+        for folder in (self.root, self.root / INPUTS_DIR):
+            if folder.is_dir():
+                self._clear_trash_in(folder)
+
+    @staticmethod
+    def _clear_trash_in(folder: Path):
+        for entry in os.scandir(folder):
+            if entry.name.startswith(TRASH_PREFIX):
+                if entry.is_dir():
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    try:
+                        os.unlink(entry.path)
+                    except OSError:
+                        pass
+
+    def unmanaged(self) -> List[Dict]:
+        """
+        Everything else under the root (databases, caches), which no quota removes.
+        """
+        if not self.root.is_dir():
+            return []
+        found = []
+        for entry in os.scandir(self.root):
+            name = entry.name
+            if name == INPUTS_DIR or name.startswith(TRASH_PREFIX) or _RUN_NAME.match(
+                    name[:-4] if entry.is_file() and name.endswith('.zip') else name):
+                continue
+            size = _tree_size(Path(entry.path))[0] if entry.is_dir() else entry.stat().st_size
+            found.append({'path': name, 'bytes': size})
+        return sorted(found, key=lambda item: -item['bytes'])
+
+    def usage(self) -> Dict:
+        """
+        Summary of disk use against the quotas, with one row per run or job input
+        folder (most recently used first) and the unmanaged files beside them.
+        """
+        runs = self.runs()
+        total = sum(r.bytes for r in runs)
+        unmanaged = self.unmanaged()
+        return {
+            'root': str(self.root),
+            'runs': sum(r.kind == 'run' for r in runs),
+            'inputs': sum(r.kind == 'inputs' for r in runs),
+            'bytes': total,
+            'unmanaged_bytes': sum(item['bytes'] for item in unmanaged),
+            'unmanaged': unmanaged,
+            'oldest_access': runs[0].to_dict()['last_access'] if runs else None,
+            'policy': {
+                'max_bytes': self.policy.max_bytes,
+                'max_age_days': self.policy.max_age_days,
+                'max_runs': self.policy.max_runs,
+            },
+            'pending_eviction': [r.name for r in self.plan()] if not self.policy.is_unlimited() else [],
+            'items': [r.to_dict() for r in reversed(runs)],
+        }
@@ -0,0 +1,112 @@
+"""
+qualcoder_scheduler.py
+Process-wide scheduling of foreground analyses for a Streamlit server shared by
+many users. Each transcript an analysis processes takes one of a fixed number of
+slots (QUALCODER_MAX_ANALYSES); waiting sessions are served round robin, the one
+served least recently first, so a long batch cannot starve a newcomer. Files with
+the same content key (input fingerprint + configuration) never run at the same
+time: the second waits for the first and then reads its results from the shared
+StageCache instead of extracting and coding the transcript again.
+"""
+
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+import os
+import time
+import logging
+import itertools
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ANALYSES = int(os.environ.get('QUALCODER_MAX_ANALYSES', str(max(1, (os.cpu_count() or 2) // 2))))
+
+
+class _Ticket:
+    __slots__ = ('session', 'key', 'seq', 'granted')
+
+    def __init__(self, session: str, key: Optional[str], seq: int):
+        self.session = session
+        self.key = key
+        self.seq = seq
+        self.granted = False
+
+
+class FairScheduler:
+    """
+    Counting semaphore with per-session round robin and per-key exclusion.
+    Work still runs on the caller's thread (Streamlit widgets can only be updated
+    from a session's own script thread); the scheduler only decides when.
+    """
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_ANALYSES):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self._cond = threading.Condition()
+        self._waiting: List[_Ticket] = []
+        self._running: List[_Ticket] = []
+        self._last_served: Dict[str, int] = {}
+        self._seq = itertools.count()
+
+    def _dispatch(self):
+        """
+        Grant free slots to waiting tickets; caller holds the condition.
+        """
+        while len(self._running) < self.max_concurrent:
+            busy_keys = {t.key for t in self._running if t.key is not None}
+            ready = [t for t in self._waiting if t.key is None or t.key not in busy_keys]
+            if not ready:
+                return
+            ticket = min(ready, key=lambda t: (self._last_served.get(t.session, -1), t.seq))
+            self._waiting.remove(ticket)
+            self._running.append(ticket)
+            ticket.granted = True
+            self._last_served[ticket.session] = next(self._seq)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, session: str, key: Optional[str] = None, on_wait: Optional[Callable[[int], None]] = None):
+        """
+        Hold one slot for the duration of the block. on_wait(position) is called once
+        if the caller has to queue (position counts the tickets ahead of it).
+        """
+        ticket = _Ticket(session, key, next(self._seq))
+        with self._cond:
+            self._waiting.append(ticket)
+            self._dispatch()
+            if not ticket.granted:
+                if on_wait is not None:
+                    on_wait(self._waiting.index(ticket))
+                started = time.perf_counter()
+                try:
+                    while not ticket.granted:
+                        self._cond.wait(timeout=1.0)
+                except BaseException:
+                    # e.g. the session's script was stopped while queued
+                    if ticket.granted:
+                        self._running.remove(ticket)
+                        self._dispatch()
+                    else:
+                        self._waiting.remove(ticket)
+                    raise
+                logger.debug(f"Session {session} waited {time.perf_counter() - started:.1f} s for a slot")
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running.remove(ticket)
+                self._dispatch()
+
+    def status(self, session: Optional[str] = None) -> Dict[str, int]:
+        """
+        Slots in use and tickets waiting, overall and (if given) for one session.
+        """
+        with self._cond:
+            status = {
+                'max_concurrent': self.max_concurrent,
+                'running': len(self._running),
+                'waiting': len(self._waiting),
+            }
+            if session is not None:
+                status['session_running'] = sum(t.session == session for t in self._running)
+                status['session_waiting'] = sum(t.session == session for t in self._waiting)
+            return status
@@ -0,0 +1,564 @@
+"""
+qualcoder_store.py
+Optional SQLite-backed project store. Persists runs, transcripts, coded
+segments (with character offsets), codes, Stage 2 groups and Stage 3 themes
+in indexed tables so past projects can be reopened and queried without
+re-running the pipeline.
+"""
+
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional, Any
+import re
+import json
+import sqlite3
+import logging
+import datetime
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+from qualcoder_core import locate_segments, STAGE1_COLUMNS, STAGE2_COLUMNS, STAGE3_COLUMNS, DOMAIN_NOTE_PREFIX
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = Path('outputs') / 'qualcoder_projects.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    output_folder TEXT,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS transcripts (
+    transcript_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    file_name TEXT NOT NULL,
+    char_count INTEGER,
+    segment_count INTEGER,
+    UNIQUE (run_id, file_name)
+);
+CREATE TABLE IF NOT EXISTS codes (
+    code_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    label TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    transcript_id INTEGER NOT NULL REFERENCES transcripts(transcript_id) ON DELETE CASCADE,
+    segment_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    code_id INTEGER NOT NULL REFERENCES codes(code_id),
+    notes TEXT,
+    start_offset INTEGER,
+    end_offset INTEGER
+);
+CREATE TABLE IF NOT EXISTS code_groups (
+    transcript_id INTEGER NOT NULL REFERENCES transcripts(transcript_id) ON DELETE CASCADE,
+    group_id TEXT NOT NULL,
+    group_title TEXT NOT NULL,
+    codes_included TEXT,
+    segment_ids TEXT,
+    number_of_codes INTEGER
+);
+CREATE TABLE IF NOT EXISTS themes (
+    transcript_id INTEGER NOT NULL REFERENCES transcripts(transcript_id) ON DELETE CASCADE,
+    research_question TEXT,
+    main_theme TEXT,
+    sub_theme TEXT,
+    supporting_code TEXT,
+    supporting_quote TEXT,
+    segment_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_run ON transcripts(run_id);
+CREATE INDEX IF NOT EXISTS idx_segments_transcript ON segments(transcript_id, seq);
+CREATE INDEX IF NOT EXISTS idx_segments_code ON segments(code_id, transcript_id);
+CREATE INDEX IF NOT EXISTS idx_groups_transcript ON code_groups(transcript_id);
+CREATE INDEX IF NOT EXISTS idx_themes_transcript ON themes(transcript_id, segment_id);
+CREATE INDEX IF NOT EXISTS idx_themes_rq ON themes(research_question);
+"""
+
+# Full-text index over segment text, kept in sync with the segments table by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS segments_fts_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_fts_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_fts_au AFTER UPDATE OF text ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+def _fts_query(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 expression: every word is quoted and all words
+    must match; a trailing '*' keeps prefix matching (e.g. "challeng*").
+    """
+    terms = re.findall(r'\w+\*?', query)
+    return ' '.join(f'"{t.rstrip("*")}"*' if t.endswith('*') else f'"{t}"' for t in terms)
+
+
+# search_segments sort keys -> ORDER BY (ties broken in document order)
+SEARCH_SORTS = {
+    'document': 's.id',
+    'file': 't.file_name, s.id',
+    'code': 'c.label, s.id',
+    'length': 'length(s.text), s.id',
+}
+
+
+def _segment_seq(segment_id: str, fallback: int) -> int:
+    """
+    Numeric position of a Segment_ID like 'S012' (falls back to row order).
+    """
+    digits = ''.join(ch for ch in str(segment_id) if ch.isdigit())
+    return int(digits) if digits else fallback
+
+
+class ProjectStore:
+    """
+    Thin wrapper around a SQLite database holding pipeline results.
+    One connection is shared by all callers; writes are serialized with a lock
+    so the store can be cached across Streamlit reruns.
+    """
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        if str(path) != ':memory:':
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.executescript(SCHEMA)
+        self._code_ids: Dict[str, int] = {}
+        self.fts_enabled = self._init_fts()
+
+    def _init_fts(self) -> bool:
+        """
+        Create the FTS5 index if this SQLite build supports it; index any segments
+        written before the index existed.
+        """
+        existed = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'segments_fts'").fetchone() is not None
+        try:
+            with self.conn:
+                self.conn.executescript(FTS_SCHEMA)
+                if not existed:
+                    self.conn.execute("INSERT INTO segments_fts (segments_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite FTS5 unavailable ({e}); text search falls back to LIKE scans")
+            return False
+        return True
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- writing ----------
+
+    def start_run(self, project_name: str, output_folder: Optional[Path] = None,
+                  config: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Register a new analysis run and return its run_id.
+        config: JSON-serializable run settings (codebook, research questions, keywords).
+        """
+        created = datetime.datetime.now().isoformat(timespec='seconds')
+        with self._lock, self.conn:
+            cur = self.conn.execute(
+                'INSERT INTO runs (project_name, created_at, output_folder, config) VALUES (?, ?, ?, ?)',
+                (project_name, created, str(output_folder) if output_folder else None,
+                 json.dumps(config or {}, ensure_ascii=False))
+            )
+        logger.info(f"Project store: started run {cur.lastrowid} for {project_name}")
+        return cur.lastrowid
+
+    @contextmanager
+    def _writing(self):
+        """
+        The write lock plus one transaction. Code ids cached inside a transaction that
+        rolls back point at rows that no longer exist, so the cache is dropped then.
+        """
+        with self._lock:
+            try:
+                with self.conn:
+                    yield
+            except BaseException:
+                self._code_ids.clear()
+                raise
+
+    def _code_id_map(self, labels: List[str]) -> Dict[str, int]:
+        missing = [lb for lb in set(labels) if lb not in self._code_ids]
+        if missing:
+            self.conn.executemany('INSERT OR IGNORE INTO codes (label) VALUES (?)', [(lb,) for lb in missing])
+            marks = ','.join('?' * len(missing))
+            for code_id, label in self.conn.execute(
+                    f'SELECT code_id, label FROM codes WHERE label IN ({marks})', missing):
+                self._code_ids[label] = code_id
+        return self._code_ids
+
+    def _insert_transcript(self, run_id: int, file_name: str, char_count: Optional[int], segment_count: int) -> int:
+        self.conn.execute('DELETE FROM transcripts WHERE run_id = ? AND file_name = ?', (run_id, file_name))
+        cur = self.conn.execute(
+            'INSERT INTO transcripts (run_id, file_name, char_count, segment_count) VALUES (?, ?, ?, ?)',
+            (run_id, file_name, char_count, segment_count)
+        )
+        return cur.lastrowid
+
+    def _insert_segments(self, tid: int, rows: List[Tuple], offsets: List[Tuple[Optional[int], Optional[int]]]):
+        """
+        rows: (Segment_ID, Interview_Text, Initial_Code, Notes) tuples, in segment order.
+        """
+        if not rows:
+            return
+        code_ids = self._code_id_map([str(r[2]) for r in rows])
+        self.conn.executemany(
+            'INSERT INTO segments (transcript_id, segment_id, seq, text, code_id, notes, start_offset, end_offset) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [
+                (tid, sid, _segment_seq(sid, i), str(txt), code_ids[str(code)], notes or '', start, end)
+                for i, ((sid, txt, code, notes), (start, end)) in enumerate(zip(rows, offsets), 1)
+            ]
+        )
+
+    def _insert_groups_and_themes(self, tid: int, stage2: Optional[pd.DataFrame], stage3: Optional[pd.DataFrame]):
+        if stage2 is not None and not stage2.empty:
+            self.conn.executemany(
+                'INSERT INTO code_groups (transcript_id, group_id, group_title, codes_included, segment_ids, number_of_codes) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(tid, *row) for row in stage2[STAGE2_COLUMNS].itertuples(index=False, name=None)]
+            )
+        if stage3 is not None and not stage3.empty:
+            self.conn.executemany(
+                'INSERT INTO themes (transcript_id, research_question, main_theme, sub_theme, supporting_code, '
+                'supporting_quote, segment_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(tid, *row) for row in stage3[STAGE3_COLUMNS].itertuples(index=False, name=None)]
+            )
+
+    def record_transcript(
+        self,
+        run_id: int,
+        file_name: str,
+        stage1: pd.DataFrame,
+        stage2: pd.DataFrame,
+        stage3: pd.DataFrame,
+        text: Optional[str] = None
+    ) -> int:
+        """
+        Persist the Stage 1-3 outputs for one transcript in a single transaction.
+        If the source text is given, segment character offsets are stored as well.
+        Returns the transcript_id.
+        """
+        stage1 = stage1 if stage1 is not None else pd.DataFrame(columns=STAGE1_COLUMNS)
+        rows = list(stage1[STAGE1_COLUMNS].itertuples(index=False, name=None)) if not stage1.empty else []
+        texts = [str(r[1]) for r in rows]
+        offsets = locate_segments(text, texts) if text else [(None, None)] * len(rows)
+
+        with self._writing():
+            tid = self._insert_transcript(run_id, file_name, len(text) if text else None, len(rows))
+            self._insert_segments(tid, rows, offsets)
+            self._insert_groups_and_themes(tid, stage2, stage3)
+        logger.info(f"Project store: recorded {len(rows)} segments for {file_name} (run {run_id})")
+        return tid
+
+    def recode_transcript(
+        self,
+        run_id: int,
+        file_name: str,
+        changes: Dict[str, str],
+        stage2: pd.DataFrame,
+        stage3: pd.DataFrame
+    ):
+        """
+        Store manual recoding of a transcript: {Segment_ID: new Initial_Code} plus its updated
+        Stage 2/3 tables. Segment text, notes and offsets are left as they are.
+        """
+        with self._writing():
+            row = self.conn.execute('SELECT transcript_id FROM transcripts WHERE run_id = ? AND file_name = ?',
+                                    (run_id, file_name)).fetchone()
+            if row is None:
+                raise KeyError(f"{file_name} is not part of run {run_id}")
+            tid = row[0]
+            code_ids = self._code_id_map([str(c) for c in changes.values()])
+            self.conn.executemany(
+                'UPDATE segments SET code_id = ? WHERE transcript_id = ? AND segment_id = ?',
+                [(code_ids[str(code)], tid, sid) for sid, code in changes.items()]
+            )
+            self.conn.execute('DELETE FROM code_groups WHERE transcript_id = ?', (tid,))
+            self.conn.execute('DELETE FROM themes WHERE transcript_id = ?', (tid,))
+            self._insert_groups_and_themes(tid, stage2, stage3)
+        logger.info(f"Project store: recoded {len(changes)} segments of {file_name} (run {run_id})")
+
+    # Chunked recording, used by the streaming pipeline where Stage 1 never exists as one DataFrame
+
+    def begin_transcript(self, run_id: int, file_name: str) -> int:
+        with self._lock, self.conn:
+            return self._insert_transcript(run_id, file_name, None, 0)
+
+    def add_segments(self, transcript_id: int, rows: List[Dict[str, Any]]):
+        """
+        Append a chunk of Stage 1 row dicts (offsets are not tracked in this mode).
+        """
+        tuples = [tuple(r[c] for c in STAGE1_COLUMNS) for r in rows]
+        with self._writing():
+            self._insert_segments(transcript_id, tuples, [(None, None)] * len(tuples))
+
+    def finish_transcript(self, transcript_id: int, stage2: pd.DataFrame, stage3: pd.DataFrame, segment_count: int):
+        with self._lock, self.conn:
+            self.conn.execute('UPDATE transcripts SET segment_count = ? WHERE transcript_id = ?',
+                              (segment_count, transcript_id))
+            self._insert_groups_and_themes(transcript_id, stage2, stage3)
+
+    def delete_run(self, run_id: int):
+        with self._lock, self.conn:
+            self.conn.execute('DELETE FROM runs WHERE run_id = ?', (run_id,))
+
+    # ---------- reading ----------
+
+    def _query(self, sql: str, params: Tuple = ()) -> pd.DataFrame:
+        with self._lock:
+            return pd.read_sql_query(sql, self.conn, params=params)
+
+    def list_runs(self) -> pd.DataFrame:
+        """
+        Returns DataFrame: run_id, project_name, created_at, output_folder, files, segments
+        """
+        return self._query(
+            'SELECT r.run_id, r.project_name, r.created_at, r.output_folder, '
+            'COUNT(t.transcript_id) AS files, COALESCE(SUM(t.segment_count), 0) AS segments '
+            'FROM runs r LEFT JOIN transcripts t ON t.run_id = r.run_id '
+            'GROUP BY r.run_id ORDER BY r.run_id DESC'
+        )
+
+    def get_run(self, run_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT run_id, project_name, created_at, output_folder, config FROM runs WHERE run_id = ?',
+                (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'run_id': row[0], 'project_name': row[1], 'created_at': row[2],
+            'output_folder': row[3], 'config': json.loads(row[4] or '{}')
+        }
+
+    def load_run(self, run_id: int) -> List[Tuple[str, pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+        """
+        Rebuild the (file_name, stage1, stage2, stage3) result tuples of a stored run,
+        in the same shape process_single_transcript returns them.
+        """
+        transcripts = self._query(
+            'SELECT transcript_id, file_name FROM transcripts WHERE run_id = ? ORDER BY transcript_id', (run_id,))
+        seg = self._query(
+            'SELECT s.transcript_id, s.segment_id AS Segment_ID, s.text AS Interview_Text, '
+            'c.label AS Initial_Code, s.notes AS Notes '
+            'FROM segments s JOIN codes c ON c.code_id = s.code_id JOIN transcripts t ON t.transcript_id = s.transcript_id '
+            'WHERE t.run_id = ? ORDER BY s.transcript_id, s.seq', (run_id,))
+        grp = self._query(
+            'SELECT g.transcript_id, g.group_id AS Group_ID, g.group_title AS Group_Title, '
+            'g.codes_included AS Codes_Included, g.segment_ids AS Segment_IDs, g.number_of_codes AS Number_of_Codes '
+            'FROM code_groups g JOIN transcripts t ON t.transcript_id = g.transcript_id '
+            'WHERE t.run_id = ? ORDER BY g.rowid', (run_id,))
+        thm = self._query(
+            'SELECT h.transcript_id, h.research_question AS Research_Question, h.main_theme AS Main_Theme, '
+            'h.sub_theme AS Sub_Theme, h.supporting_code AS Supporting_Code, '
+            'h.supporting_quote AS Supporting_Quote, h.segment_id AS Segment_ID '
+            'FROM themes h JOIN transcripts t ON t.transcript_id = h.transcript_id '
+            'WHERE t.run_id = ? ORDER BY h.rowid', (run_id,))
+
+        def _part(df: pd.DataFrame, tid: int, columns: List[str]) -> pd.DataFrame:
+            sub = df[df['transcript_id'] == tid]
+            if sub.empty:
+                return pd.DataFrame()
+            return sub[columns].reset_index(drop=True)
+
+        results = []
+        for tid, fname in transcripts.itertuples(index=False, name=None):
+            results.append((
+                fname,
+                _part(seg, tid, STAGE1_COLUMNS),
+                _part(grp, tid, STAGE2_COLUMNS),
+                _part(thm, tid, STAGE3_COLUMNS),
+            ))
+        return results
+
+    def segments_with_code(self, code: str, run_id: Optional[int] = None) -> pd.DataFrame:
+        """
+        All segments assigned the given code label (optionally limited to one run).
+        Returns DataFrame: run_id, file_name, Segment_ID, Interview_Text, Notes, start_offset, end_offset
+        """
+        sql = ('SELECT t.run_id, t.file_name, s.segment_id AS Segment_ID, s.text AS Interview_Text, '
+               's.notes AS Notes, s.start_offset, s.end_offset '
+               'FROM segments s JOIN codes c ON c.code_id = s.code_id '
+               'JOIN transcripts t ON t.transcript_id = s.transcript_id WHERE c.label = ?')
+        params: Tuple = (code,)
+        if run_id is not None:
+            sql += ' AND t.run_id = ?'
+            params += (run_id,)
+        return self._query(sql + ' ORDER BY t.transcript_id, s.seq', params)
+
+    def coding_table(self, run_id: int) -> pd.DataFrame:
+        """
+        The Stage 1 coding of a run as one table, for comparing runs (qualcoder_agreement.py).
+        Returns DataFrame: File, Segment_ID, Interview_Text, Initial_Code, Start
+        """
+        return self._query(
+            'SELECT t.file_name AS File, s.segment_id AS Segment_ID, s.text AS Interview_Text, '
+            'c.label AS Initial_Code, s.start_offset AS Start '
+            'FROM segments s JOIN codes c ON c.code_id = s.code_id JOIN transcripts t ON t.transcript_id = s.transcript_id '
+            'WHERE t.run_id = ? ORDER BY s.transcript_id, s.seq', (run_id,))
+
+    def code_counts(self, run_id: Optional[int] = None) -> pd.DataFrame:
+        """
+        Returns DataFrame: Code, Frequency (descending).
+        """
+        sql = ('SELECT c.label AS Code, COUNT(*) AS Frequency FROM segments s '
+               'JOIN codes c ON c.code_id = s.code_id JOIN transcripts t ON t.transcript_id = s.transcript_id')
+        params: Tuple = ()
+        if run_id is not None:
+            sql += ' WHERE t.run_id = ?'
+            params = (run_id,)
+        return self._query(sql + ' GROUP BY c.code_id ORDER BY Frequency DESC, Code', params)
+
+    def code_counts_per_file(self, run_id: int) -> pd.DataFrame:
+        """
+        Returns DataFrame: file_name, Code, Frequency.
+        """
+        return self._query(
+            'SELECT t.file_name, c.label AS Code, COUNT(*) AS Frequency FROM segments s '
+            'JOIN codes c ON c.code_id = s.code_id JOIN transcripts t ON t.transcript_id = s.transcript_id '
+            'WHERE t.run_id = ? GROUP BY t.transcript_id, c.code_id ORDER BY t.file_name, Frequency DESC',
+            (run_id,)
+        )
+
+    def list_files(self, run_id: int) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self.conn.execute(
+                'SELECT file_name FROM transcripts WHERE run_id = ? ORDER BY transcript_id', (run_id,))]
+
+    def domain_keywords(self, run_id: int) -> List[str]:
+        """
+        Domain keywords that coded at least one segment of the run.
+        """
+        with self._lock:
+            return [r[0][len(DOMAIN_NOTE_PREFIX):] for r in self.conn.execute(
+                'SELECT DISTINCT s.notes FROM segments s JOIN transcripts t ON t.transcript_id = s.transcript_id '
+                'WHERE t.run_id = ? AND s.notes LIKE ? ORDER BY s.notes', (run_id, f"{DOMAIN_NOTE_PREFIX}%"))]
+
+    def research_questions(self, run_id: int) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self.conn.execute(
+                'SELECT DISTINCT h.research_question FROM themes h JOIN transcripts t ON t.transcript_id = h.transcript_id '
+                'WHERE t.run_id = ? ORDER BY h.research_question', (run_id,))]
+
+    def _search_filters(
+        self,
+        query: str,
+        code: Optional[str],
+        file_name: Optional[str],
+        research_question: Optional[str],
+        run_id: Optional[int],
+        keyword: Optional[str] = None
+    ) -> Tuple[str, str, List[Any]]:
+        """
+        Build the FROM/WHERE part shared by search_segments and count_search_hits.
+        """
+        params: List[Any] = []
+        where = []
+        if query.strip() and self.fts_enabled:
+            # CROSS JOIN pins the FTS index as the outer loop; otherwise the planner may
+            # drive from a filter index and probe the full-text index once per row
+            source = 'segments_fts f CROSS JOIN segments s ON s.id = f.rowid'
+            where.append('segments_fts MATCH ?')
+            params.append(_fts_query(query) or '""')
+        else:
+            source = 'segments s'
+            if query.strip():
+                where.append('s.text LIKE ?')
+                params.append(f"%{query.strip()}%")
+        source += (' CROSS JOIN codes c ON c.code_id = s.code_id'
+                   ' CROSS JOIN transcripts t ON t.transcript_id = s.transcript_id')
+        if code:
+            where.append('c.label = ?')
+            params.append(code)
+        if file_name:
+            where.append('t.file_name = ?')
+            params.append(file_name)
+        if run_id is not None:
+            where.append('t.run_id = ?')
+            params.append(run_id)
+        if keyword:
+            where.append('s.notes = ?')
+            params.append(f"{DOMAIN_NOTE_PREFIX}{keyword}")
+        if research_question:
+            where.append('EXISTS (SELECT 1 FROM themes h WHERE h.transcript_id = s.transcript_id '
+                         'AND h.segment_id = s.segment_id AND h.research_question = ?)')
+            params.append(research_question)
+        return source, (' WHERE ' + ' AND '.join(where)) if where else '', params
+
+    def search_segments(
+        self,
+        query: str,
+        code: Optional[str] = None,
+        file_name: Optional[str] = None,
+        research_question: Optional[str] = None,
+        run_id: Optional[int] = None,
+        limit: int = 50,
+        offset: int = 0,
+        ranked: bool = True,
+        keyword: Optional[str] = None,
+        sort: Optional[str] = None,
+        descending: bool = False
+    ) -> pd.DataFrame:
+        """
+        Full-text search over Interview_Text with optional code/file/RQ/domain keyword filters.
+        Returns one page of hits (best matches first when ranked, else in document order,
+        or by a SEARCH_SORTS key): run_id, file_name, Segment_ID, Initial_Code, Notes,
+        Interview_Text, Snippet
+        """
+        source, where, params = self._search_filters(query, code, file_name, research_question, run_id, keyword)
+        use_fts = source.startswith('segments_fts')
+        snippet = "snippet(segments_fts, 0, '**', '**', ' … ', 16)" if use_fts else 's.text'
+        if sort is not None:
+            order = ', '.join(f"{col} DESC" if descending else col for col in SEARCH_SORTS[sort].split(', '))
+        else:
+            order = ('f.rank' if ranked else 'f.rowid') if use_fts else 's.id'
+        sql = (f'SELECT t.run_id, t.file_name, s.segment_id AS Segment_ID, c.label AS Initial_Code, '
+               f's.notes AS Notes, s.text AS Interview_Text, {snippet} AS Snippet FROM {source}{where} '
+               f'ORDER BY {order} LIMIT ? OFFSET ?')
+        return self._query(sql, tuple(params) + (int(limit), int(offset)))
+
+    def count_search_hits(
+        self,
+        query: str,
+        code: Optional[str] = None,
+        file_name: Optional[str] = None,
+        research_question: Optional[str] = None,
+        run_id: Optional[int] = None,
+        keyword: Optional[str] = None
+    ) -> int:
+        source, where, params = self._search_filters(query, code, file_name, research_question, run_id, keyword)
+        with self._lock:
+            return self.conn.execute(f'SELECT COUNT(*) FROM {source}{where}', params).fetchone()[0]
+
+    def themes_for_question(self, research_question: str, run_id: Optional[int] = None) -> pd.DataFrame:
+        """
+        Stage 3 rows mapped to a research question.
+        Returns DataFrame: file_name, Main_Theme, Supporting_Code, Supporting_Quote, Segment_ID
+        """
+        sql = ('SELECT t.file_name, h.main_theme AS Main_Theme, h.supporting_code AS Supporting_Code, '
+               'h.supporting_quote AS Supporting_Quote, h.segment_id AS Segment_ID '
+               'FROM themes h JOIN transcripts t ON t.transcript_id = h.transcript_id WHERE h.research_question = ?')
+        params: Tuple = (research_question,)
+        if run_id is not None:
+            sql += ' AND t.run_id = ?'
+            params += (run_id,)
+        return self._query(sql + ' ORDER BY t.transcript_id, h.rowid', params)
@@ -0,0 +1,252 @@
+"""
+qualcoder_ui_cache.py
+Streamlit caching layer for app.py. Streamlit re-runs the whole script on every
+widget interaction; these wrappers keep extracted texts, segmentations, TF-IDF
+suggestions, the keyword-in-context index, compiled codebook indexes and per-file
+Stage 1 results in memory, keyed by upload content hashes and configuration, so a
+rerun only redoes the work whose inputs changed. Result downloads are deferred: their payloads are
+produced when a button is clicked, not on every rerun.
+
+Every cache has a TTL and an entry limit (QUALCODER_UI_CACHE_TTL seconds,
+QUALCODER_UI_CACHE_ENTRIES per cache); uploads larger than QUALCODER_UI_CACHE_MAX_MB
+are processed without being cached.
+"""
+
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import os
+import uuid
+import shutil
+import hashlib
+import tempfile
+import pandas as pd
+import streamlit as st
+
+from qualcoder_core import (
+    CodebookIndex, RunManifest, extract_text_from_file, segment_transcript, code_segments,
+    suggest_keywords_from_texts, fingerprint, MANIFEST_NAME
+)
+from qualcoder_concordance import ConcordanceIndex
+from qualcoder_retention import OutputRetention, DEFAULT_OUTPUT_ROOT, touch_run
+
+TTL_SECONDS = int(os.environ.get('QUALCODER_UI_CACHE_TTL', '3600'))
+MAX_ENTRIES = int(os.environ.get('QUALCODER_UI_CACHE_ENTRIES', '512'))  # per-file caches
+MAX_ITEM_BYTES = int(float(os.environ.get('QUALCODER_UI_CACHE_MAX_MB', '50')) * 1024 * 1024)
+BATCH_ENTRIES = 16  # whole-batch results (suggestions) and codebook indexes
+
+
+def upload_digest(uploaded_file) -> str:
+    """
+    sha256 of an upload's content, hashed once per upload (memoized in the session by file_id).
+    """
+    digests: Dict[str, str] = st.session_state.setdefault('_upload_digests', {})
+    file_id = getattr(uploaded_file, 'file_id', None)
+    if file_id is not None and file_id in digests:
+        return digests[file_id]
+    digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    if file_id is not None:
+        digests[file_id] = digest
+    return digest
+
+
+def _cacheable(uploaded_file) -> bool:
+    return uploaded_file.size <= MAX_ITEM_BYTES
+
+
+def _extract(suffix: str, data: bytes) -> str:
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / f"upload{suffix}"
+        path.write_bytes(data)
+        return extract_text_from_file(path)
+
+
+@st.cache_data(ttl=TTL_SECONDS, max_entries=MAX_ENTRIES, show_spinner=False)
+def _extract_cached(digest: str, suffix: str, _data: bytes) -> str:
+    return _extract(suffix, _data)
+
+
+def extracted_text(uploaded_file) -> str:
+    """
+    Text of an uploaded transcript (extract_text_from_file), cached by content hash.
+    """
+    suffix = Path(uploaded_file.name).suffix.lower()
+    if not _cacheable(uploaded_file):
+        return _extract(suffix, uploaded_file.getvalue())
+    return _extract_cached(upload_digest(uploaded_file), suffix, uploaded_file.getvalue())
+
+
+@st.cache_data(ttl=TTL_SECONDS, max_entries=MAX_ENTRIES, show_spinner=False)
+def _segments_cached(digest: str, suffix: str, _text: str) -> List[str]:
+    return segment_transcript(_text)
+
+
+def transcript_segments(uploaded_file) -> List[str]:
+    """
+    Meaning units of an uploaded transcript (segment_transcript), cached by content hash.
+    """
+    text = extracted_text(uploaded_file)
+    if not _cacheable(uploaded_file):
+        return segment_transcript(text)
+    return _segments_cached(upload_digest(uploaded_file), Path(uploaded_file.name).suffix.lower(), text)
+
+
+@st.cache_data(ttl=TTL_SECONDS, max_entries=BATCH_ENTRIES, show_spinner=False)
+def _suggestions_cached(digests: Tuple[str, ...], top_n: int, _texts: List[str]) -> List[str]:
+    return suggest_keywords_from_texts(_texts, top_n=top_n)
+
+
+def keyword_suggestions(uploaded_files, top_n: int = 20) -> List[str]:
+    """
+    TF-IDF keyword suggestions over all uploads, cached by the set of content hashes and top_n.
+    """
+    texts = [extracted_text(uf) for uf in uploaded_files]
+    return _suggestions_cached(tuple(upload_digest(uf) for uf in uploaded_files), top_n, texts)
+
+
+@st.cache_resource(ttl=TTL_SECONDS, max_entries=BATCH_ENTRIES, show_spinner=False)
+def _concordance_cached(digests: Tuple[str, ...], _names: Tuple[str, ...], _texts: List[str]) -> ConcordanceIndex:
+    return ConcordanceIndex(list(_names), _texts)
+
+
+def concordance_index(uploaded_files) -> ConcordanceIndex:
+    """
+    KWIC index over all uploads, built once per set of content hashes and shared by sessions.
+    """
+    texts = [extracted_text(uf) for uf in uploaded_files]
+    return _concordance_cached(tuple(upload_digest(uf) for uf in uploaded_files),
+                               tuple(uf.name for uf in uploaded_files), texts)
+
+
+def coding_config_key(codebook: Dict[str, List[str]], domain_keywords: Optional[List[str]]) -> str:
+    return fingerprint(codebook, domain_keywords or [])
+
+
+@st.cache_resource(ttl=TTL_SECONDS, max_entries=BATCH_ENTRIES, show_spinner=False)
+def _codebook_index_cached(config_key: str, _codebook: Dict[str, List[str]],
+                           _domain_keywords: Tuple[str, ...]) -> CodebookIndex:
+    return CodebookIndex(_codebook, list(_domain_keywords))
+
+
+def codebook_index(codebook: Dict[str, List[str]], domain_keywords: Optional[List[str]]) -> CodebookIndex:
+    """
+    Compiled CodebookIndex shared by every session using the same codebook and keywords.
+    """
+    return _codebook_index_cached(coding_config_key(codebook, domain_keywords), codebook,
+                                  tuple(domain_keywords or []))
+
+
+@st.cache_data(ttl=TTL_SECONDS, max_entries=MAX_ENTRIES, show_spinner=False)
+def _stage1_cached(digest: str, config_key: str, _segments: List[str], _index: CodebookIndex) -> pd.DataFrame:
+    return code_segments(_segments, {}, index=_index)
+
+
+def stage1_preview(uploaded_file, codebook: Dict[str, List[str]],
+                   domain_keywords: Optional[List[str]]) -> pd.DataFrame:
+    """
+    Stage 1 coding of an upload under the given codebook and keywords, cached per
+    (content hash, configuration): changing a keyword only recodes, never re-extracts.
+    """
+    segments = transcript_segments(uploaded_file)
+    index = codebook_index(codebook, domain_keywords)
+    if not _cacheable(uploaded_file):
+        return code_segments(segments, codebook, domain_keywords, index)
+    return _stage1_cached(upload_digest(uploaded_file), coding_config_key(codebook, domain_keywords),
+                          segments, index)
+
+
+DOWNLOAD_SUFFIXES = ('.xlsx', '.txt')
+
+
+def _mtime_ns(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+@st.cache_data(ttl=TTL_SECONDS, max_entries=BATCH_ENTRIES, show_spinner=False)
+def _output_index_cached(out_folder: str, file_names: Tuple[str, ...], signature: int) -> Dict[str, List[str]]:
+    folder = Path(out_folder)
+    manifest = RunManifest.read(folder)
+    index = {}
+    for fname in file_names:
+        if manifest is not None and fname in manifest.files:
+            files = manifest.output_files(fname)
+        else:
+            # Runs without a manifest (or files missing from it): one scan, cached with the folder
+            files = sorted(p for p in folder.glob(f"{Path(fname).stem}_*/*") if p.is_file())
+        index[fname] = [str(p) for p in files if p.suffix.lower() in DOWNLOAD_SUFFIXES]
+    return index
+
+
+def output_index(out_folder: Path, file_names: List[str]) -> Dict[str, List[Path]]:
+    """
+    Downloadable output files per transcript, from the run manifest. Re-read only when
+    the manifest (or, for runs without one, the output folder) changes.
+    """
+    manifest_path = Path(out_folder) / MANIFEST_NAME
+    signature = _mtime_ns(manifest_path) or _mtime_ns(Path(out_folder))
+    index = _output_index_cached(str(out_folder), tuple(file_names), signature)
+    return {fname: [Path(p) for p in paths] for fname, paths in index.items()}
+
+
+@st.cache_data(ttl=TTL_SECONDS, max_entries=MAX_ENTRIES, show_spinner=False)
+def _file_bytes_cached(path: str, mtime_ns: int) -> bytes:
+    return Path(path).read_bytes()
+
+
+def file_download(path: Path) -> Callable[[], bytes]:
+    """
+    Deferred st.download_button payload: the file is read when the button is clicked,
+    cached by path and modification time. path is <run folder>/<file folder>/<name>; the
+    click counts as use of the run for retention.
+    """
+    def load() -> bytes:
+        touch_run(path.parent.parent)
+        stat = path.stat()
+        if stat.st_size > MAX_ITEM_BYTES:
+            return path.read_bytes()
+        return _file_bytes_cached(str(path), stat.st_mtime_ns)
+    return load
+
+
+def archive_download(out_folder: Path) -> Callable[[], bytes]:
+    """
+    Deferred payload for a ZIP of the whole output folder, rebuilt on click only if a
+    file in the folder is newer than the archive next to it.
+    """
+    def load() -> bytes:
+        touch_run(out_folder)
+        zip_path = out_folder.with_suffix('.zip')
+        newest = max((_mtime_ns(p) for p in out_folder.rglob('*')), default=0)
+        if _mtime_ns(zip_path) < newest:
+            tmp_base = out_folder.with_name(f".{out_folder.name}.{uuid.uuid4().hex[:8]}")
+            tmp_zip = Path(shutil.make_archive(str(tmp_base), 'zip', root_dir=out_folder))
+            os.replace(tmp_zip, zip_path)
+        return zip_path.read_bytes()
+    return load
+
+
+@st.cache_data(ttl=30, max_entries=4, show_spinner=False)
+def _output_usage_cached(root: str) -> Dict:
+    return OutputRetention(Path(root)).usage()
+
+
+def output_usage(root: Path = DEFAULT_OUTPUT_ROOT) -> Dict:
+    """
+    OutputRetention usage report; walking every run folder is slow, so it is reused for 30 s.
+    """
+    return _output_usage_cached(str(root))
+
+
+def refresh_output_usage():
+    """
+    Drop the cached usage report, e.g. after runs were removed.
+    """
+    _output_usage_cached.clear()
+
+
+def clear_ui_caches():
+    for fn in (_extract_cached, _segments_cached, _suggestions_cached, _concordance_cached, _codebook_index_cached,
+               _stage1_cached, _output_index_cached, _file_bytes_cached, _output_usage_cached):
+        fn.clear()
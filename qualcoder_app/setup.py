@@ -59,6 +59,7 @@ setup(
     entry_points={
         "console_scripts": [
             "qualcoder-pro=app:main",
+            "qualcoder=qualcoder_cli:main",
         ],
     },
     include_package_data=True,
@@ -0,0 +1,67 @@
+import math
+import pandas as pd
+from pathlib import Path
+from qualcoder_agreement import compare_codings, coding_table, read_coding_sheet, UNCODED
+from qualcoder_core import process_single_transcript, DEFAULT_CODEBOOK
+from qualcoder_store import ProjectStore
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+
+
+def _stage1(ids, codes, texts=None):
+    return pd.DataFrame({
+        'Segment_ID': ids, 'Interview_Text': texts or [f'text {i}' for i in ids],
+        'Initial_Code': codes, 'Notes': [''] * len(ids)
+    })
+
+
+def test_kappa_alpha_and_per_code_by_hand():
+    auto = coding_table([("a.txt", _stage1(['S1', 'S2', 'S3', 'S4', 'S5'], ['x', 'x', 'y', 'y', 'z']), None, None)])
+    human = coding_table(pd.DataFrame({'segment_id': ['S4', 'S3', 'S2', 'S1', 'S9'], 'Code': ['y', 'y', 'y', 'x', '']}),
+                         file_name='a')
+    report = compare_codings(auto, human)
+    # aligned: x/x, x/y, y/y, y/y -> po 0.75, pe (2*1 + 2*3) / 16 = 0.5
+    assert report.n == 4 and report.observed() == 0.75
+    assert math.isclose(report.kappa(), 0.5)
+    # coincidences: x 3, y 5, 2 off-diagonal -> 1 - 7 * 2 / (64 - 34)
+    assert math.isclose(report.alpha(), 1 - 14 / 30)
+
+    per_code = report.per_code().set_index('Code')
+    assert per_code.loc['x', ['Coded_A', 'Coded_B', 'Agreed']].tolist() == [2, 1, 1]
+    assert per_code.loc['x', 'Precision'] == 0.5 and per_code.loc['y', 'Recall'] == 2 / 3
+    assert report.confusions().values.tolist() == [['x', 'y', 1, 1.0]]
+
+    report_rows = report.disagreements()
+    assert report_rows['Status'].tolist() == ['disagree', 'only A', 'only B']
+    assert report_rows['Segment_ID_A'].iloc[0] == 'S2' and report_rows['Code_B'].iloc[2] == UNCODED
+
+
+def test_text_alignment_of_a_resorted_renumbered_sheet(tmp_path):
+    texts = ['I use  Zoom daily.', 'We grade online.', 'I use Zoom daily.']
+    auto = coding_table([("b.docx", _stage1(['S1', 'S2', 'S3'], ['p', 'q', 'p'], texts), None, None)])
+    sheet = tmp_path / "b_Stage1_Initial_Coding.csv"
+    pd.DataFrame({'ID': ['1', '2', '3'], 'Text': ['we grade ONLINE.', 'i use zoom daily.', 'I use Zoom daily.'],
+                  'Final_Code': ['q', 'p', 'r']}).to_csv(sheet, index=False)
+    human = read_coding_sheet(sheet)
+    assert human['File'].iloc[0] == 'b'
+
+    assert compare_codings(auto, human, on='segment').n == 0  # renumbered: no Segment_ID matches
+    report = compare_codings(auto, human, on='text')
+    assert report.n == 3 and not len(report.only_a) and not len(report.only_b)
+    assert report.disagreements()[['Segment_ID_A', 'Code_A', 'Code_B']].values.tolist() == [['S3', 'p', 'r']]
+
+
+def test_offset_alignment_between_stored_runs(tmp_path):
+    store = ProjectStore(tmp_path / "projects.db")
+    runs = []
+    for codebook in (DEFAULT_CODEBOOK, {}):
+        run_id = store.start_run("Demo", tmp_path)
+        process_single_transcript(SAMPLE, tmp_path / str(run_id), codebook, ["RQ1"], store=store, run_id=run_id)
+        runs.append(run_id)
+    first, second = (store.coding_table(r) for r in runs)
+    assert first['Start'].notna().all()
+
+    report = compare_codings(first, second, on='offset')
+    assert report.n == len(first) and report.summary()['only_a'] == 0
+    assert report.per_code()['Coded_A'].sum() == len(first)
+    assert report.observed() < 1
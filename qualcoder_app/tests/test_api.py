@@ -0,0 +1,129 @@
+import io
+import json
+import time
+import zipfile
+import threading
+import http.client
+import pytest
+from pathlib import Path
+from qualcoder_api import make_server, MultipartReader
+from qualcoder_jobs import run_worker
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = make_server("127.0.0.1", 0, tmp_path / "jobs.db", tmp_path / "projects.db", token="secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _request(server, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=30)
+    headers = dict(headers or {}, Authorization="Bearer secret")
+    if isinstance(body, dict):
+        body = json.dumps(body).encode()
+        headers["Content-Type"] = "application/json"
+    conn.request(method, path, body=body, headers=headers)
+    resp = conn.getresponse()
+    data = resp.read()
+    conn.close()
+    return resp.status, data
+
+
+def _multipart(files, fields=None, boundary="qcBOUNDARY42"):
+    out = io.BytesIO()
+    for name, value in (fields or {}).items():
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for filename, content in files:
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                  f'Content-Type: application/octet-stream\r\n\r\n'.encode())
+        out.write(content + b"\r\n")
+    out.write(f"--{boundary}--\r\n".encode())
+    return out.getvalue(), {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def test_multipart_reader_handles_any_chunking():
+    body, _ = _multipart([("a.txt", b"x" * 300 + b"\r\n--qcBOUND"), ("b.txt", b"second")], {"project": "P"})
+    for size in (1, 7, 64, len(body)):
+        parts = {}
+
+        def on_part(headers, parts=parts):
+            key = headers.get("filename") or headers["name"]
+            parts[key] = b""
+
+            def write(chunk):
+                if chunk is not None:
+                    parts[key] += chunk
+            return write
+        reader = MultipartReader(b"qcBOUNDARY42", on_part)
+        for i in range(0, len(body), size):
+            reader.feed(body[i:i + size])
+        reader.close()
+        assert parts == {"project": b"P", "a.txt": b"x" * 300 + b"\r\n--qcBOUND", "b.txt": b"second"}
+
+
+def test_upload_run_and_download(api, tmp_path):
+    assert _request(api, "GET", "/api/health")[0] == 200
+    status, _ = _request(api, "POST", "/api/jobs", {"upload_id": "nope", "research_questions": ["RQ1"]})
+    assert status == 404
+
+    zipped = io.BytesIO()
+    with zipfile.ZipFile(zipped, "w") as zf:
+        zf.write(SAMPLE, "batch/second.txt")
+        zf.writestr("__MACOSX/._second.txt", b"junk")
+    body, headers = _multipart([(SAMPLE.name, SAMPLE.read_bytes()), ("more.zip", zipped.getvalue())])
+    status, data = _request(api, "POST", "/api/uploads", body, headers)
+    assert status == 201
+    upload = json.loads(data)
+    assert sorted(upload["files"]) == ["sample_transcript.txt", "second.txt"]
+
+    status, data = _request(api, "POST", "/api/jobs", {
+        "upload_id": upload["upload_id"], "research_questions": ["RQ1"], "domain_keywords": ["Moodle"]})
+    assert status == 202
+    job_id = json.loads(data)["job_id"]
+    assert _request(api, "GET", f"/api/jobs/{job_id}/results")[0] == 409
+
+    worker = threading.Thread(target=run_worker, args=(tmp_path / "jobs.db", tmp_path / "projects.db",
+                                                       tmp_path / "cache"), kwargs={"max_jobs": 1})
+    worker.start()
+    status, data = _request(api, "GET", f"/api/jobs/{job_id}/events")
+    worker.join()
+    events = [json.loads(line[6:]) for line in data.decode().splitlines() if line.startswith("data: ")]
+    assert status == 200 and events[-1]["status"] == "done" and events[-1]["files_done"] == 2
+
+    results = json.loads(_request(api, "GET", f"/api/jobs/{job_id}/results")[1])
+    assert len(results["files"]) == 2 and results["files"][0]["stage1"]
+
+    outputs = json.loads(_request(api, "GET", f"/api/jobs/{job_id}/outputs")[1])["files"]
+    assert "run_report.json" in outputs
+    status, data = _request(api, "GET", f"/api/jobs/{job_id}/outputs/run_report.json")
+    assert status == 200 and json.loads(data)["counters"]["files"] == 2
+    assert _request(api, "GET", f"/api/jobs/{job_id}/outputs/../../jobs.db")[0] == 404
+    status, data = _request(api, "GET", f"/api/jobs/{job_id}/outputs.zip")
+    assert status == 200 and sorted(zipfile.ZipFile(io.BytesIO(data)).namelist()) == sorted(outputs)
+
+
+def test_auth_and_concurrent_raw_uploads(api):
+    assert _request(api, "GET", "/api/jobs")[0] == 200
+    conn = http.client.HTTPConnection("127.0.0.1", api.server_address[1], timeout=10)
+    conn.request("GET", "/api/jobs")
+    assert conn.getresponse().status == 401
+
+    results = []
+
+    def upload(i):
+        results.append(_request(api, "POST", "/api/uploads", SAMPLE.read_bytes(), {"X-Filename": f"t{i}.txt"}))
+    threads = [threading.Thread(target=upload, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [s for s, _ in results] == [201] * 8
+    assert len({json.loads(d)["upload_id"] for _, d in results}) == 8
+    assert _request(api, "POST", "/api/uploads", b"x", {"X-Filename": "evil.exe"})[0] == 415
@@ -0,0 +1,49 @@
+import copy
+from benchmarks.synthetic import generate_transcript
+from benchmarks.run_benchmarks import run_benchmarks, compare_to_baseline, scaling_exponent
+from benchmarks.import_time import measure_import, check_imports
+from qualcoder_core import extract_participant_responses, stage1_initial_coding
+
+
+def test_synthetic_transcript_is_deterministic_and_parameterized():
+    a = generate_transcript(turns=40, sentence_length=8, keyword_density=0.5, codebook_size=7, seed=3)
+    assert a == generate_transcript(turns=40, sentence_length=8, keyword_density=0.5, codebook_size=7, seed=3)
+    assert a.text != generate_transcript(turns=40, seed=4).text
+    assert len(a.codebook) == 7
+    assert len(extract_participant_responses(a.text)) == 40
+
+    coded = stage1_initial_coding(a.text, "synthetic", a.codebook, a.domain_keywords)
+    plain = generate_transcript(turns=40, keyword_density=0.0, codebook_size=7, seed=3)
+    plain_coded = stage1_initial_coding(plain.text, "synthetic", plain.codebook, plain.domain_keywords)
+    assert coded['Initial_Code'].isin(a.codebook).any()
+    assert not plain_coded['Initial_Code'].isin(plain.codebook).any()
+
+
+def test_scaling_exponent():
+    assert abs(scaling_exponent([10, 20, 40], [1.0, 2.0, 4.0]) - 1.0) < 1e-9
+    assert abs(scaling_exponent([10, 20, 40], [1.0, 4.0, 16.0]) - 2.0) < 1e-9
+
+
+def test_benchmark_report_and_baseline_comparison():
+    report = run_benchmarks([20, 40], names=["stage1_initial_coding", "stage2_code_grouping"], repeat=1)
+    bench = report['benchmarks']['stage1_initial_coding']
+    assert [r['n'] for r in bench['results']] == [20, 40]
+    assert all(r['throughput'] > 0 for r in bench['results'])
+    assert compare_to_baseline(report, report) == []
+
+    faster_baseline = copy.deepcopy(report)
+    for row in faster_baseline['benchmarks']['stage1_initial_coding']['results']:
+        row['calibrated_throughput'] *= 10
+    faster_baseline['benchmarks']['stage2_code_grouping']['exponent'] -= 1.0
+    problems = compare_to_baseline(report, faster_baseline)
+    assert len(problems) == 2
+    assert any(p.startswith("stage1_initial_coding: calibrated throughput") for p in problems)
+    assert any(p.startswith("stage2_code_grouping: scaling exponent") for p in problems)
+
+
+def test_core_import_is_lazy_and_within_budget():
+    result = measure_import("qualcoder_core", repeat=2)
+    assert result["heavy_modules"] == []
+    assert check_imports([result]) == []
+    assert check_imports([dict(result, seconds=10.0, heavy_modules=["sklearn"])]) == [
+        "qualcoder_core: import took 10.000 s (budget 1.000 s)", "qualcoder_core: import loads sklearn"]
@@ -0,0 +1,41 @@
+import os
+import pytest
+from pathlib import Path
+from qualcoder_core import process_single_transcript, DEFAULT_CODEBOOK
+from qualcoder_cache import StageCache
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+
+
+def test_changed_research_questions_rerun_only_stage3(tmp_path):
+    cache = StageCache(tmp_path / "cache")
+    first = process_single_transcript(SAMPLE, tmp_path / "a", DEFAULT_CODEBOOK, ["RQ1"], cache=cache)
+    assert not cache.hits
+
+    second = process_single_transcript(SAMPLE, tmp_path / "b", DEFAULT_CODEBOOK, ["RQ1", "RQ2"], cache=cache)
+    assert set(cache.hits) == {'extract', 'segment', 'code', 'group', 'write'}
+    assert cache.misses['theme'] == 2
+    assert second[0].equals(first[0]) and second[1].equals(first[1])
+    assert len(list((tmp_path / "b").rglob("*.xlsx"))) == 3
+
+
+def test_changed_keywords_skip_extraction_and_segmentation(tmp_path):
+    cache = StageCache(tmp_path / "cache")
+    process_single_transcript(SAMPLE, tmp_path / "a", DEFAULT_CODEBOOK, ["RQ1"], cache=cache)
+    s1, _, _ = process_single_transcript(
+        SAMPLE, tmp_path / "b", DEFAULT_CODEBOOK, ["RQ1"], domain_keywords=["moodle"], cache=cache
+    )
+    assert cache.hits['extract'] == 1 and cache.hits['segment'] == 1
+    assert cache.hits['code'] == 0
+    assert s1['Notes'].str.contains("moodle").any()
+
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    cache = StageCache(tmp_path / "cache")
+    cache.put('code', 'a' * 64, b'x' * 1000)
+    cache.put('code', 'b' * 64, b'y' * 1000)
+    cache.get('code', 'a' * 64)
+    os.utime(cache._path('code', 'b' * 64), (0, 0))
+    cache.prune(max_bytes=1500)
+    assert cache.get('code', 'a' * 64) is not None
+    assert cache.get('code', 'b' * 64) is None
@@ -0,0 +1,30 @@
+from qualcoder_concordance import ConcordanceIndex, tokenize
+
+DOCS = {
+    "a.txt": "Students are online most days.\nOnline learning suits them; online\nlearning is flexible.",
+    "b.txt": "We use Moodle. Students online? Rarely. ONLINE LEARNING is new here.",
+}
+
+
+def test_phrase_lookup_and_context_windows():
+    index = ConcordanceIndex(list(DOCS), list(DOCS.values()))
+    assert tokenize("Online-learning") == ["online", "learning"]
+
+    lines, total = index.concordance("online learning", window=2)
+    assert total == 3
+    # matched text is shown as written, line breaks folded; context stays inside the document
+    assert lines["Keyword"].tolist() == ["Online learning", "online learning", "ONLINE LEARNING"]
+    assert lines.iloc[0][["Left", "Right"]].tolist() == ["most days.", "suits them"]
+    assert lines.iloc[2]["Right"] == "is new"
+    assert index.file_counts("online learning").to_dict() == {"a.txt": 2, "b.txt": 1}
+
+    # no phrase across documents, unknown words find nothing
+    assert index.count("flexible we") == 0 and index.count("blended learning") == 0
+    # like TF-IDF bigrams, stop words in between can be skipped
+    assert index.count("students online") == 1
+    assert index.count("students online", skip_stop_words=True) == 2
+
+    page, total = index.concordance("online", sort="right", limit=2, offset=1)
+    assert total == 5 and len(page) == 2
+    by_left = index.concordance("online", window=1, sort="left")[0]
+    assert by_left["Left"].tolist() == ["are", "days.", "Rarely.", "Students", "them;"]
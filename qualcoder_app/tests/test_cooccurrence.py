@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from qualcoder_core import CodebookIndex
+from qualcoder_cooccurrence import MultiLabelCoder, CodeIncidence, CooccurrenceMatrix, to_dot
+from qualcoder_results import SessionResults
+
+CODEBOOK = {
+    "LMS": ["moodle", "learning management"],
+    "Learning": ["learn"],
+    "Assessment": ["quiz", "test"],
+}
+
+
+def _stage1(texts, codes):
+    return pd.DataFrame({
+        'Segment_ID': [f'S{i:03d}' for i in range(1, len(texts) + 1)],
+        'Interview_Text': texts, 'Initial_Code': codes, 'Notes': [''] * len(texts)
+    })
+
+
+def test_multi_label_hits_match_substring_semantics():
+    coder = MultiLabelCoder(CODEBOOK, ["Moodle"])
+    texts = ["Our Learning Management system", "a moodle quiz", "latest news", "nothing here"]
+    hits = coder.incidence(texts).toarray().astype(bool)
+    got = [{coder.labels[j] for j in np.flatnonzero(row)} for row in hits]
+    # 'learn' inside 'learning management', 'test' inside 'latest': same as CodebookIndex substring matching
+    assert got == [{"LMS", "Learning"}, {"LMS", "Assessment", "Domain-specific practice (Moodle)"},
+                   {"Assessment"}, set()]
+    index = CodebookIndex(CODEBOOK, ["Moodle"])
+    assert all(index.code(t)[0] in labels for t, labels in zip(texts, got) if labels)
+
+
+def test_cooccurrence_units_and_normalizations():
+    results = [
+        ("a.txt", _stage1(["moodle quiz", "I learn", "a test", "other"], ["LMS", "Learning", "Assessment", "Other"]),
+         None, None),
+        ("b.txt", _stage1(["I learn with moodle"], ["LMS"]), None, None),
+    ]
+    # Stage 1 codes alone: one code per segment, nothing co-occurs within a segment
+    assert CooccurrenceMatrix.from_results(results).edges().empty
+
+    coder = MultiLabelCoder(CODEBOOK)
+    seg = CooccurrenceMatrix.from_results(results, coder=coder)
+    edges = seg.edges().set_index(['Source', 'Target'])
+    assert edges.loc[('LMS', 'Assessment'), 'Count'] == 1 and edges.loc[('LMS', 'Learning'), 'Count'] == 1
+    # Jaccard = 1 / (2 LMS + 2 Learning - 1); lift = 1 * 5 segments / (2 * 2)
+    assert edges.loc[('LMS', 'Learning'), 'Jaccard'] == round(1 / 3, 4)
+    assert edges.loc[('LMS', 'Learning'), 'Lift'] == 1.25
+
+    # windows of two neighbouring segments; a.txt's last segment does not pair with b.txt's first
+    win = CooccurrenceMatrix.from_results(results, unit='window', window=2)
+    assert set(map(tuple, win.edges()[['Source', 'Target']].values)) == {
+        ('LMS', 'Learning'), ('Learning', 'Assessment'), ('Assessment', 'Other')}
+    per_file = CooccurrenceMatrix.from_results(results, unit='transcript')
+    assert per_file.units == 2 and per_file.edges(min_count=2).empty
+
+    dot = to_dot(edges.reset_index(), dict(zip(seg.labels, seg.frequency.tolist())), weight='Lift')
+    assert dot.startswith('graph') and '"LMS" -- "Learning"' in dot
+
+
+def test_incidence_rescans_only_changed_transcripts():
+    results = SessionResults([("a.txt", _stage1(["moodle quiz"], ["LMS"]), None, None)])
+    incidence = CodeIncidence(MultiLabelCoder(CODEBOOK))
+    assert incidence.update(results) == ["a.txt"]
+    results.append("b.txt", _stage1(["learn", "quiz"], ["Learning", "Assessment"]), None, None)
+    assert incidence.update(results) == ["b.txt"]
+    matrix, labels, file_ids = incidence.matrix()
+    assert matrix.shape == (3, 3) and file_ids.tolist() == [0, 1, 1]
+    assert incidence.cooccurrence('transcript').counts[labels.index("LMS"), labels.index("Assessment")] == 1
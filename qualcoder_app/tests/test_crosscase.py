@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from qualcoder_crosscase import CrossCaseMatrix
+from qualcoder_results import SessionResults
+
+
+def _stage1(codes):
+    return pd.DataFrame({
+        'Segment_ID': [f'S{i:03d}' for i in range(1, len(codes) + 1)],
+        'Interview_Text': ['text'] * len(codes), 'Initial_Code': codes, 'Notes': [''] * len(codes)
+    })
+
+
+def test_matrix_normalizes_orders_and_exports_sparsely():
+    m = CrossCaseMatrix.from_results([
+        ("a.txt", _stage1(["Digital assessment practices"] * 3 + ["Feedback and grading"]), None, None),
+        ("b.txt", _stage1(["Use of multimedia resources"] * 2), None, None),
+        ("c.txt", None, None, None),
+    ])
+    assert m.shape == (3, 3) and m.matrix.nnz == 3
+    frame = m.to_frame(row_order='total', column_order='name')
+    assert frame.index.tolist() == ["a.txt", "b.txt", "c.txt"]
+    assert frame.loc["a.txt"].tolist() == [3, 1, 0]
+    assert np.allclose(m.to_frame('row').sum(axis=1), [1, 1, 0])
+    assert m.to_frame('binary').to_numpy().sum() == 3
+    assert m.to_long().values.tolist()[0] == ["a.txt", "Digital assessment practices", 3]
+
+    # theme matrix: assessment codes feed 'Assessment and Feedback Systems'
+    themes = m.themes()
+    assert themes.to_frame().loc["a.txt", "Assessment and Feedback Systems"] == 4
+
+    rows, cols = m.coclusters(2)
+    assert rows[2] == -1 and rows[0] != rows[1]
+    assert m.order(0, 'cluster', 2)[-1] == 2  # the empty transcript goes last
+
+
+def test_matrix_updates_only_changed_files():
+    results = SessionResults([
+        ("a.txt", _stage1(["X", "X", "Y"]), None, None),
+        ("b.txt", _stage1(["Y"]), None, None),
+    ])
+    m = CrossCaseMatrix()
+    assert m.update(results) == ["a.txt", "b.txt"]
+    assert m.update(results) == []
+    results.replace("b.txt", _stage1(["Z", "Z"]), None, None)
+    results.append("c.txt", _stage1(["X"]), None, None)
+    assert m.update(results) == ["b.txt", "c.txt"]
+    assert m.to_frame().to_dict('index') == {
+        "a.txt": {"X": 2, "Y": 1, "Z": 0}, "b.txt": {"X": 0, "Y": 0, "Z": 2}, "c.txt": {"X": 1, "Y": 0, "Z": 0}}
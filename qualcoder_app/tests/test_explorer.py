@@ -0,0 +1,43 @@
+import pandas as pd
+from qualcoder_explorer import SegmentTable
+
+
+def _stage1(texts, codes, notes):
+    return pd.DataFrame({
+        'Segment_ID': [f'S{i:03d}' for i in range(1, len(texts) + 1)],
+        'Interview_Text': texts, 'Initial_Code': codes, 'Notes': notes
+    })
+
+
+RESULTS = [
+    ("a.txt", _stage1(["I use Moodle daily.", "Challenges with video.", "Fine."],
+                      ["LMS", "Media", "Other"], ["Matched domain keyword: Moodle", "", ""]), None, None),
+    ("b.txt", None, None, None),  # streamed to disk
+    ("c.txt", _stage1(["Moodle quizzes are challenging for students."],
+                      ["LMS"], ["Matched domain keyword: Moodle"]), None, None),
+]
+
+
+def test_segment_table_filters_and_pages():
+    table = SegmentTable.from_results(RESULTS)
+    assert len(table) == 4
+    assert table.files() == ["a.txt", "c.txt"]
+    assert table.codes()[0] == "LMS" and table.keywords() == ["Moodle"]
+
+    page, total = table.query("moodle challeng*")
+    assert total == 1 and page.iloc[0]['File'] == "c.txt"
+    page, total = table.query(keyword="Moodle", file_name="a.txt")
+    assert total == 1 and page.iloc[0]['Domain_Keyword'] == "Moodle"
+    assert table.query(code="Media")[1] == 1
+
+    page, total = table.query(limit=2, offset=2)
+    assert total == 4 and page['Segment_ID'].tolist() == ["S003", "S001"]
+    page, _ = table.query(sort='length', descending=True, limit=1)
+    assert page.iloc[0]['File'] == "c.txt"
+    page, _ = table.query(sort='code')
+    assert page['Initial_Code'].tolist() == ["LMS", "LMS", "Media", "Other"]
+
+
+def test_segment_table_empty():
+    page, total = SegmentTable.from_results([("b.txt", None, None, None)]).query("anything")
+    assert total == 0 and page.empty
@@ -0,0 +1,81 @@
+import time
+import socket
+from pathlib import Path
+from qualcoder_core import DEFAULT_CODEBOOK
+from qualcoder_jobs import JobQueue, run_worker, start_workers
+from qualcoder_store import ProjectStore
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+CONFIG = {"research_questions": ["RQ1"], "domain_keywords": ["Moodle"], "codebook": DEFAULT_CODEBOOK}
+
+
+def test_claim_is_exclusive_and_cancel(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db")
+    first = queue.submit("Demo", [SAMPLE], CONFIG)
+    second = queue.submit("Demo", [SAMPLE], CONFIG)
+
+    job = queue.claim("w1")
+    assert job['job_id'] == first and job['status'] == 'running' and job['files'] == [str(SAMPLE)]
+    assert JobQueue(tmp_path / "jobs.db").claim("w2")['job_id'] == second
+    assert queue.claim("w3") is None
+
+    third = queue.submit("Demo", [SAMPLE], CONFIG)
+    assert queue.cancel(third) and queue.get(third)['status'] == 'cancelled'
+    assert not queue.cancel(third)
+    # A running job is only asked to stop after its current file
+    assert queue.cancel(first) and queue.get(first)['status'] == 'cancelling'
+    assert queue.cancel_requested(first)
+
+
+def test_worker_runs_job_into_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queue = JobQueue(tmp_path / "jobs.db")
+    job_id = queue.submit("Demo", [SAMPLE, tmp_path / "missing.txt"], CONFIG)
+
+    assert run_worker(tmp_path / "jobs.db", tmp_path / "projects.db", tmp_path / "cache", max_jobs=5) == 1
+    job = queue.get(job_id)
+    assert job['status'] == 'done' and job['files_done'] == 2
+    assert list(job['errors']) == ["missing.txt"]
+    assert (Path(job['output_folder']) / "run_report.json").exists()
+    assert job['progress']['event'] == 'file_done' and job['progress']['fraction'] == 1.0
+
+    loaded = ProjectStore(tmp_path / "projects.db").load_run(job['run_id'])
+    assert [fname for fname, *_ in loaded] == [SAMPLE.name]
+    assert len(loaded[0][1]) > 0
+
+
+def test_finished_jobs_drop_their_inputs_and_resumable_ones_keep_them(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queue = JobQueue(tmp_path / "jobs.db")
+    done_dir, failed_dir = queue.new_inputs_dir(), queue.new_inputs_dir()
+    (done_dir / SAMPLE.name).write_bytes(SAMPLE.read_bytes())
+    done = queue.submit("Demo", [done_dir / SAMPLE.name], CONFIG)
+    failed = queue.submit("Demo", [failed_dir / "missing.txt"], CONFIG)
+    assert queue.inputs_dir(queue.get(done)) == done_dir.resolve()
+    assert queue.inputs_dir(queue.get(queue.submit("Demo", [SAMPLE], CONFIG))) is None  # not ours to delete
+
+    run_worker(tmp_path / "jobs.db", tmp_path / "projects.db", tmp_path / "cache", max_jobs=3)
+    assert queue.get(done)['status'] == 'done' and not done_dir.exists()
+    assert queue.get(failed)['status'] == 'failed' and failed_dir.exists()
+    assert SAMPLE.exists()
+
+
+def test_requeue_orphans_and_worker_processes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queue = JobQueue(tmp_path / "jobs.db")
+    orphan = queue.submit("Demo", [SAMPLE], CONFIG)
+    queue.claim(f"{socket.gethostname()}:999999")
+    other = queue.submit("Demo", [SAMPLE], CONFIG)
+
+    workers = start_workers(2, tmp_path / "jobs.db", tmp_path / "projects.db", tmp_path / "cache")
+    try:
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            if all(queue.get(j)['status'] == 'done' for j in (orphan, other)):
+                break
+            time.sleep(0.2)
+    finally:
+        for w in workers:
+            w.terminate()
+    assert queue.get(orphan)['status'] == 'done'
+    assert queue.get(other)['status'] == 'done'
@@ -0,0 +1,25 @@
+import json
+import pytest
+from pathlib import Path
+from qualcoder_core import process_single_transcript, RunMetrics, DEFAULT_CODEBOOK
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+
+
+def test_run_report_records_stages_counters_and_bytes(tmp_path):
+    metrics = RunMetrics("Demo")
+    s1, _, _ = process_single_transcript(
+        SAMPLE, tmp_path, DEFAULT_CODEBOOK, ["RQ1"], domain_keywords=["moodle"], metrics=metrics
+    )
+    report_path = metrics.write_report(tmp_path, prometheus=True)
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+
+    assert {'extract', 'segment', 'code', 'group', 'theme', 'write'} <= set(report['stage_seconds'])
+    assert report['counters']['segments'] == len(s1)
+    assert report['counters']['domain_keyword_hits'] == 1
+    assert report['counters']['bytes_read'] == SAMPLE.stat().st_size
+    assert report['files'][SAMPLE.name]['counters']['bytes_written'] > 0
+
+    prom = (tmp_path / "metrics.prom").read_text(encoding="utf-8")
+    assert '# TYPE qualcoder_stage_seconds_total counter' in prom
+    assert f'qualcoder_events_total{{run="Demo",version="{report["version"]}",counter="segments"}} {len(s1)}' in prom
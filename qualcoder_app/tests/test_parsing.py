@@ -12,3 +12,15 @@ def test_generate_initial_code_keywords():
     s = "I use PowerPoint and slides for my lectures."
     code, note = generate_initial_code(s, DEFAULT_CODEBOOK)
     assert "Presentation" in code or "presentation" in code.lower() or "presentation" in code
+
+
+def test_streaming_pipeline_matches_in_memory(tmp_path):
+    from openpyxl import load_workbook
+    from qualcoder_core import process_single_transcript, process_single_transcript_streaming
+    sample = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+    s1, s2, s3 = process_single_transcript(sample, tmp_path / "mem", DEFAULT_CODEBOOK, ["RQ1"])
+    path, t2, t3 = process_single_transcript_streaming(sample, tmp_path / "stream", DEFAULT_CODEBOOK, ["RQ1"], chunk_size=2)
+    assert t2.equals(s2) and t3.equals(s3)
+    rows = list(load_workbook(path).active.values)
+    assert list(rows[0]) == list(s1.columns)
+    assert [list(r) for r in rows[1:]] == [[v if v != "" else None for v in r] for r in s1.values.tolist()]
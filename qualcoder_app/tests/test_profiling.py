@@ -0,0 +1,83 @@
+import pstats
+import pytest
+from pathlib import Path
+from qualcoder_core import (
+    process_single_transcript, process_single_transcript_streaming, DEFAULT_CODEBOOK, RunMetrics
+)
+from qualcoder_profiling import StageProfiler, MemoryAccountant, MemoryBudgetExceeded
+from qualcoder_cli import main as cli_main
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+
+
+def test_cprofile_writes_prof_and_collapsed_stacks(tmp_path):
+    profiler = StageProfiler(tmp_path, mode="cprofile")
+    process_single_transcript(SAMPLE, tmp_path, DEFAULT_CODEBOOK, ["RQ1"], profiler=profiler)
+
+    prof = tmp_path / "profiles" / f"{SAMPLE.stem}.prof"
+    collapsed = tmp_path / "profiles" / f"{SAMPLE.stem}.collapsed.txt"
+    assert prof.exists() and collapsed.exists()
+    assert pstats.Stats(str(prof)).total_calls > 0
+    roots = {line.split(';', 1)[0] for line in collapsed.read_text().splitlines()}
+    assert {"extract", "segment", "code", "write"} <= roots
+
+
+def test_sample_mode_and_env_toggle(tmp_path, monkeypatch):
+    monkeypatch.setenv("QUALCODER_PROFILE", "sample")
+    monkeypatch.setenv("QUALCODER_PROFILE_INTERVAL", "0.0005")
+    process_single_transcript_streaming(SAMPLE, tmp_path, DEFAULT_CODEBOOK, ["RQ1"])
+    assert not (tmp_path / "profiles" / f"{SAMPLE.stem}.prof").exists()
+    assert (tmp_path / "profiles").is_dir()
+
+    monkeypatch.delenv("QUALCODER_PROFILE")
+    out = tmp_path / "plain"
+    process_single_transcript(SAMPLE, out, DEFAULT_CODEBOOK, ["RQ1"])
+    assert not (out / "profiles").exists()
+
+
+def test_cli_run_with_profile(tmp_path):
+    out = tmp_path / "run"
+    code = cli_main(["run", str(SAMPLE), "--rq", "RQ1", "--output", str(out),
+                     "--no-cache", "--profile", "cprofile"])
+    assert code == 0
+    assert (out / "run_report.json").exists()
+    assert (out / "profiles" / f"{SAMPLE.stem}.prof").exists()
+
+
+def test_memory_accounting_in_report_and_budget(tmp_path):
+    metrics = RunMetrics("mem")
+    memory = MemoryAccountant(metrics)
+    try:
+        process_single_transcript(SAMPLE, tmp_path, DEFAULT_CODEBOOK, ["RQ1"], metrics=metrics, memory=memory)
+        stages = metrics.to_dict()['files'][SAMPLE.name]['memory']
+        assert {"extract", "segment", "code", "write"} <= set(stages)
+        assert all(rec['peak_bytes'] >= 0 for rec in stages.values())
+        assert stages['write']['top_sites']
+
+        tight = MemoryAccountant(budget_bytes=1024)
+        with pytest.raises(MemoryBudgetExceeded, match="per-file budget"):
+            process_single_transcript(SAMPLE, tmp_path / "tight", DEFAULT_CODEBOOK, ["RQ1"], memory=tight)
+    finally:
+        memory.close()
+
+
+def test_memory_budget_stops_a_stage_part_way(tmp_path):
+    memory = MemoryAccountant(budget_bytes=256 * 1024, top_n=0)
+    kept, seen = [], 0
+    try:
+        with pytest.raises(MemoryBudgetExceeded, match="stage 'code' passed"):
+            with memory.stage('code', 'big.txt'):
+                for _ in range(1000):
+                    memory.check_budget()
+                    seen += 1
+                    kept.append(bytearray(16 * 1024))
+        assert 10 < seen < 1000  # stopped once about 256 KB had been allocated, not at the end
+
+        # in the pipeline: the per-segment check fails the streaming pass before it has read the file
+        big = tmp_path / "big.txt"
+        big.write_text(SAMPLE.read_text(encoding='utf-8') * 2000, encoding='utf-8')
+        with pytest.raises(MemoryBudgetExceeded, match="stage 'stream' passed"):
+            process_single_transcript_streaming(big, tmp_path / "out", DEFAULT_CODEBOOK, ["RQ1"],
+                                                memory=MemoryAccountant(budget_bytes=64 * 1024, top_n=0))
+    finally:
+        memory.close()
@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from qualcoder_core import process_batch, ProgressTracker, format_progress, DEFAULT_CODEBOOK
+from benchmarks.synthetic import generate_transcript
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+
+
+def _run(tmp_path, files, streaming, min_interval):
+    events = []
+    tracker = ProgressTracker(events.append, files, min_interval=min_interval)
+    results, errors = process_batch(files, tmp_path / "out", DEFAULT_CODEBOOK, ["RQ1"],
+                                    streaming=streaming, progress=tracker)
+    assert not errors
+    return events
+
+
+def test_progress_events_cover_every_phase_and_reach_the_end(tmp_path):
+    big = tmp_path / "big.txt"
+    big.write_text(generate_transcript(turns=300, seed=3).text, encoding="utf-8")
+    files = [SAMPLE, big]
+    for streaming in (False, True):
+        events = _run(tmp_path, files, streaming, min_interval=0.0)
+        kinds = {e['event'] for e in events}
+        assert {'file_started', 'turns', 'segments', 'written', 'file_done'} <= kinds
+        assert ('read' in kinds) == streaming
+        fractions = [e['fraction'] for e in events]
+        assert fractions == sorted(fractions) and fractions[-1] == 1.0
+        last = events[-1]
+        assert last['files_done'] == last['files_total'] == 2
+        assert last['segments'] > 0 and last['segments_per_second'] > 0 and last['eta_seconds'] == 0
+        assert "100% · 2/2 files" in format_progress(last)
+
+
+def test_progress_is_rate_limited(tmp_path):
+    events = _run(tmp_path, [SAMPLE], False, min_interval=3600)
+    # Only file boundaries and the end of each phase get through
+    assert events[0]['event'] == 'file_started' and events[-1]['event'] == 'file_done'
+    assert all(e['done'] == e['total'] for e in events[1:])
@@ -0,0 +1,52 @@
+import random
+from pathlib import Path
+from qualcoder_core import (
+    IncrementalStages, code_segments, stage2_code_grouping, stage3_thematic_framework,
+    process_single_transcript, DEFAULT_CODEBOOK, FALLBACK_CODE
+)
+from qualcoder_store import ProjectStore
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+RQS = ["RQ1", "RQ2"]
+
+
+def _same(a, b):
+    if a.empty and b.empty:
+        return True
+    return a.reset_index(drop=True).astype(str).equals(b.reset_index(drop=True).astype(str))
+
+
+def test_recode_matches_full_recomputation():
+    rng = random.Random(7)
+    words = "moodle video zoom students teacher challenge online quiz feedback professional training".split()
+    stage1 = code_segments([" ".join(rng.choice(words) for _ in range(10)) for _ in range(400)],
+                           DEFAULT_CODEBOOK, ["Moodle"])
+    engine = IncrementalStages(stage1, RQS)
+    assert _same(engine.stage2, stage2_code_grouping(stage1))
+    assert _same(engine.stage3, stage3_thematic_framework(stage1, RQS))
+
+    codes = list(DEFAULT_CODEBOOK) + [FALLBACK_CODE, "A brand new code"]
+    for _ in range(60):
+        changes = {engine.stage1.at[i, 'Segment_ID']: rng.choice(codes) for i in rng.sample(range(400), 3)}
+        engine.recode(changes)
+        assert _same(engine.stage2, stage2_code_grouping(engine.stage1))
+        assert _same(engine.stage3, stage3_thematic_framework(engine.stage1, RQS))
+    assert sum(len(v) for v in engine.code_segments.values()) == 400
+
+
+def test_recode_reports_touched_aggregates_and_persists(tmp_path):
+    store = ProjectStore(tmp_path / "projects.db")
+    run_id = store.start_run("Demo", tmp_path)
+    s1, s2, s3 = process_single_transcript(SAMPLE, tmp_path, DEFAULT_CODEBOOK, RQS, store=store, run_id=run_id)
+    engine = IncrementalStages(s1, RQS)
+
+    sid = s1['Segment_ID'].iloc[0]
+    assert engine.recode({sid: s1['Initial_Code'].iloc[0]}) == ([], [])
+    groups, themes = engine.recode({sid: "Digital assessment practices"})
+    assert groups and themes
+    assert engine.stage1.loc[engine.stage1['Segment_ID'] == sid, 'Initial_Code'].item() == "Digital assessment practices"
+
+    store.recode_transcript(run_id, SAMPLE.name, {sid: "Digital assessment practices"}, engine.stage2, engine.stage3)
+    _, l1, l2, l3 = store.load_run(run_id)[0]
+    assert _same(l1, engine.stage1) and _same(l2, engine.stage2) and _same(l3, engine.stage3)
+    assert store.segments_with_code("Digital assessment practices", run_id=run_id)['start_offset'].notna().all()
@@ -0,0 +1,134 @@
+"""
+Regression guardrails: the full pipeline on a fixed corpus must reproduce the golden
+Stage 1/2/3 outputs byte-for-byte and stay within per-stage time and memory budgets.
+
+Regenerate the golden files after an intentional output change with
+    QUALCODER_UPDATE_GOLDEN=1 python -m pytest tests/test_regression.py
+"""
+
+import os
+import csv
+import io
+import json
+import logging
+import pytest
+from pathlib import Path
+from openpyxl import load_workbook
+
+from qualcoder_core import (
+    process_single_transcript, process_single_transcript_streaming, load_codebook,
+    RunMetrics, DEFAULT_CODEBOOK
+)
+from qualcoder_profiling import MemoryAccountant, MB
+from benchmarks.synthetic import generate_transcript
+from benchmarks.run_benchmarks import calibrate
+
+HERE = Path(__file__).resolve().parent
+REGRESSION = HERE / "regression"
+CORPUS = REGRESSION / "corpus"
+GOLDEN = REGRESSION / "golden"
+BUDGETS = json.loads((REGRESSION / "budgets.json").read_text(encoding="utf-8"))
+UPDATE_GOLDEN = os.environ.get("QUALCODER_UPDATE_GOLDEN") == "1"
+
+RQS = ["How do teachers integrate digital tools?", "What challenges do teachers face?"]
+SYNTHETIC_CODEBOOK = CORPUS / "synthetic_codebook.json"
+
+# (transcript, codebook, domain keywords)
+CASES = [
+    (HERE.parent / "examples" / "sample_transcript.txt", None, []),
+    (HERE.parent / "examples" / "sample_transcript.txt", None, ["Moodle", "quizzes"]),
+    (CORPUS / "synthetic_60_turns.txt", SYNTHETIC_CODEBOOK, ["domainterm0", "domainterm3"]),
+    (CORPUS / "synthetic_10_turns.docx", SYNTHETIC_CODEBOOK, []),
+]
+CASE_IDS = [f"{path.stem}{'-kw' if kw else ''}" for path, _, kw in CASES]
+STAGES = ("Stage1_Initial_Coding", "Stage2_Code_Grouping", "Stage3_Thematic_Framework")
+
+
+def _workbook(output_folder: Path, transcript: Path, stage: str) -> Path:
+    matches = list(output_folder.glob(f"{transcript.stem}_*/{transcript.stem}_{stage}.xlsx"))
+    assert len(matches) == 1, f"expected one {stage} workbook, found {matches}"
+    return matches[0]
+
+
+def _sheet_csv(path: Path) -> bytes:
+    """
+    Canonical CSV of the first worksheet, so golden files diff as text.
+    """
+    ws = load_workbook(path, read_only=True).worksheets[0]
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for row in ws.iter_rows(values_only=True):
+        writer.writerow(["" if v is None else v for v in row])
+    return buf.getvalue().encode("utf-8")
+
+
+def _check_golden(name: str, produced: bytes):
+    golden = GOLDEN / name
+    if UPDATE_GOLDEN:
+        golden.parent.mkdir(parents=True, exist_ok=True)
+        golden.write_bytes(produced)
+    assert golden.exists(), f"Missing golden file {golden}; run with QUALCODER_UPDATE_GOLDEN=1"
+    assert produced == golden.read_bytes(), f"{name} differs from its golden file"
+
+
+@pytest.mark.parametrize("path,codebook_path,keywords", CASES, ids=CASE_IDS)
+def test_pipeline_matches_golden_outputs(tmp_path, path, codebook_path, keywords):
+    codebook = load_codebook(codebook_path) if codebook_path else DEFAULT_CODEBOOK
+    case = f"{path.stem}{'-kw' if keywords else ''}"
+
+    process_single_transcript(path, tmp_path / "memory", codebook, RQS, keywords)
+    for stage in STAGES:
+        _check_golden(f"{case}.{stage}.csv", _sheet_csv(_workbook(tmp_path / "memory", path, stage)))
+
+    # The constant-memory pipeline must write the same workbook contents
+    process_single_transcript_streaming(path, tmp_path / "stream", codebook, RQS, keywords, chunk_size=7)
+    for stage in STAGES:
+        produced = _sheet_csv(_workbook(tmp_path / "stream", path, stage))
+        assert produced == (GOLDEN / f"{case}.{stage}.csv").read_bytes(), f"streamed {stage} differs"
+
+
+@pytest.fixture(scope="module")
+def budget_transcript(tmp_path_factory):
+    corpus = generate_transcript(**BUDGETS["corpus"])
+    path = tmp_path_factory.mktemp("budget") / "budget_transcript.txt"
+    path.write_text(corpus.text, encoding="utf-8")
+    return path, corpus
+
+
+def test_stage_time_budgets(tmp_path, budget_transcript):
+    path, corpus = budget_transcript
+    unit = calibrate()
+    logging.disable(logging.INFO)
+    try:
+        best = {}
+        for attempt in range(2):  # best of two to absorb a cold first run
+            metrics = RunMetrics("budget")
+            process_single_transcript(path, tmp_path / str(attempt), corpus.codebook,
+                                      corpus.research_questions, corpus.domain_keywords, metrics=metrics)
+            for stage, seconds in metrics.stage_seconds.items():
+                best[stage] = min(best.get(stage, seconds), seconds)
+    finally:
+        logging.disable(logging.NOTSET)
+    over = {
+        stage: f"{best[stage] / unit:.2f} > {limit} calibration units"
+        for stage, limit in BUDGETS["time_calibration_units"].items()
+        if best.get(stage, 0.0) / unit > limit
+    }
+    assert not over, f"Stage time budgets exceeded: {over}"
+
+
+def test_stage_memory_budgets(tmp_path, budget_transcript):
+    path, corpus = budget_transcript
+    memory = MemoryAccountant(top_n=0)
+    try:
+        process_single_transcript(path, tmp_path, corpus.codebook, corpus.research_questions,
+                                  corpus.domain_keywords, memory=memory)
+    finally:
+        memory.close()
+    peaks = memory.files[path.name]
+    over = {
+        stage: f"{peaks[stage]['peak_bytes'] / MB:.1f} MB > {limit} MB"
+        for stage, limit in BUDGETS["peak_mb"].items()
+        if stage in peaks and peaks[stage]['peak_bytes'] / MB > limit
+    }
+    assert not over, f"Stage memory budgets exceeded: {over}"
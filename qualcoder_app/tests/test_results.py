@@ -0,0 +1,52 @@
+from pathlib import Path
+from qualcoder_core import process_single_transcript, DEFAULT_CODEBOOK
+from qualcoder_results import SessionResults, compact_frame, expand_frame, encode_segment_ids
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+
+
+def _same(a, b):
+    return list(a.columns) == list(b.columns) and a.astype(str).equals(b.astype(str))
+
+
+def test_compact_frames_round_trip(tmp_path):
+    s1, s2, s3 = process_single_transcript(SAMPLE, tmp_path, DEFAULT_CODEBOOK, ["RQ1"], ["Moodle"])
+    for df in (s1, s2, s3):
+        compact = compact_frame(df)
+        assert 'Segment_ID' not in compact.columns and 'Segment_IDs' not in compact.columns
+        assert _same(expand_frame(compact), df)
+    assert str(compact_frame(s1)['Initial_Code'].dtype) == 'category'
+    # IDs that would not survive the integer form are kept as strings
+    assert encode_segment_ids(["S001", "S2"]) is None and encode_segment_ids(["X1"]) is None
+    assert encode_segment_ids(["S001", "S1000"]).tolist() == [1, 1000]
+
+
+def test_session_results_spill_least_recently_used(tmp_path):
+    s1, s2, s3 = process_single_transcript(SAMPLE, tmp_path, DEFAULT_CODEBOOK, ["RQ1"])
+    one_file = SessionResults([("a.txt", s1, s2, s3)]).resident_bytes()
+
+    results = SessionResults(memory_limit=int(one_file * 1.5), spill_dir=tmp_path)
+    results.append("a.txt", s1, s2, s3)
+    results.append("b.txt", s1, s2, s3)
+    assert results.spilled_files() == ["a.txt"]
+    results[1]
+    results.append("c.txt", None, s2, s3)  # streamed Stage 1
+    assert results.spilled_files() == ["a.txt", "b.txt"]
+
+    assert results.file_names() == ["a.txt", "b.txt", "c.txt"] and len(results) == 3
+    fname, l1, l2, l3 = results[0]
+    assert fname == "a.txt" and _same(l1, s1) and _same(l2, s2) and _same(l3, s3)
+    assert results[2][1] is None
+    assert results.code_frequencies().sum() == 2 * len(s1)
+    assert results.spilled_files() == ["a.txt", "b.txt"]  # reading does not reload
+
+
+def test_replace_swaps_a_spilled_file(tmp_path):
+    s1, s2, s3 = process_single_transcript(SAMPLE, tmp_path, DEFAULT_CODEBOOK, ["RQ1"])
+    results = SessionResults([("a.txt", s1, s2, s3)], memory_limit=0, spill_dir=tmp_path / "spill")
+    version = results.version
+    recoded = s1.assign(Initial_Code="Recoded")
+    results.replace("a.txt", recoded, s2, s3)
+    assert results.version > version and _same(results[0][1], recoded)
+    spill_dir, = (tmp_path / "spill").iterdir()
+    assert len(list(spill_dir.iterdir())) == 1  # only the new copy is left
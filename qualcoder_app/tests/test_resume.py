@@ -0,0 +1,55 @@
+import json
+import threading
+from pathlib import Path
+
+from qualcoder_core import process_batch, RunManifest, batch_config_key, DEFAULT_CODEBOOK, MANIFEST_NAME
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+RQS = ["RQ1"]
+
+
+def _inputs(tmp_path, count):
+    folder = tmp_path / "inputs"
+    folder.mkdir()
+    paths = []
+    for i in range(count):
+        p = folder / f"t{i}.txt"
+        p.write_bytes(SAMPLE.read_bytes())
+        paths.append(p)
+    return paths
+
+
+def test_cancel_finishes_current_file_and_resume_skips_done(tmp_path):
+    files = _inputs(tmp_path, 3)
+    out = tmp_path / "out"
+    key = batch_config_key(DEFAULT_CODEBOOK, RQS, [])
+    cancel = threading.Event()
+
+    # Stop requested while the first file runs: it completes, the rest are left
+    def on_file(done, name, error):
+        cancel.set()
+    results, errors = process_batch(files, out, DEFAULT_CODEBOOK, RQS, manifest=RunManifest.load(out, key),
+                                    cancel=cancel, on_file=on_file)
+    assert [r[0] for r in results] == ["t0.txt"] and not errors
+    saved = json.loads((out / MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert saved['status'] == 'cancelled'
+    assert saved['files']['t0.txt']['status'] == 'done'
+    assert len(saved['files']['t0.txt']['outputs']) == 1
+
+    # An interrupted attempt at t1 leaves a partial folder that resume discards
+    partial = out / "t1_20000101_000000"
+    partial.mkdir()
+    manifest = RunManifest.load(out, key)
+    manifest.mark("t1.txt", None, 'running')
+    results, errors = process_batch(files, out, DEFAULT_CODEBOOK, RQS, manifest=RunManifest.load(out, key))
+    assert [r[0] for r in results] == ["t1.txt", "t2.txt"] and not errors
+    assert not partial.exists()
+    assert len(list(out.glob("t0_*"))) == 1
+
+    # Edited inputs or a changed configuration are re-run
+    files[2].write_text(SAMPLE.read_text(encoding="utf-8") + "\nParticipant: One more answer.\n", encoding="utf-8")
+    results, _ = process_batch(files, out, DEFAULT_CODEBOOK, RQS, manifest=RunManifest.load(out, key))
+    assert [r[0] for r in results] == ["t2.txt"]
+    other_key = batch_config_key(DEFAULT_CODEBOOK, ["RQ2"], [])
+    results, _ = process_batch(files, out, DEFAULT_CODEBOOK, ["RQ2"], manifest=RunManifest.load(out, other_key))
+    assert len(results) == 3
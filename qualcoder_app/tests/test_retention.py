@@ -0,0 +1,88 @@
+import os
+import json
+import time
+from qualcoder_cli import main
+from qualcoder_retention import OutputRetention, RetentionPolicy, touch_run
+
+DAY = 86400
+
+
+def _run(root, name, size, age_days, zip_too=False, status=None):
+    folder = root / name
+    (folder / "file_1").mkdir(parents=True)
+    (folder / "file_1" / "stage1.xlsx").write_bytes(b"x" * size)
+    if status:
+        (folder / "run_manifest.json").write_text(json.dumps({'status': status}), encoding='utf-8')
+    paths = [folder]
+    if zip_too:
+        archive = root / f"{name}.zip"
+        archive.write_bytes(b"z" * size)
+        paths.append(archive)
+    stamp = time.time() - age_days * DAY
+    for p in paths:
+        os.utime(p, (stamp, stamp))
+    return folder
+
+
+def test_lru_eviction_by_count_bytes_and_age(tmp_path):
+    old = _run(tmp_path, "A_20240101_100000", 100, 40, zip_too=True)
+    mid = _run(tmp_path, "B_20240101_100000", 100, 5)
+    new = _run(tmp_path, "C_20240101_100000_2", 100, 1)
+    (tmp_path / "qualcoder_projects.db").write_bytes(b"db")  # not a run
+    (tmp_path / "job_inputs").mkdir()
+
+    retention = OutputRetention(tmp_path, RetentionPolicy())
+    assert [r.name for r in retention.runs()] == [old.name, mid.name, new.name]
+    assert retention.runs()[0].bytes == 200 and retention.enforce() == []
+
+    touch_run(mid)  # opened just now: the newest run is now the least recently used after A
+    retention.policy = RetentionPolicy(max_runs=1, max_age_days=30)
+    plan = retention.plan(protect=[new])
+    assert [(r.name, r.reasons) for r in plan] == [(old.name, ['age']), (mid.name, ['runs'])]
+
+    retention.policy = RetentionPolicy(max_bytes=150)
+    assert [r.name for r in retention.enforce()] == [old.name, new.name]
+    assert not old.exists() and not (tmp_path / f"{old.name}.zip").exists() and not new.exists()
+    assert mid.exists() and (tmp_path / "qualcoder_projects.db").exists()
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith('.trash-')]
+
+
+def test_running_runs_are_kept_and_cli_report(tmp_path, capsys):
+    running = _run(tmp_path, "A_20240101_100000", 100, 0, status='running')
+    done = _run(tmp_path, "B_20240101_100000", 100, 0, status='complete')
+    os.utime(running, (time.time() - 60, time.time() - 60))
+
+    assert main(["outputs", "--root", str(tmp_path), "--max-runs", "0", "--dry-run", "--json"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report['runs'] == 2 and report['bytes'] > 200  # outputs and manifests
+    assert report['removed'] == [done.name] and done.exists()
+
+    assert main(["outputs", "--root", str(tmp_path), "--max-runs", "0", "--prune"]) == 0
+    out = capsys.readouterr().out
+    assert f"Removed {done.name}" in out and "(running)" in out
+    assert running.exists() and not done.exists()
+
+
+def test_job_inputs_count_toward_quotas_unless_their_job_is_active(tmp_path):
+    from qualcoder_jobs import JobQueue
+    queue = JobQueue(tmp_path / "qualcoder_jobs.db", tmp_path / "jobs")
+    folders = {}
+    for name in ("finished", "queued", "fresh_upload", "stale_upload"):
+        folders[name] = queue.new_inputs_dir()
+        (folders[name] / "a.txt").write_bytes(b"t" * 100)
+    finished = queue.submit("Demo", [folders["finished"] / "a.txt"], {})
+    queue.cancel(finished)  # cancelled while queued: resumable, but not active
+    queue.submit("Demo", [folders["queued"] / "a.txt"], {})
+    for name in ("finished", "queued", "stale_upload"):
+        stamp = time.time() - 10 * DAY
+        os.utime(folders[name], (stamp, stamp))
+    run = _run(tmp_path, "A_20240101_100000", 100, 0)
+
+    retention = OutputRetention(tmp_path, RetentionPolicy(max_age_days=5, max_runs=0))
+    evicted = {r.name for r in retention.enforce(protect=[run])}
+    assert evicted == {f"jobs/{folders[n].name}" for n in ("finished", "stale_upload")}
+    assert folders["queued"].exists() and folders["fresh_upload"].exists() and run.exists()
+
+    usage = retention.usage()
+    assert usage['runs'] == 1 and usage['inputs'] == 2 and usage['bytes'] >= 300
+    assert 'qualcoder_jobs.db' in {u['path'] for u in usage['unmanaged']}
@@ -0,0 +1,72 @@
+import time
+import threading
+from pathlib import Path
+from qualcoder_core import process_batch, DEFAULT_CODEBOOK
+from qualcoder_scheduler import FairScheduler
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+
+
+def _request(scheduler, session, key, order, hold=None):
+    def run():
+        with scheduler.slot(session, key):
+            order.append(session)
+            if hold is not None:
+                hold.wait(5)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_for(predicate):
+    deadline = time.time() + 5
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_least_recently_served_session_goes_first():
+    scheduler = FairScheduler(1)
+    order = []
+    release = threading.Event()
+    first = _request(scheduler, "a", None, order, hold=release)
+    _wait_for(lambda: order == ["a"])
+    # "a" queues its next file before "b" arrives, but "b" has not been served yet
+    threads = [_request(scheduler, "a", None, order)]
+    _wait_for(lambda: scheduler.status()['waiting'] == 1)
+    threads.append(_request(scheduler, "b", None, order))
+    _wait_for(lambda: scheduler.status()['waiting'] == 2)
+    assert scheduler.status("a") == {'max_concurrent': 1, 'running': 1, 'waiting': 2,
+                                     'session_running': 1, 'session_waiting': 1}
+    release.set()
+    for t in [first] + threads:
+        t.join(5)
+    assert order == ["a", "b", "a"]
+
+
+def test_same_key_never_runs_twice_at_once():
+    scheduler = FairScheduler(2)
+    order = []
+    release = threading.Event()
+    first = _request(scheduler, "a", "k", order, hold=release)
+    _wait_for(lambda: order == ["a"])
+    same = _request(scheduler, "b", "k", order)
+    other = _request(scheduler, "c", "j", order)
+    _wait_for(lambda: order == ["a", "c"])
+    assert order == ["a", "c"] and scheduler.status()['waiting'] == 1
+    release.set()
+    for t in (first, same, other):
+        t.join(5)
+    assert order == ["a", "c", "b"] and scheduler.status()['running'] == 0
+
+
+def test_process_batch_holds_a_slot_per_file(tmp_path):
+    scheduler = FairScheduler(1)
+    seen = []
+
+    def slot(file_path):
+        seen.append(file_path.name)
+        return scheduler.slot("s", file_path.name)
+
+    results, errors = process_batch([SAMPLE, SAMPLE], tmp_path, DEFAULT_CODEBOOK, ["RQ1"], slot=slot)
+    assert seen == [SAMPLE.name, SAMPLE.name] and not errors
+    assert len(results) == 2 and scheduler.status()['running'] == 0
@@ -0,0 +1,91 @@
+import pytest
+from pathlib import Path
+import pandas as pd
+from qualcoder_core import process_single_transcript, locate_segments, DEFAULT_CODEBOOK
+from qualcoder_store import ProjectStore
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+
+
+def test_locate_segments_handles_rejoined_whitespace():
+    text = "Interviewer: Hi\nParticipant: I use Zoom\nevery day. Then I rest."
+    offsets = locate_segments(text, ["I use Zoom every day.", "Then I rest.", "Not there."])
+    start, end = offsets[0]
+    assert text[start:end] == "I use Zoom\nevery day."
+    assert text[offsets[1][0]:offsets[1][1]] == "Then I rest."
+    assert offsets[2] == (None, None)
+
+
+def test_store_roundtrip_and_queries(tmp_path):
+    store = ProjectStore(tmp_path / "projects.db")
+    run_id = store.start_run("Demo", tmp_path, config={"research_questions": ["RQ1"]})
+    s1, s2, s3 = process_single_transcript(
+        SAMPLE, tmp_path, DEFAULT_CODEBOOK, ["RQ1"], store=store, run_id=run_id
+    )
+
+    loaded = store.load_run(run_id)
+    assert len(loaded) == 1
+    fname, l1, l2, l3 = loaded[0]
+    assert fname == SAMPLE.name
+    assert l1.equals(s1)
+    assert list(l2.columns) == list(s2.columns) and len(l2) == len(s2)
+    assert len(l3) == len(s3)
+
+    code = s1['Initial_Code'].iloc[0]
+    hits = store.segments_with_code(code, run_id=run_id)
+    assert len(hits) == (s1['Initial_Code'] == code).sum()
+    assert hits['start_offset'].notna().all()
+
+    counts = store.code_counts_per_file(run_id)
+    assert counts['Frequency'].sum() == len(s1)
+    assert store.list_runs().iloc[0]['segments'] == len(s1)
+
+
+def test_search_segments_with_filters(tmp_path):
+    store = ProjectStore(tmp_path / "projects.db")
+    run_id = store.start_run("Demo", tmp_path)
+    s1, s2, s3 = process_single_transcript(
+        SAMPLE, tmp_path, DEFAULT_CODEBOOK, ["RQ1"], store=store, run_id=run_id
+    )
+
+    hits = store.search_segments("moodle", run_id=run_id)
+    assert len(hits) == 1 and "Moodle" in hits.iloc[0]['Interview_Text']
+    assert store.count_search_hits("video*", run_id=run_id) == 1
+
+    code = hits.iloc[0]['Initial_Code']
+    assert len(store.search_segments("moodle", code=code, run_id=run_id)) == 1
+    assert store.search_segments("moodle", code="No such code", run_id=run_id).empty
+    assert store.search_segments("moodle", run_id=run_id, offset=1).empty
+
+    # Re-recording a transcript replaces its rows in the index as well
+    store.record_transcript(run_id, SAMPLE.name, s1.iloc[1:], s2, s3)
+    assert store.count_search_hits("moodle", run_id=run_id) == len(
+        s1.iloc[1:][s1.iloc[1:]['Interview_Text'].str.contains("Moodle")])
+
+
+def test_search_segments_keyword_filter_and_sort(tmp_path):
+    store = ProjectStore(tmp_path / "projects.db")
+    run_id = store.start_run("Demo", tmp_path)
+    s1, _, _ = process_single_transcript(
+        SAMPLE, tmp_path, DEFAULT_CODEBOOK, ["RQ1"], domain_keywords=["Moodle"], store=store, run_id=run_id
+    )
+
+    assert store.domain_keywords(run_id) == ["Moodle"]
+    hits = store.search_segments("", keyword="Moodle", run_id=run_id)
+    assert len(hits) == store.count_search_hits("", keyword="Moodle", run_id=run_id) == \
+        (s1['Notes'] == "Matched domain keyword: Moodle").sum()
+
+    by_length = store.search_segments("", run_id=run_id, sort='length', descending=True, limit=3)
+    assert by_length['Interview_Text'].str.len().tolist() == \
+        sorted(s1['Interview_Text'].str.len(), reverse=True)[:3]
+
+
+def test_rolled_back_save_does_not_leave_stale_code_ids(tmp_path):
+    store = ProjectStore(tmp_path / "projects.db")
+    run_id = store.start_run("Demo", tmp_path)
+    stage1 = pd.DataFrame({'Segment_ID': ['S001'], 'Interview_Text': ['I use Moodle.'],
+                           'Initial_Code': ['A brand new code'], 'Notes': ['']})
+    with pytest.raises(KeyError):  # stage2 without its columns: the whole transaction rolls back
+        store.record_transcript(run_id, "a.txt", stage1, pd.DataFrame({'x': [1]}), None)
+    store.record_transcript(run_id, "a.txt", stage1, None, None)
+    assert store.code_counts(run_id).values.tolist() == [['A brand new code', 1]]
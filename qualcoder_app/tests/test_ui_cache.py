@@ -0,0 +1,68 @@
+import io
+from pathlib import Path
+
+import qualcoder_ui_cache as ui_cache
+from qualcoder_core import (
+    CodebookIndex, generate_initial_code, segment_transcript, code_segments, extract_text_from_file,
+    DEFAULT_CODEBOOK
+)
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample_transcript.txt"
+
+
+class FakeUpload(io.BytesIO):
+    """The parts of streamlit's UploadedFile the cache layer uses."""
+
+    def __init__(self, name, data, file_id):
+        super().__init__(data)
+        self.name, self.size, self.file_id = name, len(data), file_id
+
+
+def test_codebook_index_matches_generate_initial_code():
+    keywords = ["Moodle", "quizzes"]
+    index = CodebookIndex(DEFAULT_CODEBOOK, keywords)
+    for seg in segment_transcript(SAMPLE.read_text(encoding="utf-8")) + ["I teach a class", "nothing here"]:
+        assert index.code(seg) == generate_initial_code(seg, DEFAULT_CODEBOOK, keywords)
+
+
+def test_ui_cache_reuses_extraction_across_configurations(monkeypatch):
+    ui_cache.clear_ui_caches()
+    calls = []
+    monkeypatch.setattr(ui_cache, "extract_text_from_file", lambda p: calls.append(p) or extract_text_from_file(p))
+    upload = FakeUpload("interview.txt", SAMPLE.read_bytes(), "f1")
+    same_content = FakeUpload("copy.txt", SAMPLE.read_bytes(), "f2")
+
+    plain = ui_cache.stage1_preview(upload, DEFAULT_CODEBOOK, [])
+    with_kw = ui_cache.stage1_preview(upload, DEFAULT_CODEBOOK, ["Moodle"])
+    ui_cache.stage1_preview(same_content, DEFAULT_CODEBOOK, ["Moodle"])
+    assert len(calls) == 1  # keyed by content, not by upload or configuration
+    text = SAMPLE.read_text(encoding="utf-8")
+    assert with_kw.equals(code_segments(segment_transcript(text), DEFAULT_CODEBOOK, ["Moodle"]))
+    assert not plain.equals(with_kw)
+    assert ui_cache.keyword_suggestions([upload], top_n=5) == ui_cache.keyword_suggestions([same_content], top_n=5)
+
+    # Uploads over the size limit are processed but never cached
+    monkeypatch.setattr(ui_cache, "MAX_ITEM_BYTES", 10)
+    ui_cache.extracted_text(upload)
+    ui_cache.extracted_text(upload)
+    assert len(calls) == 3
+
+
+def test_downloads_are_deferred_and_listed_from_the_manifest(tmp_path):
+    from qualcoder_core import process_batch, RunManifest, MANIFEST_NAME
+    ui_cache.clear_ui_caches()
+    out = tmp_path / "run"
+    process_batch([SAMPLE], out, DEFAULT_CODEBOOK, ["RQ1"], manifest=RunManifest.load(out))
+    files = ui_cache.output_index(out, [SAMPLE.name])[SAMPLE.name]
+    assert [p.name.split("_", 2)[-1] for p in files] == [
+        "Stage1_Initial_Coding.xlsx", "Stage2_Code_Grouping.xlsx", "Stage3_Thematic_Framework.xlsx"]
+
+    # Without a manifest the folder is scanned instead
+    (out / MANIFEST_NAME).unlink()
+    ui_cache.clear_ui_caches()
+    assert ui_cache.output_index(out, [SAMPLE.name])[SAMPLE.name] == files
+
+    assert ui_cache.file_download(files[0])() == files[0].read_bytes()
+    archive = ui_cache.archive_download(out)
+    assert not out.with_suffix(".zip").exists()  # nothing is built until the payload is requested
+    assert archive()[:2] == b"PK" and out.with_suffix(".zip").exists()